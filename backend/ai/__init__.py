@@ -4,6 +4,7 @@ AI module for mobile phone shopping assistant
 from .agent import MobilePhoneAgent
 from .ai_logic import DynamicQueryAnalyzer, SmartDecisionMaker, SafetyHandler, AIResponseGenerator
 from .templates import PromptTemplates
+from .conversation_summary import ConversationSummarizer, conversation_summarizer
 
 __all__ = [
     'MobilePhoneAgent',
@@ -11,5 +12,7 @@ __all__ = [
     'SmartDecisionMaker',
     'SafetyHandler',
     'AIResponseGenerator',
-    'PromptTemplates'
+    'PromptTemplates',
+    'ConversationSummarizer',
+    'conversation_summarizer'
 ]
@@ -1,14 +1,23 @@
 """
 New AI Agent with proper architecture and dynamic query understanding
 """
-from typing import Dict, List, Any, Optional
-from sqlalchemy.orm import Session
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Dict, List, Any, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
 from .ai_logic import DynamicQueryAnalyzer, SmartDecisionMaker, SafetyHandler, AIResponseGenerator
-from utils import ResponseFormatter, WebSearchService, session_manager, ConversationMessage
-from models import ChatResponse, MobilePhone
-from langchain.schema import BaseMessage
+from .conversation_summary import conversation_summarizer
+from utils import ResponseFormatter, WebSearchService, AsyncDatabaseQueryBuilder, session_manager, ConversationMessage
+from models import ChatResponse
+from phone_serializer import phone_model
+from tracing import tracer, current_span
+
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
+
+logger = logging.getLogger(__name__)
 
 class MobilePhoneAgent:
     """Enhanced mobile phone shopping agent with dynamic query understanding"""
@@ -17,7 +26,8 @@ class MobilePhoneAgent:
         self.web_search = WebSearchService()
         self.response_formatter = ResponseFormatter()
     
-    async def process_query(self, user_query: str, db: Session, session_id: str = None) -> ChatResponse:
+    @tracer.traced("agent.process_query")
+    async def process_query(self, user_query: str, db: AsyncSession, session_id: str = None) -> ChatResponse:
         """Process user query with dynamic understanding and context awareness"""
         try:
             # Initialize AI components
@@ -38,96 +48,63 @@ class MobilePhoneAgent:
                     user_intent={"intent": "unsafe_query"}
                 )
             
-            # Get or create user session
-            if not session_id:
-                session_id = session_manager.create_session()
+            # Load or start the user session once; it is written back once below
+            session = await session_manager.load_session_async(session_id)
+            session_id = session.session_id
             
-            session = session_manager.get_session(session_id)
-            if not session:
-                session_id = session_manager.create_session()
-                session = session_manager.get_session(session_id)
-            
-            # Get conversation history
-            conversation_history = session_manager.get_recent_conversations(session_id, 5)
+            # Get conversation history and its rolling summary
+            conversation_history = session.conversation_history.recent(5)
+            summary_context = conversation_summarizer.render(session.context_summary)
             
             # Analyze user query dynamically
             query_analysis = await query_analyzer.analyze_query(user_query)
-            print(f"Query analysis: {query_analysis}")
+            logger.debug("Query analysis", extra={"query_analysis": query_analysis})
             
             # Get phones from database based on analysis
-            db_phones = self._get_phones_from_analysis(db, query_analysis)
-            print(f"Found {len(db_phones)} phones in database")
+            db_phones = await self._get_phones_from_analysis(db, query_analysis)
+            logger.debug("Found %d phones in database", len(db_phones))
             
             # Analyze user intent
-            user_intent = await decision_maker.analyze_user_intent(user_query, conversation_history)
-            print(f"User intent: {user_intent}")
+            user_intent = await decision_maker.analyze_user_intent(user_query, conversation_history, summary_context)
+            logger.debug("User intent", extra={"user_intent": user_intent})
             
             # Decide whether to use web search
             needs_web_search = await decision_maker.should_use_web_search(
-                user_query, len(db_phones), db_phones, conversation_history
+                user_query, len(db_phones), db_phones, conversation_history, summary_context
             )
-            print(f"Needs web search: {needs_web_search}")
+            logger.debug("Needs web search: %s", needs_web_search)
             
             # Get web search data if needed
             web_data = ""
             if needs_web_search:
-                web_results = self._get_web_search_data(user_query, db_phones, decision_maker)
-                web_data = self.response_formatter.format_web_search_results(web_results)
+                web_results = await self._get_web_search_data(user_query, db_phones, decision_maker)
+                web_data = self.response_formatter.format_web_search_results(
+                    web_results, query=user_query, phone_names=[phone.name for phone in db_phones[:5]]
+                )
             
             # Format database data
             db_data = self.response_formatter.format_phone_data(db_phones)
             
             # Generate AI response
             ai_response = await response_generator.generate_response(
-                user_query, db_data, web_data, conversation_history, user_intent
+                user_query, db_data, web_data, conversation_history, user_intent, summary_context
             )
             
             # Convert database phones to response format
-            phone_models = []
-            for phone in db_phones[:5]:  # Limit to top 5 recommendations
-                phone_dict = {
-                    "id": phone.id,
-                    "name": phone.name,
-                    "brand": phone.brand,
-                    "price": phone.price,
-                    "display_size": phone.display_size,
-                    "display_resolution": phone.display_resolution,
-                    "processor": phone.processor,
-                    "ram": phone.ram,
-                    "storage": phone.storage,
-                    "camera_main": phone.camera_main,
-                    "camera_front": phone.camera_front,
-                    "battery_capacity": phone.battery_capacity,
-                    "charging_speed": phone.charging_speed,
-                    "os": phone.os,
-                    "weight": phone.weight,
-                    "dimensions": phone.dimensions,
-                    "colors": phone.colors,
-                    "features": phone.features,
-                    "image_url": phone.image_url,
-                    "description": phone.description,
-                    "ois": phone.ois,
-                    "eis": phone.eis,
-                    "wireless_charging": phone.wireless_charging,
-                    "water_resistance": phone.water_resistance,
-                    "fingerprint_sensor": phone.fingerprint_sensor,
-                    "face_unlock": phone.face_unlock
-                }
-                phone_models.append(phone_dict)
-            
-            # Save conversation history
-            session_manager.add_conversation(
-                session_id, user_query, ai_response, needs_web_search, phone_models
-            )
+            phone_models = [phone_model(phone) for phone in db_phones[:5]]  # Limit to top 5 recommendations
             
-            # Update user preferences
-            session_manager.update_user_preferences(session_id, user_intent)
+            # Save conversation history and user preferences
+            session_manager.record_conversation(
+                session, user_query, ai_response, needs_web_search, [phone.id for phone in phone_models]
+            )
+            session.user_preferences.update(user_intent)
+            await session_manager.save_session_async(session)
             
             # Extract phones mentioned in AI response and filter recommendations
             mentioned_phones = self._extract_mentioned_phones_from_response(ai_response, db_phones)
             # For now, use all recommendations if no phones are found in response
             if mentioned_phones:
-                filtered_recommendations = [phone for phone in phone_models if phone['name'] in mentioned_phones]
+                filtered_recommendations = [phone for phone in phone_models if phone.name in mentioned_phones]
             else:
                 # Fallback: use all recommendations if extraction fails
                 filtered_recommendations = phone_models
@@ -142,10 +119,8 @@ class MobilePhoneAgent:
                 timestamp=datetime.now()
             )
             
-        except Exception as e:
-            print(f"Error processing query: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Error processing query")
             return ChatResponse(
                 response="I'd be happy to help you find the perfect mobile phone! Could you please rephrase your question?",
                 recommendations=[],
@@ -156,15 +131,19 @@ class MobilePhoneAgent:
                 timestamp=datetime.now()
             )
     
+    @tracer.traced("agent.process_query_with_history")
     async def process_query_with_history(
         self, 
         user_query: str, 
-        db: Session, 
-        conversation_history: List[BaseMessage],
-        user_id: Optional[int] = None
+        db: AsyncSession, 
+        conversation_history: List["BaseMessage"],
+        user_id: Optional[int] = None,
+        conversation_summary: Optional[Dict[str, Any]] = None
     ) -> ChatResponse:
         """Process user query with LangChain conversation history"""
         try:
+            summary_context = conversation_summarizer.render(conversation_summary)
+            
             # Initialize AI components
             query_analyzer = DynamicQueryAnalyzer(db)
             decision_maker = SmartDecisionMaker(db)
@@ -186,15 +165,15 @@ class MobilePhoneAgent:
             
             # Analyze query with conversation context
             query_analysis = await query_analyzer.analyze_query(user_query)
-            print(f"Query analysis: {query_analysis}")
+            logger.debug("Query analysis", extra={"query_analysis": query_analysis})
             
             # Get phones from database
-            db_phones = self._get_phones_from_analysis(db, query_analysis)
-            print(f"Found {len(db_phones)} phones in database")
+            db_phones = await self._get_phones_from_analysis(db, query_analysis)
+            logger.debug("Found %d phones in database", len(db_phones))
             
             # If query analysis incorrectly filtered by brands when no brands were mentioned, try broader search
             if len(db_phones) < 5 and query_analysis.get('brands') and not any(brand.lower() in user_query.lower() for brand in query_analysis.get('brands', [])):
-                print("Query analysis may have incorrectly filtered by brands, trying broader search...")
+                logger.debug("Query analysis may have incorrectly filtered by brands, trying broader search")
                 # Try with only price and feature filters, ignore brand filters
                 broader_filters = {}
                 if query_analysis.get('price_range'):
@@ -202,37 +181,41 @@ class MobilePhoneAgent:
                 if query_analysis.get('features'):
                     broader_filters['features'] = query_analysis['features']
                 
-                from utils import DatabaseQueryBuilder
-                query_builder = DatabaseQueryBuilder(db)
-                db_phones = query_builder.build_phone_query(broader_filters)
-                print(f"Broader search found {len(db_phones)} phones")
+                with tracer.span("agent.db_query.broader") as span:
+                    db_phones = await AsyncDatabaseQueryBuilder(db).build_phone_query(broader_filters)
+                    span.set_attribute("agent.phones", len(db_phones))
+                logger.debug("Broader search found %d phones", len(db_phones))
             
             # If still no phones found, try without any filters
             if len(db_phones) == 0:
-                print("No phones found with any filters, trying without filters...")
-                db_phones = db.query(DBMobilePhone).limit(20).all()
-                print(f"No-filter search found {len(db_phones)} phones")
+                logger.debug("No phones found with any filters, trying without filters")
+                with tracer.span("agent.db_query.unfiltered") as span:
+                    db_phones = await AsyncDatabaseQueryBuilder(db).get_active_phones(20)
+                    span.set_attribute("agent.phones", len(db_phones))
+                logger.debug("No-filter search found %d phones", len(db_phones))
             
             # Convert to response format
-            phone_models = [MobilePhone.from_orm(phone) for phone in db_phones]
+            phone_models = [phone_model(phone) for phone in db_phones]
             
             # Determine if web search is needed
             needs_web_search = await decision_maker.should_use_web_search(
-                user_query, len(db_phones), db_phones, conversation_history
+                user_query, len(db_phones), db_phones, conversation_history, summary_context
             )
             
             # Get web search data if needed
             web_search_results = []
             if needs_web_search:
-                web_search_results = self._get_web_search_data(user_query, db_phones, decision_maker)
+                web_search_results = await self._get_web_search_data(user_query, db_phones, decision_maker)
             
             # Format data for response generation
             db_data = self.response_formatter.format_phone_data(db_phones)
-            web_data = self.response_formatter.format_web_search_results(web_search_results)
+            web_data = self.response_formatter.format_web_search_results(
+                web_search_results, query=user_query, phone_names=[phone.name for phone in db_phones[:5]]
+            )
             
             # Generate AI response with conversation history
             ai_response = await response_generator.generate_response(
-                user_query, db_data, web_data, conversation_history, query_analysis
+                user_query, db_data, web_data, conversation_history, query_analysis, summary_context
             )
             
             # Extract phones mentioned in AI response and filter recommendations
@@ -255,9 +238,7 @@ class MobilePhoneAgent:
             )
             
         except Exception as e:
-            print(f"Error processing query with history: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error processing query with history")
             
             # Check if it's a quota exceeded error
             if "429" in str(e) or "quota" in str(e).lower():
@@ -275,11 +256,28 @@ class MobilePhoneAgent:
                 timestamp=datetime.now()
             )
     
-    def _get_phones_from_analysis(self, db: Session, query_analysis: Dict[str, Any]) -> List[Any]:
-        """Get phones from database based on query analysis"""
-        from utils import DatabaseQueryBuilder
+    @tracer.traced("agent.compare_phones")
+    async def compare_phones(self, phone_ids: List[int], db: AsyncSession) -> Dict[str, Any]:
+        """Compare phones by ID, with an AI-written comparison of their specs"""
+        db_phones = await AsyncDatabaseQueryBuilder(db).get_phone_rows_by_ids(phone_ids)
+        comparison = [phone_model(phone) for phone in db_phones]
+        if len(db_phones) < 2:
+            return {
+                "response": "Please choose at least two phones from the catalog to compare.",
+                "comparison": comparison
+            }
         
-        query_builder = DatabaseQueryBuilder(db)
+        user_query = "Compare " + " vs ".join(phone.name for phone in db_phones)
+        response_generator = AIResponseGenerator(db)
+        ai_response = await response_generator.generate_response(
+            user_query, self.response_formatter.format_phone_data(db_phones), "", [], {"intent": "comparison"}
+        )
+        return {"response": ai_response, "comparison": comparison}
+    
+    @tracer.traced("agent.db_query")
+    async def _get_phones_from_analysis(self, db: AsyncSession, query_analysis: Dict[str, Any]) -> List[Any]:
+        """Get phones from database based on query analysis"""
+        query_builder = AsyncDatabaseQueryBuilder(db)
         
         # Convert analysis to filters
         filters = {}
@@ -312,30 +310,32 @@ class MobilePhoneAgent:
                     elif db_field == "storage" and not filters.get("min_storage"):
                         filters["min_storage"] = 128  # Default minimum for storage
         
-        print(f"Database query filters: {filters}")
-        phones = query_builder.build_phone_query(filters)
-        print(f"Database query returned {len(phones)} phones")
+        logger.debug("Database query filters", extra={"filters": filters})
+        phones = await query_builder.build_phone_query(filters)
+        logger.debug("Database query returned %d phones", len(phones))
+        current_span().set_attribute("agent.phones", len(phones))
         return phones
     
-    def _get_web_search_data(self, user_query: str, db_phones: List[Any], decision_maker: SmartDecisionMaker) -> List[Dict]:
+    @tracer.traced("agent.web_search")
+    async def _get_web_search_data(self, user_query: str, db_phones: List[Any], decision_maker: SmartDecisionMaker) -> List[Dict]:
         """Get web search data with query enhancement"""
         try:
-            # Try original query first
-            web_results = self.web_search.search_phone_info(user_query)
+            # Try original query first; the search client blocks, so keep it off the event loop
+            web_results = await asyncio.to_thread(self.web_search.search_phone_info, user_query)
             
             # If results are poor, enhance the query
             if not web_results or len(web_results) < 2:
-                enhanced_query = decision_maker.enhance_query_for_web_search(user_query, db_phones)
+                enhanced_query = await decision_maker.enhance_query_for_web_search(user_query, db_phones)
                 if enhanced_query != user_query:
-                    print(f"Enhancing query: '{user_query}' -> '{enhanced_query}'")
-                    enhanced_results = self.web_search.search_phone_info(enhanced_query)
+                    logger.debug("Enhancing query %r -> %r", user_query, enhanced_query)
+                    enhanced_results = await asyncio.to_thread(self.web_search.search_phone_info, enhanced_query)
                     if enhanced_results:
                         web_results.extend(enhanced_results)
             
             return web_results
             
         except Exception as e:
-            print(f"Web search error: {e}")
+            logger.warning("Web search failed: %s", e)
             return []
     
     def _extract_mentioned_phones_from_response(self, ai_response: str, db_phones: List[Any]) -> List[str]:
@@ -366,7 +366,7 @@ class MobilePhoneAgent:
         # If no phones were found, it might be because the AI response uses different formatting
         # Let's try a more aggressive approach - check for any phone name patterns
         if not mentioned_phones:
-            print("No phones found with standard matching, trying pattern matching...")
+            logger.debug("No phones found with standard matching, trying pattern matching")
             for phone_name in db_phone_names:
                 # Try different variations of the phone name
                 variations = [
@@ -379,7 +379,7 @@ class MobilePhoneAgent:
                 for variation in variations:
                     if variation in ai_response.lower():
                         mentioned_phones.append(phone_name)
-                        print(f"Found pattern match: {phone_name} (variation: {variation})")
+                        logger.debug("Found pattern match: %s (variation: %s)", phone_name, variation)
                         break
         
         return mentioned_phones
@@ -2,34 +2,39 @@
 AI logic module for dynamic query understanding and processing
 """
 import json
-import google.generativeai as genai
+import logging
 import os
 from typing import Dict, List, Any, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 
 from .templates import PromptTemplates
-from utils import QueryProcessor, PriceExtractor, FeatureExtractor, DatabaseQueryBuilder, ResponseFormatter, WebSearchService, ConversationMessage
+from tracing import tracer
+from utils import QueryProcessor, PriceExtractor, FeatureExtractor, ResponseFormatter, WebSearchService, ConversationMessage
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class DynamicQueryAnalyzer:
     """Analyze user queries dynamically using LLM and database"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         from .llm_service import llm_service
         self.llm_service = llm_service
-        self.query_processor = QueryProcessor(db)
         self.price_extractor = PriceExtractor()
         self.feature_extractor = FeatureExtractor()
-        self.db_query_builder = DatabaseQueryBuilder(db)
     
+    @tracer.traced("agent.query_analysis")
     async def analyze_query(self, query: str) -> Dict[str, Any]:
         """Comprehensive query analysis using LLM and database"""
         try:
-            # Get available brands and models from database
-            brand_model_info = self.query_processor.extract_brand_model_info(query)
+            # Get available brands and models from database; run_sync keeps the I/O on the async driver
+            brand_model_info = await self.db.run_sync(
+                lambda session: QueryProcessor(session).extract_brand_model_info(query)
+            )
             
             # Use LLM to extract structured information
             prompt = PromptTemplates.brand_model_extraction_prompt(
@@ -57,30 +62,38 @@ class DynamicQueryAnalyzer:
             return result
             
         except Exception as e:
-            print(f"Query analysis error: {e}")
+            logger.warning("Query analysis failed, using rule-based extraction: %s", e)
             # Fallback to rule-based extraction
+            brands, models = await self.db.run_sync(self._fuzzy_match, query)
             return {
-                "brands": self.query_processor.fuzzy_brand_match(query),
-                "models": self.query_processor.fuzzy_model_match(query),
+                "brands": brands,
+                "models": models,
                 "price_range": self.price_extractor.extract_price_range(query),
                 "features": self.feature_extractor.extract_features(query),
                 "confidence": 0.5
             }
+    
+    @staticmethod
+    def _fuzzy_match(session: Session, query: str):
+        query_processor = QueryProcessor(session)
+        return query_processor.fuzzy_brand_match(query), query_processor.fuzzy_model_match(query)
 
 class SmartDecisionMaker:
     """Make intelligent decisions about data sources and processing"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         from .llm_service import llm_service
         self.llm_service = llm_service
     
+    @tracer.traced("agent.web_search_decision")
     async def should_use_web_search(self, user_query: str, db_results_count: int, 
-                            db_phones: List[Any], conversation_history: List[ConversationMessage]) -> bool:
+                            db_phones: List[Any], conversation_history: List[ConversationMessage],
+                            conversation_summary: str = "") -> bool:
         """Determine if web search should be used"""
         try:
             # Prepare context
-            context = self._prepare_conversation_context(conversation_history)
+            context = self._prepare_conversation_context(conversation_history, conversation_summary)
             db_phones_summary = self._prepare_db_phones_summary(db_phones)
             
             prompt = PromptTemplates.web_search_decision_prompt(
@@ -93,21 +106,23 @@ class SmartDecisionMaker:
             return decision == "WEB_SEARCH"
             
         except Exception as e:
-            print(f"Decision maker error: {e}")
+            logger.warning("Web search decision failed, using result count: %s", e)
             # Fallback logic
             return db_results_count < 2
     
-    async def analyze_user_intent(self, user_query: str, conversation_history: List[ConversationMessage]) -> Dict[str, Any]:
+    @tracer.traced("agent.intent")
+    async def analyze_user_intent(self, user_query: str, conversation_history: List[ConversationMessage],
+                                  conversation_summary: str = "") -> Dict[str, Any]:
         """Analyze user intent and preferences"""
         try:
-            context = self._prepare_conversation_context(conversation_history)
+            context = self._prepare_conversation_context(conversation_history, conversation_summary)
             prompt = PromptTemplates.user_intent_analysis_prompt(user_query, context)
             
             response = await self.llm_service.generate_content(prompt)
             return json.loads(response)
             
         except Exception as e:
-            print(f"Intent analysis error: {e}")
+            logger.warning("Intent analysis failed, using defaults: %s", e)
             return {
                 "intent": "recommendation",
                 "budget_range": {"min": None, "max": None},
@@ -117,6 +132,7 @@ class SmartDecisionMaker:
                 "needs_multiple_options": True
             }
     
+    @tracer.traced("agent.query_enhancement")
     async def enhance_query_for_web_search(self, user_query: str, db_phones: List[Any]) -> str:
         """Enhance query for better web search results"""
         try:
@@ -130,11 +146,15 @@ class SmartDecisionMaker:
             return response.strip()
             
         except Exception as e:
-            print(f"Query enhancement error: {e}")
+            logger.warning("Query enhancement failed: %s", e)
             return user_query
     
-    def _prepare_conversation_context(self, conversation_history: List[ConversationMessage]) -> str:
-        """Prepare conversation context"""
+    def _prepare_conversation_context(self, conversation_history: List[ConversationMessage],
+                                      conversation_summary: str = "") -> str:
+        """Prepare conversation context, preferring the bounded rolling summary over raw turns"""
+        if conversation_summary:
+            return conversation_summary
+        
         if not conversation_history:
             return "No previous conversation"
         
@@ -172,6 +192,7 @@ class SafetyHandler:
         from .llm_service import llm_service
         self.llm_service = llm_service
     
+    @tracer.traced("agent.safety")
     async def is_safe_query(self, query: str) -> tuple[bool, str]:
         """Check if query is safe using LLM with fallback"""
         try:
@@ -185,27 +206,29 @@ class SafetyHandler:
                 return False, "I cannot help with that request. I'm designed to assist with mobile phone shopping queries only."
                 
         except Exception as e:
-            print(f"Safety check error: {e}")
+            logger.warning("Safety check failed, allowing query: %s", e)
             # If LLM service fails, default to safe (allow the query)
             return True, ""
 
 class AIResponseGenerator:
     """Generate AI responses with context awareness and fallback"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         from .llm_service import llm_service
         self.llm_service = llm_service
         self.web_search = WebSearchService()
         self.response_formatter = ResponseFormatter()
     
+    @tracer.traced("agent.response_generation")
     async def generate_response(self, user_query: str, db_data: str, web_data: str, 
                          conversation_history: List = None, 
-                         user_intent: Dict[str, Any] = None) -> str:
+                         user_intent: Dict[str, Any] = None,
+                         conversation_summary: str = "") -> str:
         """Generate comprehensive AI response"""
         try:
             # Prepare context
-            context = self._prepare_conversation_context(conversation_history)
+            context = self._prepare_conversation_context(conversation_history, conversation_summary)
             preferences = self._prepare_user_preferences(user_intent)
             
             # System prompt
@@ -237,11 +260,14 @@ Remember: You are a mobile phone expert who knows everything about phones. Act l
             return response
             
         except Exception as e:
-            print(f"Response generation error: {e}")
+            logger.error("Response generation failed: %s", e)
             return "I'd be happy to help you find the perfect mobile phone! Could you please rephrase your question?"
     
-    def _prepare_conversation_context(self, conversation_history: List) -> str:
-        """Prepare conversation context"""
+    def _prepare_conversation_context(self, conversation_history: List, conversation_summary: str = "") -> str:
+        """Prepare conversation context, preferring the bounded rolling summary over raw turns"""
+        if conversation_summary:
+            return conversation_summary + "\n\n"
+        
         if not conversation_history:
             return ""
         
@@ -0,0 +1,159 @@
+"""
+Rolling conversation summaries used as bounded prompt context
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+from utils import PriceExtractor, FeatureExtractor
+
+MAX_BRANDS = 5
+MAX_FEATURES = 6
+MAX_REJECTED_PHONES = 8
+MAX_RECOMMENDED_PHONES = 5
+MAX_LAST_QUERY_CHARS = 160
+MAX_CONTEXT_CHARS = 700
+
+# "not the X", "don't like X", "except X", "no Samsung", "anything other than X", ...
+REJECTION_PATTERN = re.compile(
+    r"\b(?:not|no|don'?t|do not|except|without|other than|instead of|avoid|skip|hate|dislike|rather not)\b",
+    re.IGNORECASE
+)
+# Rejection of the previous recommendations as a whole
+GENERIC_REJECTION_PATTERN = re.compile(
+    r"\b(?:something else|other options|others|different (?:phones?|options?)|none of (?:these|them|those)|"
+    r"not (?:these|those|them|that one|this one|interested)|don'?t like (?:these|those|them|any))\b",
+    re.IGNORECASE
+)
+
+
+def _merge_recent(existing: List[str], new_items: List[str], limit: int) -> List[str]:
+    """Append items (case-insensitive dedupe), newest last, keeping only the last ``limit``"""
+    merged = [item for item in existing if item.lower() not in {new.lower() for new in new_items}]
+    merged.extend(new_items)
+    return merged[-limit:]
+
+
+class ConversationSummarizer:
+    """Incrementally maintain a compact summary of the user's shopping constraints
+
+    The summary is a plain dict so it can live in session stores and in the
+    ``conversations.context_summary`` column:
+
+        {"turns", "budget": {"min", "max"}, "brands", "excluded_brands",
+         "features", "rejected_phones", "last_recommended", "last_query"}
+    """
+
+    @staticmethod
+    def empty() -> Dict[str, Any]:
+        return {
+            "turns": 0,
+            "budget": {"min": None, "max": None},
+            "brands": [],
+            "excluded_brands": [],
+            "features": [],
+            "rejected_phones": [],
+            "last_recommended": [],
+            "last_query": ""
+        }
+
+    def update(self, summary: Optional[Dict[str, Any]], user_query: str,
+               analysis: Optional[Dict[str, Any]] = None,
+               recommended_phones: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Fold one exchange into the summary and return the new summary"""
+        updated = self.empty()
+        if summary:
+            updated.update({key: value for key, value in summary.items() if key in updated})
+        analysis = analysis or {}
+
+        updated["turns"] += 1
+        updated["last_query"] = user_query.strip()[:MAX_LAST_QUERY_CHARS]
+
+        # Budget: analysis (query analysis or intent shape) first, regex fallback
+        price_range = analysis.get("price_range") or analysis.get("budget_range") or {}
+        if not price_range.get("min") and not price_range.get("max"):
+            price_range = PriceExtractor.extract_price_range(user_query)
+        if price_range.get("min") or price_range.get("max"):
+            updated["budget"] = {"min": price_range.get("min"), "max": price_range.get("max")}
+
+        query_lower = user_query.lower()
+        is_rejection = bool(REJECTION_PATTERN.search(user_query))
+
+        brands = analysis.get("brands") or analysis.get("preferred_brands") or []
+        if is_rejection:
+            excluded = [brand for brand in brands if re.search(
+                rf"\b(?:not|no|except|without|avoid|other than)\s+(?:\w+\s+)?{re.escape(brand.lower())}", query_lower
+            )]
+            brands = [brand for brand in brands if brand not in excluded]
+            updated["excluded_brands"] = _merge_recent(updated["excluded_brands"], excluded, MAX_BRANDS)
+        # Asking for a brand again lifts an earlier exclusion
+        updated["excluded_brands"] = [brand for brand in updated["excluded_brands"] if brand not in brands]
+        updated["brands"] = _merge_recent(
+            [brand for brand in updated["brands"] if brand not in updated["excluded_brands"]], brands, MAX_BRANDS
+        )
+
+        features = analysis.get("features") or analysis.get("feature_focus") or FeatureExtractor.extract_features(user_query)
+        updated["features"] = _merge_recent(updated["features"], list(features), MAX_FEATURES)
+
+        if is_rejection or GENERIC_REJECTION_PATTERN.search(user_query):
+            rejected = self._rejected_phones(query_lower, updated["last_recommended"])
+            updated["rejected_phones"] = _merge_recent(updated["rejected_phones"], rejected, MAX_REJECTED_PHONES)
+
+        if recommended_phones:
+            rejected_lower = {name.lower() for name in updated["rejected_phones"]}
+            updated["last_recommended"] = [
+                name for name in recommended_phones if name.lower() not in rejected_lower
+            ][:MAX_RECOMMENDED_PHONES]
+
+        return updated
+
+    def render(self, summary: Optional[Dict[str, Any]]) -> str:
+        """Render the summary as a small, bounded prompt block"""
+        if not summary or not summary.get("turns"):
+            return ""
+
+        lines = [f"Conversation summary ({summary['turns']} earlier turns):"]
+
+        budget = summary.get("budget") or {}
+        if budget.get("min") and budget.get("max"):
+            lines.append(f"- Budget: ₹{budget['min']:,.0f} to ₹{budget['max']:,.0f}")
+        elif budget.get("max"):
+            lines.append(f"- Budget: up to ₹{budget['max']:,.0f}")
+        elif budget.get("min"):
+            lines.append(f"- Budget: above ₹{budget['min']:,.0f}")
+
+        if summary.get("brands"):
+            lines.append(f"- Preferred brands: {', '.join(summary['brands'])}")
+        if summary.get("excluded_brands"):
+            lines.append(f"- Avoid brands: {', '.join(summary['excluded_brands'])}")
+        if summary.get("features"):
+            lines.append(f"- Feature focus: {', '.join(summary['features'])}")
+        if summary.get("rejected_phones"):
+            lines.append(f"- Not interested in: {', '.join(summary['rejected_phones'])}")
+        if summary.get("last_recommended"):
+            lines.append(f"- Last recommended: {', '.join(summary['last_recommended'])}")
+        if summary.get("last_query"):
+            lines.append(f"- Previous request: {summary['last_query']}")
+
+        context = "\n".join(lines)
+        return context[:MAX_CONTEXT_CHARS]
+
+    @staticmethod
+    def _rejected_phones(query_lower: str, last_recommended: List[str]) -> List[str]:
+        """Previously recommended phones the user is turning down"""
+        named = []
+        for name in last_recommended:
+            for variant in (name.lower(), " ".join(name.lower().split()[-2:])):
+                position = query_lower.find(variant)
+                # Only count names that directly follow a rejection cue
+                if position >= 0 and REJECTION_PATTERN.search(query_lower[max(0, position - 30):position]):
+                    named.append(name)
+                    break
+        if named:
+            return named
+        if GENERIC_REJECTION_PATTERN.search(query_lower):
+            return list(last_recommended)
+        return []
+
+
+# Global summarizer instance
+conversation_summarizer = ConversationSummarizer()
@@ -3,13 +3,68 @@ LLM Service with Gemini and OpenAI fallback support
 """
 import os
 import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
-import google.generativeai as genai
-from openai import AsyncOpenAI
+
+from tracing import tracer, current_span
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+class LLMProvider(ABC):
+    """One LLM backend; ``available`` is False when it is not configured"""
+    name = "provider"
+    
+    @property
+    def available(self) -> bool:
+        return True
+    
+    @abstractmethod
+    async def generate(self, prompt: str) -> str:
+        """Completion text for ``prompt``"""
+
+class GeminiProvider(LLMProvider):
+    """Gemini through google-generativeai (SDK imported on first use)"""
+    name = "gemini"
+    
+    def __init__(self, service: "LLMService"):
+        self.service = service
+    
+    @property
+    def available(self) -> bool:
+        return self.service.gemini_model is not None
+    
+    async def generate(self, prompt: str) -> str:
+        response = await asyncio.to_thread(self.service.gemini_model.generate_content, prompt)
+        return response.text
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions (SDK imported on first use)"""
+    name = "openai"
+    
+    def __init__(self, service: "LLMService"):
+        self.service = service
+    
+    @property
+    def available(self) -> bool:
+        return self.service.openai_client is not None
+    
+    async def generate(self, prompt: str) -> str:
+        response = await self.service.openai_client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "You are a helpful mobile phone shopping assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=2000,
+            temperature=0.7
+        )
+        return response.choices[0].message.content
+
 class LLMService:
     """Service that provides LLM functionality with automatic fallback"""
     
@@ -17,52 +72,83 @@ class LLMService:
         self.gemini_api_key = os.getenv("GEMINI_API_KEY")
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         
-        # Initialize Gemini
-        if self.gemini_api_key:
-            genai.configure(api_key=self.gemini_api_key)
-            self.gemini_model = genai.GenerativeModel('gemini-2.0-flash')
-        else:
-            self.gemini_model = None
-            
-        # Initialize OpenAI
-        if self.openai_api_key:
-            self.openai_client = AsyncOpenAI(api_key=self.openai_api_key)
-        else:
-            self.openai_client = None
-            
+        # Provider SDKs are imported and clients built on first use (see load_providers)
+        self._gemini_model = None
+        self._openai_client = None
+        self._providers_loaded = False
+        self._load_lock = threading.Lock()
+        
+        self.providers: Dict[str, LLMProvider] = {
+            "gemini": GeminiProvider(self),
+            "openai": OpenAIProvider(self)
+        }
         self.primary_provider = "gemini"  # Start with Gemini
         self.fallback_provider = "openai"
     
+    def register_provider(self, name: str, provider: LLMProvider, primary: bool = False):
+        """Add or replace a provider; ``primary`` routes every call to it (used by benchmarks)"""
+        self.providers[name] = provider
+        if primary:
+            self.primary_provider = self.fallback_provider = name
+    
+    def load_providers(self):
+        """Import the provider SDKs and create their clients (once)"""
+        if self._providers_loaded:
+            return
+        with self._load_lock:
+            if self._providers_loaded:
+                return
+            
+            # Initialize Gemini
+            if self.gemini_api_key:
+                import google.generativeai as genai
+                genai.configure(api_key=self.gemini_api_key)
+                self._gemini_model = genai.GenerativeModel('gemini-2.0-flash')
+            
+            # Initialize OpenAI
+            if self.openai_api_key:
+                from openai import AsyncOpenAI
+                self._openai_client = AsyncOpenAI(api_key=self.openai_api_key)
+            
+            self._providers_loaded = True
+    
+    @property
+    def gemini_model(self):
+        self.load_providers()
+        return self._gemini_model
+    
+    @property
+    def openai_client(self):
+        self.load_providers()
+        return self._openai_client
+    
+    @tracer.traced("llm.generate")
     async def generate_content(self, prompt: str, max_retries: int = 2) -> str:
         """Generate content with automatic fallback between providers"""
+        current_span().set_attribute("llm.prompt_chars", len(prompt))
         
         for attempt in range(max_retries):
             try:
-                if self.primary_provider == "gemini" and self.gemini_model:
-                    return await self._generate_with_gemini(prompt)
-                elif self.primary_provider == "openai" and self.openai_client:
-                    return await self._generate_with_openai(prompt)
-                else:
-                    # Try fallback provider
-                    if self.fallback_provider == "gemini" and self.gemini_model:
-                        return await self._generate_with_gemini(prompt)
-                    elif self.fallback_provider == "openai" and self.openai_client:
-                        return await self._generate_with_openai(prompt)
-                        
+                for name in (self.primary_provider, self.fallback_provider):
+                    provider = self.providers.get(name)
+                    if provider is not None and provider.available:
+                        return await self._generate_with(provider, prompt, attempt)
             except Exception as e:
                 error_msg = str(e)
-                print(f"Error with {self.primary_provider}: {error_msg}")
+                logger.warning("Error with %s: %s", self.primary_provider, error_msg)
                 
                 # Check if it's a quota/rate limit error
                 if "429" in error_msg or "quota" in error_msg.lower() or "rate limit" in error_msg.lower():
-                    print(f"Switching from {self.primary_provider} to {self.fallback_provider} due to quota/rate limit")
+                    logger.warning("Switching from %s to %s due to quota/rate limit", self.primary_provider, self.fallback_provider)
+                    current_span().add_event("llm.fallback", {"from": self.primary_provider, "to": self.fallback_provider, "reason": "quota"})
                     # Switch providers
                     self.primary_provider, self.fallback_provider = self.fallback_provider, self.primary_provider
                     continue
                 else:
                     # For other errors, try fallback immediately
                     if attempt == 0:  # Only try fallback once
-                        print(f"Trying fallback provider: {self.fallback_provider}")
+                        logger.info("Trying fallback provider: %s", self.fallback_provider)
+                        current_span().add_event("llm.fallback", {"from": self.primary_provider, "to": self.fallback_provider, "reason": "error"})
                         self.primary_provider, self.fallback_provider = self.fallback_provider, self.primary_provider
                         continue
                     else:
@@ -70,32 +156,16 @@ class LLMService:
         
         raise Exception("All LLM providers failed")
     
-    async def _generate_with_gemini(self, prompt: str) -> str:
-        """Generate content using Gemini"""
-        try:
-            response = await asyncio.to_thread(
-                self.gemini_model.generate_content, prompt
-            )
-            return response.text
-        except Exception as e:
-            print(f"Gemini generation error: {e}")
-            raise e
-    
-    async def _generate_with_openai(self, prompt: str) -> str:
-        """Generate content using OpenAI"""
+    async def _generate_with(self, provider: LLMProvider, prompt: str, attempt: int = 0) -> str:
+        """Generate content with one provider"""
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a helpful mobile phone shopping assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=2000,
-                temperature=0.7
-            )
-            return response.choices[0].message.content
+            with tracer.span("llm.attempt", {"llm.provider": provider.name, "llm.attempt": attempt,
+                                             "llm.prompt_chars": len(prompt)}, kind="client") as span:
+                text = await provider.generate(prompt)
+                span.set_attribute("llm.response_chars", len(text or ""))
+                return text
         except Exception as e:
-            print(f"OpenAI generation error: {e}")
+            logger.warning("%s generation error: %s", provider.name, e)
             raise e
     
     def is_quota_exceeded(self, error: str) -> bool:
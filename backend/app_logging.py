@@ -0,0 +1,226 @@
+"""
+Structured, non-blocking application logging
+
+Log calls only build a record and put it on a bounded queue; a listener
+thread formats it as one JSON object per line and writes it out. Every
+record carries the ID of the request that logged it. DEBUG records are kept
+only for a sampled share of requests (LOG_DEBUG_SAMPLE_RATE), so full
+per-request dumps can stay on in production without slowing every request.
+"""
+import atexit
+import contextvars
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import traceback
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import orjson
+
+from metrics import metrics
+
+LOG_RECORDS_DROPPED = metrics.counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+
+REQUEST_ID_HEADER = b"x-request-id"
+# Client-supplied IDs are kept only if they look like IDs
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+# Chatty third-party loggers, held at LOG_LIBRARY_LEVEL so LOG_LEVEL=DEBUG shows app records
+LIBRARY_LOGGERS = (
+    "aiosqlite", "asyncio", "httpx", "httpcore", "urllib3", "googleapiclient", "openai", "multipart",
+    "sqlalchemy", "db_pool.InstrumentedQueuePool", "db_pool.InstrumentedAsyncQueuePool",
+)
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+debug_sampled_var: contextvars.ContextVar[Optional[bool]] = contextvars.ContextVar("debug_sampled", default=None)
+
+# LogRecord attributes that are not user-supplied ``extra`` fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items()
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_")}
+
+
+def get_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the current request ID and drop unsampled DEBUG records
+
+    Runs in the thread that logs, where the request's context variables are set.
+    """
+
+    def __init__(self, debug_sample_rate: float):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        if record.levelno > logging.DEBUG:
+            return True
+        sampled = debug_sampled_var.get()
+        if sampled is None:
+            # Outside a request each DEBUG record is sampled on its own
+            sampled = random.random() < self.debug_sample_rate
+        return sampled
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record; ``extra`` fields are included as-is"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update(_extra_fields(record))
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development; ``extra`` fields follow as key=value"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = None
+        line = super().format(record)
+        fields = " ".join(f"{key}={value}" for key, value in _extra_fields(record).items())
+        if not fields:
+            return line
+        first_line, newline, rest = line.partition("\n")
+        return f"{first_line} {fields}{newline}{rest}"
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message and traceback now, while arguments and frames are
+        # still as they were; JSON encoding and I/O happen on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        for key, value in _extra_fields(record).items():
+            if isinstance(value, (dict, list)):
+                # Callers may keep mutating structures they logged
+                setattr(record, key, copy.deepcopy(value))
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging() -> Optional[logging.handlers.QueueListener]:
+    """Route the root logger through the queue (once per process)
+
+    LOG_LEVEL sets the threshold (LOG_LIBRARY_LEVEL for LIBRARY_LOGGERS),
+    LOG_FORMAT picks "json" or "text", LOG_QUEUE_SIZE bounds the queue and
+    LOG_DEBUG_SAMPLE_RATE is the share of requests whose DEBUG records are kept.
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return _listener
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        if os.getenv("LOG_FORMAT", "json").lower() == "text":
+            stream_handler.setFormatter(TextFormatter())
+        else:
+            stream_handler.setFormatter(JSONFormatter())
+
+        log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        queue_handler = NonBlockingQueueHandler(log_queue)
+        queue_handler.addFilter(RequestContextFilter(float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))))
+
+        root = logging.getLogger()
+        root.addHandler(queue_handler)
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        library_level = os.getenv("LOG_LIBRARY_LEVEL", "WARNING").upper()
+        for name in LIBRARY_LOGGERS:
+            logging.getLogger(name).setLevel(library_level)
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+class RequestContextMiddleware:
+    """ASGI middleware assigning each request an ID and a debug-sampling decision
+
+    A well-formed X-Request-ID from the client (or a proxy) is reused so
+    logs can be joined across services; the ID is echoed in the response.
+    """
+
+    def __init__(self, app, debug_sample_rate: float = None):
+        self.app = app
+        self.debug_sample_rate = debug_sample_rate if debug_sample_rate is not None else float(
+            os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01")
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == REQUEST_ID_HEADER:
+                candidate = value.decode("latin-1")
+                if VALID_REQUEST_ID.match(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex
+        header = (REQUEST_ID_HEADER, request_id.encode("latin-1"))
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), header]
+            await send(message)
+
+        request_token = request_id_var.set(request_id)
+        sampled_token = debug_sampled_var.set(random.random() < self.debug_sample_rate)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            debug_sampled_var.reset(sampled_token)
+            request_id_var.reset(request_token)
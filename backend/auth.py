@@ -1,23 +1,40 @@
 """
 Authentication and conversation history management
 """
+import base64
+import hmac
 import os
-import bcrypt
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import TYPE_CHECKING, Optional, List, Tuple
 from jose import JWTError, jwt
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Header, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import Select, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db, User, Conversation, ConversationMessage
+from database import get_async_db, User, Conversation, ConversationMessage
+from password_hasher import password_hasher, hash_password, verify_password, PASSWORD_REHASHES
+from user_cache import user_cache, UserSnapshot, USER_CACHE_LOOKUPS
+from tracing import current_span
 from models import UserCreate, UserLogin, Token, TokenData, ConversationCreate, ConversationMessageCreate
-from langchain.schema import BaseMessage, HumanMessage, AIMessage
-from langchain.memory import ConversationBufferWindowMemory
+
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
+    from langchain.memory import ConversationBufferWindowMemory
 
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "dhruv123")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Take user id and active flag from signed token claims instead of the database
+TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+# Shared secret for /admin diagnostics; those endpoints are off while it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
 security = HTTPBearer(auto_error=False)
 
@@ -26,15 +43,13 @@ class AuthService:
     
     @staticmethod
     def hash_password(password: str) -> str:
-        """Hash a password using bcrypt"""
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-        return hashed.decode('utf-8')
+        """Hash a password using bcrypt (blocking; async code uses password_hasher)"""
+        return hash_password(password)
     
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
-        """Verify a password against its hash"""
-        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+        """Verify a password against its hash (blocking; async code uses password_hasher)"""
+        return verify_password(plain_password, hashed_password)
     
     @staticmethod
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -44,63 +59,241 @@ class AuthService:
             expire = datetime.utcnow() + expires_delta
         else:
             expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        to_encode.update({"exp": expire})
+        to_encode.update({"exp": expire, "iat": int(time.time())})
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
     
     @staticmethod
-    def verify_token(token: str) -> Optional[str]:
-        """Verify and decode a JWT token"""
+    def decode_token(token: str) -> Optional[dict]:
+        """Verify a JWT and return its claims"""
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            email: str = payload.get("sub")
-            if email is None:
-                return None
-            return email
         except JWTError:
             return None
+        return payload if payload.get("sub") is not None else None
+    
+    @staticmethod
+    def verify_token(token: str) -> Optional[str]:
+        """Verify and decode a JWT token"""
+        payload = AuthService.decode_token(token)
+        return payload["sub"] if payload else None
+
+# Rough per-message cost of a LangChain message object on top of its text
+MESSAGE_OVERHEAD_BYTES = 600
+
+class CachedMemory:
+    """LangChain memory plus bookkeeping for the LRU cache"""
+    __slots__ = ("memory", "loaded_at", "size_bytes")
+    
+    def __init__(self, memory: "ConversationBufferWindowMemory"):
+        self.memory = memory
+        self.loaded_at = time.monotonic()
+        self.size_bytes = 0
 
 class ConversationService:
-    """Handle conversation history using LangChain memory"""
+    """Handle conversation history using LangChain memory
     
-    def __init__(self):
-        self.user_memories = {}  # Store LangChain memories per user
+    Memories are kept in a bounded LRU cache. On a miss the last ``window``
+    exchanges are rehydrated from ``conversation_messages``, so restarts and
+    other workers see the same history.
+    """
     
-    def get_user_memory(self, user_id: int) -> ConversationBufferWindowMemory:
-        """Get or create LangChain memory for a user"""
-        if user_id not in self.user_memories:
-            self.user_memories[user_id] = ConversationBufferWindowMemory(
-                k=10,  # Keep last 10 conversation exchanges
-                return_messages=True
-            )
-        return self.user_memories[user_id]
+    def __init__(self, max_users: int = None, max_bytes: int = None, ttl_seconds: float = None, window: int = 10):
+        self.max_users = max_users if max_users is not None else int(
+            os.getenv("CONVERSATION_MEMORY_MAX_USERS", "1000")
+        )
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv("CONVERSATION_MEMORY_MAX_BYTES", str(64 * 1024 * 1024))
+        )
+        # Reload from the database after this long so turns served by other workers show up
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv("CONVERSATION_MEMORY_TTL_SECONDS", "300")
+        )
+        self.window = window  # Conversation exchanges kept per user
+        self.user_memories: "OrderedDict[int, CachedMemory]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+    
+    def get_user_memory(self, user_id: int, db: Optional[Session] = None) -> "ConversationBufferWindowMemory":
+        """Get LangChain memory for a user, rehydrating it from the database on a miss"""
+        with self._lock:
+            entry = self.user_memories.get(user_id)
+            if entry and time.monotonic() - entry.loaded_at < self.ttl_seconds:
+                self.user_memories.move_to_end(user_id)
+                self.hits += 1
+                current_span().set_attribute("conversation_memory.hit", True)
+                return entry.memory
+            self.misses += 1
+        current_span().set_attribute("conversation_memory.hit", False)
+        
+        return self._load(user_id, db).memory
+    
+    def _load(self, user_id: int, db: Optional[Session]) -> CachedMemory:
+        """Build a cache entry, rehydrating history from the database"""
+        # LangChain is heavy to import; load it with the first memory, not at startup
+        from langchain.memory import ConversationBufferWindowMemory
+        memory = ConversationBufferWindowMemory(k=self.window, return_messages=True)
+        if db is not None:
+            self._rehydrate(memory, user_id, db)
+        
+        with self._lock:
+            self._drop(user_id)
+            entry = CachedMemory(memory)
+            self.user_memories[user_id] = entry
+            self._account(entry)
+            self._evict()
+        return entry
     
     def add_to_memory(self, user_id: int, user_message: str, ai_response: str):
-        """Add a conversation exchange to user's memory"""
-        memory = self.get_user_memory(user_id)
-        memory.save_context(
-            {"input": user_message},
-            {"output": ai_response}
-        )
+        """Add a conversation exchange to user's memory
+        
+        Users that are not cached are skipped: the exchange is persisted to the
+        database and will be picked up by the next rehydration.
+        """
+        with self._lock:
+            entry = self.user_memories.get(user_id)
+            if not entry:
+                return
+            
+            entry.memory.save_context(
+                {"input": user_message},
+                {"output": ai_response}
+            )
+            # The window only limits what is loaded; trim the stored messages too
+            del entry.memory.chat_memory.messages[:-2 * self.window]
+            self.user_memories.move_to_end(user_id)
+            self._account(entry)
+            self._evict()
     
-    def get_conversation_history(self, user_id: int) -> List[BaseMessage]:
+    def get_conversation_history(self, user_id: int, db: Optional[Session] = None) -> List["BaseMessage"]:
         """Get conversation history for a user"""
-        memory = self.get_user_memory(user_id)
+        memory = self.get_user_memory(user_id, db)
         return memory.chat_memory.messages
     
     def clear_memory(self, user_id: int):
         """Clear conversation memory for a user"""
-        if user_id in self.user_memories:
-            del self.user_memories[user_id]
+        with self._lock:
+            self._drop(user_id)
+    
+    def stats(self) -> dict:
+        """Cache size and hit counters"""
+        with self._lock:
+            return {
+                "users": len(self.user_memories),
+                "max_users": self.max_users,
+                "approx_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+    
+    def _rehydrate(self, memory: "ConversationBufferWindowMemory", user_id: int, db: Session):
+        """Load the user's last exchanges with a single indexed query"""
+        rows = db.query(
+            ConversationMessage.user_message, ConversationMessage.ai_response
+        ).join(
+            Conversation, ConversationMessage.conversation_id == Conversation.id
+        ).filter(
+            Conversation.user_id == user_id
+        ).order_by(ConversationMessage.timestamp.desc()).limit(self.window).all()
+        
+        for user_message, ai_response in reversed(rows):
+            memory.save_context({"input": user_message}, {"output": ai_response})
+    
+    def _account(self, entry: CachedMemory):
+        """Recompute the approximate footprint of one cached memory"""
+        messages = entry.memory.chat_memory.messages
+        size = sum(sys.getsizeof(message.content) for message in messages) + MESSAGE_OVERHEAD_BYTES * len(messages)
+        self.total_bytes += size - entry.size_bytes
+        entry.size_bytes = size
+    
+    def _evict(self):
+        """Drop least recently used memories until both limits are met"""
+        while self.user_memories and (len(self.user_memories) > self.max_users or self.total_bytes > self.max_bytes):
+            _, entry = self.user_memories.popitem(last=False)
+            self.total_bytes -= entry.size_bytes
+            self.evictions += 1
+    
+    def _drop(self, user_id: int):
+        entry = self.user_memories.pop(user_id, None)
+        if entry:
+            self.total_bytes -= entry.size_bytes
 
 # Global conversation service instance
 conversation_service = ConversationService()
 
-# Dependency functions
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+def create_user_token(user: User) -> Token:
+    """Create access token for user"""
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = AuthService.create_access_token(
+        data={"sub": user.email, "uid": user.id, "active": bool(user.is_active)}, expires_delta=access_token_expires
+    )
+    return Token(access_token=access_token, token_type="bearer")
+
+def _parse_summary(raw: Optional[str]) -> dict:
+    try:
+        return json.loads(raw) if raw else {}
+    except ValueError:
+        return {}
+
+def get_conversation_summary(conversation_id: int, db: Session) -> dict:
+    """Rolling context summary stored with a conversation; empty if it has none"""
+    return _parse_summary(db.scalar(select(Conversation.context_summary).where(Conversation.id == conversation_id)))
+
+async def get_conversation_summary_async(conversation_id: int, user_id: int, db: AsyncSession) -> Optional[dict]:
+    """Context summary of one of the user's conversations; None if it is missing or someone else's"""
+    row = (await db.execute(
+        select(Conversation.context_summary).where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+    )).first()
+    return None if row is None else _parse_summary(row.context_summary)
+
+def save_conversation_summary(conversation_id: int, summary: dict, db: Session):
+    """Store the rolling context summary alongside a conversation"""
+    db.query(Conversation).filter(Conversation.id == conversation_id).update(
+        {Conversation.context_summary: json.dumps(summary)}, synchronize_session=False
+    )
+    db.commit()
+
+# Async dependency functions (AsyncSession, no blocking database calls on the event loop)
+async def resolve_user_async(token: str, db: AsyncSession) -> Optional[UserSnapshot]:
+    """Active user for a bearer token, from the cache, trusted claims or the database"""
+    snapshot = user_cache.get(token)
+    if snapshot is not None:
+        USER_CACHE_LOOKUPS.inc(source="cache")
+        current_span().set_attribute("auth.user_source", "cache")
+        return snapshot
+    
+    payload = AuthService.decode_token(token)
+    if payload is None:
+        return None
+    
+    user_id = payload.get("uid")
+    if (TRUST_TOKEN_CLAIMS and user_id is not None and "active" in payload
+            and not user_cache.revoked_since(user_id, payload.get("iat"))):
+        USER_CACHE_LOOKUPS.inc(source="claims")
+        current_span().set_attribute("auth.user_source", "claims")
+        snapshot = UserSnapshot(id=user_id, email=payload["sub"], is_active=bool(payload["active"]))
+    else:
+        USER_CACHE_LOOKUPS.inc(source="database")
+        current_span().set_attribute("auth.user_source", "database")
+        user = await db.scalar(select(User).where(User.email == payload["sub"]))
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+    
+    if not snapshot.is_active:
+        return None
+    user_cache.put(token, snapshot, payload.get("exp"))
+    return snapshot
+
+async def get_current_user_async(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> UserSnapshot:
     """Get current authenticated user"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -108,121 +301,174 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    email = AuthService.verify_token(credentials.credentials)
-    if email is None:
+    if not credentials:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    user = await resolve_user_async(credentials.credentials, db)
     if user is None:
         raise credentials_exception
     
     return user
 
-async def get_current_user_optional(
+async def get_current_user_optional_async(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db)
-) -> Optional[User]:
+    db: AsyncSession = Depends(get_async_db)
+) -> Optional[UserSnapshot]:
     """Get current user if authenticated, otherwise return None"""
     if not credentials:
         return None
     
     try:
-        return await get_current_user(credentials, db)
+        return await get_current_user_async(credentials, db)
     except HTTPException:
         return None
 
-# Auth endpoints functions
-def register_user(user_data: UserCreate, db: Session) -> User:
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only with the ADMIN_TOKEN in the X-Admin-Token header"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
+
+# Async auth endpoints functions
+async def register_user_async(user_data: UserCreate, db: AsyncSession) -> User:
     """Register a new user"""
-    # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User.id).where(User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
     
-    # Create new user
-    hashed_password = AuthService.hash_password(user_data.password)
-    db_user = User(
-        email=user_data.email,
-        hashed_password=hashed_password,
-        full_name=user_data.full_name,
-        is_active=True
+    hashed_password = await password_hasher.hash(user_data.password)
+    db_user = await db.scalar(
+        insert(User).values(
+            email=user_data.email,
+            hashed_password=hashed_password,
+            full_name=user_data.full_name,
+            is_active=True,
+            created_at=datetime.now()
+        ).returning(User)
     )
-    
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     
     return db_user
 
-def authenticate_user(email: str, password: str, db: Session) -> Optional[User]:
-    """Authenticate a user"""
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
+async def authenticate_user_async(email: str, password: str, db: AsyncSession) -> Optional[User]:
+    """Authenticate a user, upgrading the stored hash if BCRYPT_ROUNDS has changed"""
+    user = await db.scalar(select(User).where(User.email == email))
+    if not user or user.is_active is False:
         return None
-    if not AuthService.verify_password(password, user.hashed_password):
+    if not await password_hasher.verify(password, user.hashed_password):
         return None
+    if password_hasher.needs_rehash(user.hashed_password):
+        # Saved by the login's last_login commit
+        user.hashed_password = await password_hasher.hash(password)
+        PASSWORD_REHASHES.inc()
     return user
 
-def create_user_token(user: User) -> Token:
-    """Create access token for user"""
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = AuthService.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    return Token(access_token=access_token, token_type="bearer")
+async def set_user_active_async(user_id: int, is_active: bool, db: AsyncSession) -> bool:
+    """Activate or deactivate a user; deactivation takes effect on this worker immediately"""
+    updated = await db.scalar(update(User).where(User.id == user_id).values(is_active=is_active).returning(User.id))
+    await db.commit()
+    # Signed claims outlive cache entries; remember the revocation until they expire
+    user_cache.invalidate_user(user_id, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    return updated is not None
 
-# Conversation management functions
-def create_conversation(user_id: int, title: str, db: Session) -> Conversation:
-    """Create a new conversation for a user"""
-    conversation = Conversation(
-        user_id=user_id,
-        title=title
+async def record_login_async(user: User, db: AsyncSession):
+    """Update the user's last login time"""
+    user.last_login = datetime.utcnow()
+    await db.commit()
+
+# Async conversation management functions
+async def start_conversation_async(user_id: int, title: str, db: AsyncSession) -> int:
+    """Create a new conversation and return its ID"""
+    now = datetime.now()
+    conversation_id = await db.scalar(
+        insert(Conversation).values(user_id=user_id, title=title, created_at=now, updated_at=now).returning(Conversation.id)
     )
-    db.add(conversation)
-    db.commit()
-    db.refresh(conversation)
-    return conversation
-
-def add_message_to_conversation(
-    conversation_id: int,
-    user_message: str,
-    ai_response: str,
-    used_web_search: bool,
-    recommended_phones: List[int],
-    db: Session
-) -> ConversationMessage:
-    """Add a message to a conversation"""
-    import json
-    
-    message = ConversationMessage(
-        conversation_id=conversation_id,
-        user_message=user_message,
-        ai_response=ai_response,
-        used_web_search=used_web_search,
-        recommended_phones=json.dumps(recommended_phones) if recommended_phones else None
+    await db.commit()
+    return conversation_id
+
+async def touch_conversation_async(conversation_id: int, user_id: int, db: AsyncSession) -> bool:
+    """Bump a conversation's timestamp if the user owns it; False if it is missing or someone else's"""
+    touched = await db.scalar(
+        update(Conversation)
+        .where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+        .values(updated_at=datetime.now())
+        .returning(Conversation.id)
     )
-    
-    db.add(message)
-    
-    # Update conversation timestamp
-    conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
-    if conversation:
-        conversation.updated_at = datetime.utcnow()
-    
-    db.commit()
-    db.refresh(message)
-    return message
+    await db.commit()
+    return touched is not None
+
+# Cursor pagination: pages are keyed by (timestamp, id) so concurrent writes never shift them
+CONVERSATION_LIST_COLUMNS = (
+    Conversation.id, Conversation.user_id, Conversation.title, Conversation.message_count,
+    Conversation.last_message_preview, Conversation.created_at, Conversation.updated_at
+)
+MESSAGE_COLUMNS = (
+    ConversationMessage.id, ConversationMessage.conversation_id, ConversationMessage.user_message,
+    ConversationMessage.ai_response, ConversationMessage.used_web_search,
+    ConversationMessage.recommended_phones, ConversationMessage.timestamp
+)
+# Delta syncs re-send this much history, covering writes still queued in the transcript writer
+SYNC_OVERLAP_SECONDS = float(os.getenv("SYNC_OVERLAP_SECONDS", "5"))
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    data = json.dumps([timestamp.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Parse a cursor from encode_cursor, rejecting anything else with a 400"""
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
 
-def get_user_conversations(user_id: int, db: Session) -> List[Conversation]:
-    """Get all conversations for a user"""
-    return db.query(Conversation).filter(Conversation.user_id == user_id).order_by(Conversation.updated_at.desc()).all()
+def user_conversations_statement(user_id: int, limit: Optional[int] = None, cursor: Optional[str] = None,
+                                 since: Optional[datetime] = None) -> Select:
+    """Summary rows of a user's conversations, most recently active first"""
+    statement = select(*CONVERSATION_LIST_COLUMNS).where(Conversation.user_id == user_id)
+    if since is not None:
+        statement = statement.where(Conversation.updated_at > since - timedelta(seconds=SYNC_OVERLAP_SECONDS))
+    if cursor is not None:
+        updated_at, conversation_id = decode_cursor(cursor)
+        statement = statement.where(tuple_(Conversation.updated_at, Conversation.id) < tuple_(updated_at, conversation_id))
+    statement = statement.order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+    return statement.limit(limit) if limit else statement
 
-def get_conversation_messages(conversation_id: int, user_id: int, db: Session) -> List[ConversationMessage]:
-    """Get all messages for a specific conversation"""
-    return db.query(ConversationMessage).join(Conversation).filter(
+def conversation_messages_statement(conversation_id: int, user_id: int, limit: Optional[int] = None,
+                                    cursor: Optional[str] = None, since: Optional[datetime] = None) -> Select:
+    """Messages of one of the user's conversations, newest first"""
+    statement = select(*MESSAGE_COLUMNS).join(Conversation).where(
         Conversation.id == conversation_id,
         Conversation.user_id == user_id
-    ).order_by(ConversationMessage.timestamp.asc()).all()
+    )
+    if since is not None:
+        statement = statement.where(ConversationMessage.timestamp > since - timedelta(seconds=SYNC_OVERLAP_SECONDS))
+    if cursor is not None:
+        timestamp, message_id = decode_cursor(cursor)
+        statement = statement.where(tuple_(ConversationMessage.timestamp, ConversationMessage.id) < tuple_(timestamp, message_id))
+    statement = statement.order_by(ConversationMessage.timestamp.desc(), ConversationMessage.id.desc())
+    return statement.limit(limit) if limit else statement
+
+async def get_user_conversations_async(user_id: int, db: AsyncSession, limit: int = 20,
+                                       cursor: Optional[str] = None, since: Optional[datetime] = None) -> dict:
+    """One page of a user's conversation summaries and the cursor of the next page"""
+    rows = (await db.execute(user_conversations_statement(user_id, limit + 1, cursor, since))).all()
+    page = rows[:limit]
+    return {
+        "conversations": [row._asdict() for row in page],
+        "next_cursor": encode_cursor(page[-1].updated_at, page[-1].id) if len(rows) > limit else None
+    }
+
+async def get_conversation_messages_async(conversation_id: int, user_id: int, db: AsyncSession, limit: int = 50,
+                                          cursor: Optional[str] = None, since: Optional[datetime] = None) -> dict:
+    """The latest page of messages in display order and the cursor of the older page"""
+    rows = (await db.execute(conversation_messages_statement(conversation_id, user_id, limit + 1, cursor, since))).all()
+    page = rows[:limit]
+    return {
+        "messages": [row._asdict() for row in reversed(page)],
+        "next_cursor": encode_cursor(page[-1].timestamp, page[-1].id) if len(rows) > limit else None
+    }
@@ -0,0 +1,3 @@
+"""
+Benchmarks run against the app with fake LLM and web search providers
+"""
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for /chat, /phones and /compare
+
+Usage: python -m benchmarks.chat_benchmark [--catalog-size 10000] [--concurrency 16] [--requests 200]
+                                          [--llm-scale 1.0] [--output results.json] [--baseline old.json]
+
+The app runs in-process against a freshly seeded SQLite catalog, with the
+LLM and web search replaced by the deterministic fakes in benchmarks/fakes.py,
+so numbers are repeatable and cost nothing. Each endpoint is driven in its
+own phase at fixed concurrency; the report gives throughput, latency
+percentiles and where the time went (LLM calls by prompt type, web search,
+database, everything else).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+CHAT_QUERIES = [
+    "Best camera phone under ₹30k",
+    "Samsung phones under 50000",
+    "Gaming phone with a big battery under 40k",
+    "Compact Android phone for my parents",
+    "Tell me about the Pixel",
+    "OnePlus vs Xiaomi for battery life",
+    "Phones with fast charging below 25k",
+    "Best display under ₹60k",
+]
+PHONE_FILTERS = [
+    {},
+    {"brand": "Samsung"},
+    {"min_price": 20000, "max_price": 40000},
+    {"brand": "Xiaomi", "max_price": 30000},
+    {"min_ram": 8, "min_storage": 256},
+]
+
+Request = Tuple[str, str, Optional[dict], Optional[dict], Optional[dict]]  # method, url, params, json body, headers
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def instrument_database(engines) -> None:
+    """Record time spent executing SQL on these engines as the "db" stage"""
+    from sqlalchemy import event
+    from benchmarks.fakes import stage_timer
+
+    for engine in engines:
+        sync_engine = getattr(engine, "sync_engine", engine)
+
+        def before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("benchmark_query_start", []).append(time.perf_counter())
+
+        def after(conn, cursor, statement, parameters, context, executemany):
+            stage_timer.record("db", time.perf_counter() - conn.info["benchmark_query_start"].pop())
+
+        event.listen(sync_engine, "before_cursor_execute", before)
+        event.listen(sync_engine, "after_cursor_execute", after)
+
+
+async def run_phase(client, make_request: Callable[[int], Request], requests: int, concurrency: int,
+                    warmup: int = 0) -> dict:
+    """Send ``requests`` requests from ``concurrency`` workers and summarize them"""
+    from benchmarks.fakes import stage_timer
+
+    async def send(index: int):
+        method, url, params, body, headers = make_request(index)
+        return await client.request(method, url, params=params, json=body, headers=headers)
+
+    for index in range(warmup):
+        await send(index)
+
+    stage_timer.reset()
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    counter = itertools.count()
+
+    async def worker():
+        while True:
+            index = next(counter)
+            if index >= requests:
+                return
+            started = time.perf_counter()
+            try:
+                response = await send(warmup + index)
+                statuses[str(response.status_code)] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    count = len(latencies)
+    mean = sum(latencies) / count if count else 0.0
+    stages = {
+        stage: {"calls_per_request": round(totals["calls"] / count, 3),
+                "ms_per_request": round(totals["seconds"] * 1000 / count, 2)}
+        for stage, totals in sorted(stage_timer.snapshot().items())
+    } if count else {}
+    # Stages of one request run one after another, so the remainder is app and framework time
+    accounted = sum(stage["ms_per_request"] for stage in stages.values())
+    stages["other"] = {"calls_per_request": None, "ms_per_request": round(max(mean * 1000 - accounted, 0.0), 2)}
+    return {
+        "requests": count,
+        "errors": sum(n for status, n in statuses.items() if not status.startswith("2")),
+        "statuses": dict(statuses),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(mean * 1000, 2),
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0
+        },
+        "stages": stages
+    }
+
+
+async def register_users(client, count: int) -> List[str]:
+    """Bearer tokens for ``count`` new benchmark users"""
+    tokens = []
+    for index in range(count):
+        credentials = {"email": f"bench{index}@example.com", "password": "benchmark-password"}
+        response = await client.post("/auth/register", json={**credentials, "full_name": f"Bench {index}"})
+        response.raise_for_status()
+        response = await client.post("/auth/login", json=credentials)
+        response.raise_for_status()
+        tokens.append(response.json()["access_token"])
+    return tokens
+
+
+async def run_benchmark(args) -> dict:
+    import httpx
+    from database import engine, async_engine
+    from main import app
+
+    instrument_database([engine, async_engine])
+    await app.router.startup()
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            tokens = await register_users(client, args.users)
+            ids = [phone["id"] for phone in (await client.get("/phones", params={"limit": 1000})).json()]
+
+            def chat_request(index: int) -> Request:
+                body = {"message": CHAT_QUERIES[index % len(CHAT_QUERIES)], "session_id": f"bench-{index % 50}"}
+                # Every other chat is signed in when users were requested
+                headers = None
+                if tokens and index % 2:
+                    headers = {"Authorization": f"Bearer {tokens[index // 2 % len(tokens)]}"}
+                return "POST", "/chat", None, body, headers
+
+            def phones_request(index: int) -> Request:
+                return "GET", "/phones", {"limit": 50, **PHONE_FILTERS[index % len(PHONE_FILTERS)]}, None, None
+
+            def compare_request(index: int) -> Request:
+                first = (index * 7) % len(ids)
+                return "POST", "/compare", None, {"phone_ids": [ids[first], ids[(first + 1) % len(ids)]]}, None
+
+            phases = {"chat": chat_request, "phones": phones_request, "compare": compare_request}
+            for name in args.endpoints:
+                print(f"⏱️  {name}: {args.requests} requests at concurrency {args.concurrency}")
+                results[name] = await run_phase(client, phases[name], args.requests, args.concurrency, args.warmup)
+    finally:
+        await app.router.shutdown()
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_report(endpoints: Dict[str, dict], baseline: Optional[dict] = None):
+    for name, result in endpoints.items():
+        latency = result["latency_ms"]
+        print(f"\n{name}: {result['throughput_rps']} req/s, {result['errors']} errors {result['statuses']}")
+        print(f"  latency ms  p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+        for stage, timing in sorted(result["stages"].items(), key=lambda item: -item[1]["ms_per_request"]):
+            calls = "" if timing["calls_per_request"] is None else f" ({timing['calls_per_request']} calls)"
+            print(f"  {stage:<28} {timing['ms_per_request']:>9.2f} ms/request{calls}")
+
+        previous = (baseline or {}).get("endpoints", {}).get(name)
+        if previous:
+            changes = []
+            for label, new, old in (
+                ("throughput", result["throughput_rps"], previous["throughput_rps"]),
+                ("p50", latency["p50"], previous["latency_ms"]["p50"]),
+                ("p95", latency["p95"], previous["latency_ms"]["p95"]),
+                ("p99", latency["p99"], previous["latency_ms"]["p99"]),
+            ):
+                change = (new - old) / old * 100 if old else 0.0
+                changes.append(f"{label} {old} -> {new} ({change:+.1f}%)")
+            print("  vs baseline: " + ", ".join(changes))
+
+
+def configure_environment(database_path: str, rate_limit: bool = False, fast_auth: bool = True):
+    """Settings for the app under test; must run before the app is imported"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ["MIGRATE_ON_STARTUP"] = "false"
+    os.environ["FAST_START"] = "false"
+    os.environ.pop("SETUP_DB", None)
+    os.environ.pop("DATABASE_REPLICA_URL", None)
+    # Keep real providers out of the run even if keys are set in .env
+    for key in ("GEMINI_API_KEY", "OPENAI_API_KEY", "GOOGLE_API_KEY"):
+        os.environ[key] = ""
+    if not rate_limit:
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+    if fast_auth:
+        # Benchmark users sign in once; bcrypt cost is measured by the load test
+        os.environ.setdefault("BCRYPT_ROUNDS", "4")
+        os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def parse_latency_overrides(values: List[str]) -> Dict[str, str]:
+    overrides = {}
+    for value in values:
+        kind, _, spec = value.partition("=")
+        overrides[kind] = spec
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /chat, /phones and /compare with fake LLM and search")
+    parser.add_argument("--catalog-size", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per endpoint")
+    parser.add_argument("--endpoints", nargs="+", default=["chat", "phones", "compare"],
+                        choices=["chat", "phones", "compare"])
+    parser.add_argument("--users", type=int, default=0, help="signed-in users sending every other chat")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-scale", type=float, default=1.0, help="multiply every fake LLM and search latency")
+    parser.add_argument("--llm-latency", action="append", default=[], metavar="TYPE=SPEC",
+                        help='e.g. response=lognormal:1500:0.35 or safety=fixed:100')
+    parser.add_argument("--search-latency", default=None, metavar="SPEC")
+    parser.add_argument("--web-search-ratio", type=float, default=0.25)
+    parser.add_argument("--responses", help="JSON file of canned LLM output by prompt type")
+    parser.add_argument("--rate-limit", action="store_true", help="keep rate limiting on")
+    parser.add_argument("--database", help="SQLite file to seed (default: a temporary file)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    workdir = None
+    database_path = args.database
+    if database_path is None:
+        workdir = tempfile.TemporaryDirectory(prefix="chat-benchmark-")
+        database_path = os.path.join(workdir.name, "benchmark.db")
+    elif os.path.exists(database_path):
+        os.remove(database_path)
+    configure_environment(database_path, args.rate_limit)
+
+    from benchmarks.fakes import (
+        DEFAULT_SEARCH_LATENCY, FakeLLMProvider, FakeWebSearch, install_fakes, seed_catalog
+    )
+
+    print(f"🌱 Seeding {args.catalog_size} phones into {database_path}")
+    catalog = seed_catalog(args.catalog_size, args.seed)
+    responses = None
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as f:
+            responses = json.load(f)
+    install_fakes(
+        FakeLLMProvider(parse_latency_overrides(args.llm_latency), args.llm_scale, args.seed, responses,
+                        args.web_search_ratio),
+        FakeWebSearch(args.search_latency or DEFAULT_SEARCH_LATENCY, args.llm_scale, args.seed)
+    )
+
+    endpoints = asyncio.run(run_benchmark(args))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(endpoints, baseline)
+
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "catalog": {"loaded": catalog["loaded"], "seconds": catalog["seconds"]},
+        "endpoints": endpoints
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+    if workdir is not None:
+        workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Run the API on a seeded catalog with the fake LLM and web search
+
+Usage: python -m benchmarks.fake_server [--port 8000] [--catalog-size 10000] [--llm-scale 1.0]
+
+A real uvicorn server for load tests (benchmarks/load_test.py): requests
+go over the network and through every middleware, but the LLM and search
+calls are the deterministic fakes from benchmarks/fakes.py, so a run costs
+nothing and the only variable is the app. Password hashing keeps its
+production cost unless --fast-auth is given, so login bursts stay honest.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from benchmarks.chat_benchmark import configure_environment, parse_latency_overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API with fake LLM and search providers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--catalog-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-scale", type=float, default=1.0, help="multiply every fake LLM and search latency")
+    parser.add_argument("--llm-latency", action="append", default=[], metavar="TYPE=SPEC",
+                        help='e.g. response=lognormal:1500:0.35 or safety=fixed:100')
+    parser.add_argument("--search-latency", default=None, metavar="SPEC")
+    parser.add_argument("--web-search-ratio", type=float, default=0.25)
+    parser.add_argument("--responses", help="JSON file of canned LLM output by prompt type")
+    parser.add_argument("--rate-limit", action="store_true", help="keep rate limiting on")
+    parser.add_argument("--fast-auth", action="store_true", help="cheap bcrypt rounds and inline hashing")
+    parser.add_argument("--database", help="SQLite file to seed (default: a temporary file)")
+    args = parser.parse_args()
+
+    workdir = None
+    database_path = args.database
+    if database_path is None:
+        workdir = tempfile.TemporaryDirectory(prefix="fake-server-")
+        database_path = os.path.join(workdir.name, "load.db")
+    elif os.path.exists(database_path):
+        os.remove(database_path)
+    configure_environment(database_path, args.rate_limit, args.fast_auth)
+
+    import uvicorn
+    from benchmarks.fakes import (
+        DEFAULT_SEARCH_LATENCY, FakeLLMProvider, FakeWebSearch, install_fakes, seed_catalog
+    )
+
+    print(f"🌱 Seeding {args.catalog_size} phones into {database_path}")
+    seed_catalog(args.catalog_size, args.seed)
+    responses = None
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as f:
+            responses = json.load(f)
+    install_fakes(
+        FakeLLMProvider(parse_latency_overrides(args.llm_latency), args.llm_scale, args.seed, responses,
+                        args.web_search_ratio),
+        FakeWebSearch(args.search_latency or DEFAULT_SEARCH_LATENCY, args.llm_scale, args.seed)
+    )
+
+    from main import app
+    try:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+    finally:
+        if workdir is not None:
+            workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
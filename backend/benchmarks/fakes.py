@@ -0,0 +1,299 @@
+"""
+Deterministic stand-ins for the LLM, web search and phone catalog
+
+Import after DATABASE_URL is set: like the app, this pulls in the database
+module, which creates its engines on import.
+"""
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional
+
+from ai.llm_service import LLMProvider, llm_service
+from utils.web_search import WebSearchService
+
+# Prompt type -> text that only its template contains (see ai/templates.py)
+PROMPT_MARKERS = [
+    ("safety", "You are a safety checker"),
+    ("query_analysis", "Available Brands:"),
+    ("web_search_decision", "Database Results Count:"),
+    ("query_enhancement", "You are a search query optimizer"),
+    ("intent", "Analyze the user's intent"),
+    ("response", "RESPONSE STRATEGY:"),
+]
+
+# Roughly what Gemini Flash takes per prompt type
+DEFAULT_LLM_LATENCY = {
+    "safety": "lognormal:150:0.3",
+    "query_analysis": "lognormal:450:0.3",
+    "web_search_decision": "lognormal:250:0.3",
+    "query_enhancement": "lognormal:200:0.3",
+    "intent": "lognormal:300:0.3",
+    "response": "lognormal:1500:0.35",
+    "other": "fixed:200",
+}
+DEFAULT_SEARCH_LATENCY = "lognormal:400:0.4"
+
+USER_QUERY = re.compile(r'(?:User Query|Current user query): "(.*)"')
+PHONE_NAME = re.compile(r"^Name: (.+)$", re.MULTILINE)
+BRANDS_LINE = re.compile(r"^Available Brands: (.*)$", re.MULTILINE)
+MAX_PRICE = re.compile(r"(?:under|below|less than|within)\s*₹?\s*(\d+(?:\.\d+)?)\s*(k)?", re.IGNORECASE)
+FEATURE_WORDS = ("camera", "gaming", "battery", "compact", "android", "display", "charging")
+
+
+class LatencyModel:
+    """Seeded latency distribution
+
+    Specs are "fixed:MS", "uniform:LOW_MS:HIGH_MS" or
+    "lognormal:MEDIAN_MS:SIGMA"; ``scale`` multiplies every sample.
+    """
+
+    def __init__(self, spec: str, seed: int = 0, scale: float = 1.0):
+        self.spec = spec
+        self.scale = scale
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(param) for param in params]
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """Next latency in seconds"""
+        with self._lock:
+            if self.kind == "fixed":
+                ms = self.params[0]
+            elif self.kind == "uniform":
+                ms = self._random.uniform(*self.params)
+            else:
+                median, sigma = self.params
+                ms = self._random.lognormvariate(math.log(median), sigma)
+        return ms * self.scale / 1000
+
+
+class StageTimer:
+    """Time spent per stage (LLM call type, web search, database) across requests"""
+
+    def __init__(self):
+        self._totals: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            total = self._totals[stage]
+            total[0] += 1
+            total[1] += seconds
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {stage: {"calls": calls, "seconds": seconds} for stage, (calls, seconds) in self._totals.items()}
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+
+
+# Global stage timer instance
+stage_timer = StageTimer()
+
+
+def classify_prompt(prompt: str) -> str:
+    for kind, marker in PROMPT_MARKERS:
+        if marker in prompt:
+            return kind
+    return "other"
+
+
+def _user_query(prompt: str) -> str:
+    match = USER_QUERY.search(prompt)
+    return match.group(1) if match else ""
+
+
+def _max_price(query: str) -> Optional[float]:
+    match = MAX_PRICE.search(query)
+    if not match:
+        return None
+    amount = float(match.group(1))
+    return amount * 1000 if match.group(2) else amount
+
+
+class FakeLLMProvider(LLMProvider):
+    """LLM provider answering each prompt type with canned output after a simulated delay
+
+    Answers depend only on the prompt, so runs are repeatable: brands and a
+    price cap are read from the query, and responses mention the first
+    phones listed in the prompt. ``responses`` overrides the text returned
+    for a prompt type; ``web_search_ratio`` of decisions ask for web search.
+    """
+    name = "fake"
+
+    def __init__(self, latency: Dict[str, str] = None, scale: float = 1.0, seed: int = 0,
+                 responses: Dict[str, str] = None, web_search_ratio: float = 0.25):
+        specs = {**DEFAULT_LLM_LATENCY, **(latency or {})}
+        self.latency = {
+            kind: LatencyModel(spec, seed + index, scale) for index, (kind, spec) in enumerate(sorted(specs.items()))
+        }
+        self.responses = responses or {}
+        self.web_search_ratio = web_search_ratio
+
+    async def generate(self, prompt: str) -> str:
+        kind = classify_prompt(prompt)
+        started = time.perf_counter()
+        await asyncio.sleep(self.latency.get(kind, self.latency["other"]).sample())
+        text = self.responses.get(kind) or self._answer(kind, prompt)
+        stage_timer.record(f"llm.{kind}", time.perf_counter() - started)
+        return text
+
+    def _answer(self, kind: str, prompt: str) -> str:
+        query = _user_query(prompt)
+        if kind == "safety":
+            return "SAFE"
+        if kind == "query_analysis":
+            match = BRANDS_LINE.search(prompt)
+            brands = [brand for brand in (match.group(1).split(", ") if match else []) if brand and brand.lower() in query.lower()]
+            return json.dumps({
+                "brands": brands,
+                "models": [],
+                "price_range": {"min": None, "max": _max_price(query)},
+                "features": [word for word in FEATURE_WORDS if word in query.lower()],
+                "confidence": 0.9
+            })
+        if kind == "web_search_decision":
+            # Stable per query rather than random, so reruns take the same path
+            bucket = sum(query.encode()) % 100
+            return "WEB_SEARCH" if bucket < self.web_search_ratio * 100 else "DATABASE_ONLY"
+        if kind == "query_enhancement":
+            return f"{query} latest price specifications review"
+        if kind == "intent":
+            return json.dumps({
+                "intent": "comparison" if " vs " in query.lower() else "recommendation",
+                "budget_range": {"min": None, "max": _max_price(query)},
+                "preferred_brands": [],
+                "feature_focus": [word for word in FEATURE_WORDS if word in query.lower()],
+                "urgency": "medium",
+                "needs_multiple_options": True
+            })
+        if kind == "response":
+            names = PHONE_NAME.findall(prompt)[:3]
+            if not names:
+                return "I couldn't find phones matching that. Could you tell me your budget and must-have features?"
+            picks = "\n".join(
+                f"{rank}. **{name}** - strong all-rounder with a good display, dependable battery life "
+                f"and a capable main camera for the price."
+                for rank, name in enumerate(names, 1)
+            )
+            return (f"Here are my top picks for \"{query}\":\n\n{picks}\n\n"
+                    "Would you like a detailed comparison, or should I narrow these down by camera or battery?")
+        return "OK"
+
+
+class FakeWebSearch:
+    """Replaces WebSearchService.search_phone_info with canned results after a simulated delay"""
+
+    def __init__(self, latency: str = DEFAULT_SEARCH_LATENCY, scale: float = 1.0, seed: int = 0):
+        self.latency = LatencyModel(latency, seed, scale)
+        self._original = None
+
+    def search_phone_info(self, query: str, num_results: int = 3) -> list:
+        started = time.perf_counter()
+        # The agent calls search from a worker thread, as with the real client
+        time.sleep(self.latency.sample())
+        results = [
+            {
+                "title": f"{query} - review #{index}",
+                "snippet": f"Hands-on review of {query}: display, camera, battery life and pricing compared "
+                           f"with rivals in the same segment.",
+                "link": f"https://reviews.example.com/{index}"
+            }
+            for index in range(1, num_results + 1)
+        ]
+        stage_timer.record("web_search", time.perf_counter() - started)
+        return results
+
+    def install(self):
+        fake = self
+        self._original = WebSearchService.search_phone_info
+        WebSearchService.search_phone_info = lambda service, query, num_results=3: fake.search_phone_info(query, num_results)
+
+    def uninstall(self):
+        if self._original is not None:
+            WebSearchService.search_phone_info = self._original
+            self._original = None
+
+
+def install_fakes(llm: FakeLLMProvider = None, search: FakeWebSearch = None):
+    """Route every LLM call and web search in this process to the fakes"""
+    llm = llm or FakeLLMProvider()
+    search = search or FakeWebSearch()
+    llm_service.register_provider(llm.name, llm, primary=True)
+    search.install()
+    return llm, search
+
+
+BRAND_SERIES = {
+    "Apple": ["iPhone"],
+    "Samsung": ["Galaxy S", "Galaxy A", "Galaxy M"],
+    "Xiaomi": ["Redmi Note", "Xiaomi"],
+    "OnePlus": ["OnePlus", "OnePlus Nord"],
+    "Google": ["Pixel"],
+    "Realme": ["Realme GT", "Realme Narzo"],
+    "Vivo": ["Vivo X", "Vivo V"],
+    "Motorola": ["Moto Edge", "Moto G"],
+    "Nothing": ["Nothing Phone"],
+}
+PROCESSORS = ["Snapdragon 8 Gen 3", "Snapdragon 7s Gen 2", "Dimensity 7200", "Dimensity 9300", "Tensor G3", "A17 Pro"]
+
+
+def generate_phones(size: int, seed: int = 0) -> Iterator[dict]:
+    """``size`` catalog records with unique names and realistic spreads of price and specs"""
+    rng = random.Random(seed)
+    brands = sorted(BRAND_SERIES)
+    for index in range(size):
+        brand = brands[index % len(brands)]
+        series = rng.choice(BRAND_SERIES[brand])
+        ram = rng.choice([4, 6, 8, 12, 16])
+        yield {
+            "name": f"{series} {10 + index // 100} {index % 100:02d}",
+            "brand": brand,
+            "price": round(rng.lognormvariate(math.log(25000), 0.6), -2),
+            "display_size": round(rng.uniform(6.0, 6.9), 1),
+            "display_resolution": rng.choice(["2400 x 1080", "2772 x 1240", "3120 x 1440"]),
+            "processor": rng.choice(PROCESSORS),
+            "ram": ram,
+            "storage": rng.choice([64, 128, 256, 512]),
+            "camera_main": rng.choice(["50MP + 8MP", "50MP + 12MP + 10MP", "108MP + 8MP + 2MP", "200MP + 50MP"]),
+            "camera_front": rng.choice(["8MP", "16MP", "32MP"]),
+            "battery_capacity": rng.choice([4000, 4500, 5000, 5500, 6000]),
+            "charging_speed": rng.choice(["18W", "33W", "67W", "100W"]),
+            "os": "iOS 17" if brand == "Apple" else "Android 14",
+            "weight": rng.randint(160, 230),
+            "dimensions": "160.0 x 75.0 x 8.0 mm",
+            "colors": "Black, Blue, Silver",
+            "features": rng.choice(["5G, NFC", "5G, IP68, Wireless charging", "Stereo speakers, 120Hz display"]),
+            "description": f"{brand} {series} phone with {ram}GB RAM",
+            "ois": rng.random() < 0.6,
+            "eis": True,
+            "wireless_charging": rng.random() < 0.3,
+            "water_resistance": rng.choice(["IP54", "IP67", "IP68"]),
+            "fingerprint_sensor": brand != "Apple",
+            "face_unlock": True,
+            "is_active": True
+        }
+
+
+def seed_catalog(size: int, seed: int = 0) -> dict:
+    """Create the schema, brands and models, and load ``size`` generated phones"""
+    from catalog_loader import load_catalog
+    from database import create_tables
+    from seed_brands import seed_brands_and_models
+
+    create_tables()
+    seed_brands_and_models()
+    return load_catalog(generate_phones(size, seed), replace=True)
@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""
+Scenario-based load test for the HTTP API
+
+Usage: python -m benchmarks.load_test [--url http://127.0.0.1:8000] [--profile ramp]
+                                      [--mix anonymous_chat=40,browse=30] [--slo "POST /chat:p99<8000"]
+
+Virtual users loop over a weighted mix of shopper scenarios (anonymous
+chat, signed-in multi-turn chat, browsing /phones with filters, /compare
+and login bursts) while a profile ramps their number up and down. Without
+--url a local server with the fake LLM and web search is started
+(benchmarks/fake_server.py). The report breaks latency down per request
+and per time window, names the user count where the latency SLOs first
+broke, and the exit status is 1 when an SLO fails over the whole run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.chat_benchmark import CHAT_QUERIES, PHONE_FILTERS, git_commit, percentile
+
+# Follow-ups a signed-in shopper sends after the first question
+FOLLOW_UPS = [
+    "What about the battery life?",
+    "Show me something cheaper",
+    "Which one has the better camera?",
+    "Any with 5G and fast charging?",
+    "Compare the top two",
+]
+
+DEFAULT_MIX = {"anonymous_chat": 35, "member_chat": 25, "browse": 25, "compare": 10, "login_burst": 5}
+
+# Comma-separated DURATION:USERS stages; each ramps linearly from the previous user count
+PROFILES = {
+    "smoke": "5s:2,20s:2",
+    "steady": "30s:20,120s:20",
+    "ramp": "60s:25,60s:50,60s:100,60s:150,60s:200",
+    "step": "1s:10,60s:10,1s:25,60s:25,1s:50,60s:50,1s:100,60s:100,1s:150,60s:150",
+    "spike": "20s:10,40s:10,5s:100,40s:100,5s:10,40s:10",
+}
+
+DEFAULT_SLOS = [
+    "POST /chat:p99<8000",
+    "POST /compare:p99<8000",
+    "GET /phones:p95<500",
+    "GET /phones/{id}:p95<300",
+    "POST /auth/login:p99<3000",
+    "error_rate<0.01",
+]
+
+SLO_PATTERN = re.compile(r"^(?:(?P<name>.+):)?(?P<metric>p\d{1,2}|mean|max|error_rate)\s*<\s*(?P<limit>\d+(?:\.\d+)?)$")
+DURATION_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)(ms|s|m)?$")
+
+Stage = Tuple[float, int]  # seconds, users at the end of the stage
+
+
+def parse_duration(value: str) -> float:
+    match = DURATION_PATTERN.match(value.strip())
+    if not match:
+        raise ValueError(f"invalid duration: {value!r}")
+    amount, unit = float(match.group(1)), match.group(2) or "s"
+    return amount / 1000 if unit == "ms" else amount * 60 if unit == "m" else amount
+
+
+def parse_profile(value: str) -> List[Stage]:
+    """Stages from a preset name or a "30s:10,2m:50" string"""
+    stages = []
+    for part in PROFILES.get(value, value).split(","):
+        duration, _, users = part.strip().partition(":")
+        stages.append((parse_duration(duration), int(users)))
+    return stages
+
+
+def target_users(stages: List[Stage], elapsed: float) -> int:
+    """Users the profile asks for ``elapsed`` seconds into the run"""
+    previous = 0
+    for duration, users in stages:
+        if elapsed < duration:
+            return round(previous + (users - previous) * elapsed / duration)
+        elapsed -= duration
+        previous = users
+    return previous
+
+
+def parse_mix(value: Optional[str]) -> Dict[str, float]:
+    if not value:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise ValueError(f"unknown scenario {name.strip()!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class SLO:
+    """An assertion such as "POST /chat:p99<8000" (milliseconds) or "error_rate<0.01" """
+
+    def __init__(self, spec: str):
+        match = SLO_PATTERN.match(spec.strip())
+        if not match:
+            raise ValueError(f"invalid SLO: {spec!r}")
+        self.spec = spec.strip()
+        self.name = match.group("name") or "all"
+        self.metric = match.group("metric")
+        self.limit = float(match.group("limit"))
+
+    @property
+    def is_latency(self) -> bool:
+        return self.metric != "error_rate"
+
+    def evaluate(self, samples: List[tuple]) -> Optional[float]:
+        """Observed value over these samples, None when none match"""
+        if self.name != "all":
+            samples = [sample for sample in samples if sample[1] == self.name]
+        if not samples:
+            return None
+        if self.metric == "error_rate":
+            return sum(1 for sample in samples if not sample[3]) / len(samples)
+        latencies = sorted(sample[2] * 1000 for sample in samples)
+        if self.metric == "mean":
+            return sum(latencies) / len(latencies)
+        if self.metric == "max":
+            return latencies[-1]
+        return percentile(latencies, float(self.metric[1:]))
+
+
+class Recorder:
+    """Every request and scenario iteration of the run, stamped with the active user count"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.active_users = 0
+        # (seconds since start, request name, seconds, ok, status, active users)
+        self.requests: List[tuple] = []
+        # (seconds since start, scenario, seconds, ok)
+        self.scenarios: List[tuple] = []
+
+    def record_request(self, name: str, seconds: float, status: str):
+        self.requests.append((time.perf_counter() - self.started, name, seconds, status.startswith("2"), status,
+                              self.active_users))
+
+    def record_scenario(self, name: str, seconds: float, ok: bool):
+        self.scenarios.append((time.perf_counter() - self.started, name, seconds, ok))
+
+
+class ScenarioFailed(Exception):
+    pass
+
+
+class VirtualUser:
+    """One shopper: runs scenarios from the mix back to back with think time in between"""
+
+    def __init__(self, index: int, client, recorder: Recorder, mix: Dict[str, float], accounts: List[dict],
+                 think_time: float, seed: int):
+        self.index = index
+        self.client = client
+        self.recorder = recorder
+        self.accounts = accounts
+        self.think_time = think_time
+        self.rng = random.Random(seed * 100003 + index)
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.session_id = f"load-{seed}-{index}"
+        self.account = accounts[index % len(accounts)] if accounts else None
+        self.token: Optional[str] = None
+
+    async def request(self, name: str, method: str, url: str, **kwargs):
+        """Send one request under ``name`` and record it; raises ScenarioFailed on errors"""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except Exception as e:
+            response, status = None, type(e).__name__
+        self.recorder.record_request(name, time.perf_counter() - started, status)
+        if response is None or response.status_code >= 400:
+            raise ScenarioFailed(f"{name}: {status}")
+        return response
+
+    async def login(self) -> str:
+        response = await self.request("POST /auth/login", "POST", "/auth/login", json=self.account)
+        self.token = response.json()["access_token"]
+        return self.token
+
+    async def run(self, stop: asyncio.Event):
+        while not stop.is_set():
+            name = self.rng.choices(self.names, self.weights)[0]
+            started = time.perf_counter()
+            ok = True
+            try:
+                await SCENARIOS[name](self)
+            except ScenarioFailed:
+                ok = False
+            self.recorder.record_scenario(name, time.perf_counter() - started, ok)
+            if self.think_time:
+                try:
+                    await asyncio.wait_for(stop.wait(), self.think_time * self.rng.uniform(0.5, 1.5))
+                except asyncio.TimeoutError:
+                    pass
+
+
+async def anonymous_chat(user: VirtualUser):
+    """A visitor asks one or two questions without signing in"""
+    for turn in range(user.rng.randint(1, 2)):
+        message = user.rng.choice(CHAT_QUERIES) if turn == 0 else user.rng.choice(FOLLOW_UPS)
+        await user.request("POST /chat", "POST", "/chat", json={"message": message, "session_id": user.session_id})
+
+
+async def member_chat(user: VirtualUser):
+    """A signed-in shopper holds a multi-turn conversation, then looks at their history"""
+    if user.account is None:
+        return await anonymous_chat(user)
+    if user.token is None:
+        await user.login()
+    headers = {"Authorization": f"Bearer {user.token}"}
+    messages = [user.rng.choice(CHAT_QUERIES)] + user.rng.sample(FOLLOW_UPS, user.rng.randint(1, 3))
+    for message in messages:
+        await user.request("POST /chat", "POST", "/chat", headers=headers,
+                           json={"message": message, "session_id": user.session_id})
+    await user.request("GET /conversations", "GET", "/conversations", params={"limit": 10}, headers=headers)
+
+
+async def browse(user: VirtualUser):
+    """Filter the catalog and open a couple of phones"""
+    params = {"limit": 20, **user.rng.choice(PHONE_FILTERS)}
+    phones = (await user.request("GET /phones", "GET", "/phones", params=params)).json()
+    for phone in user.rng.sample(phones, min(len(phones), user.rng.randint(1, 2))):
+        await user.request("GET /phones/{id}", "GET", f"/phones/{phone['id']}")
+
+
+async def compare(user: VirtualUser):
+    """Pick two or three phones from a filtered list and compare them"""
+    params = {"limit": 20, **user.rng.choice(PHONE_FILTERS)}
+    phones = (await user.request("GET /phones", "GET", "/phones", params=params)).json()
+    if len(phones) < 2:
+        return
+    ids = [phone["id"] for phone in user.rng.sample(phones, min(len(phones), user.rng.randint(2, 3)))]
+    await user.request("POST /compare", "POST", "/compare", json={"phone_ids": ids})
+
+
+async def login_burst(user: VirtualUser):
+    """Several devices of one account sign in at once, as after a session expiry"""
+    if user.account is None:
+        return
+    size = user.rng.randint(3, 6)
+    results = await asyncio.gather(
+        *[user.request("POST /auth/login", "POST", "/auth/login", json=user.account) for _ in range(size)],
+        return_exceptions=True
+    )
+    if any(isinstance(result, Exception) for result in results):
+        raise ScenarioFailed("login burst")
+    user.token = results[-1].json()["access_token"]
+
+
+SCENARIOS = {
+    "anonymous_chat": anonymous_chat,
+    "member_chat": member_chat,
+    "browse": browse,
+    "compare": compare,
+    "login_burst": login_burst,
+}
+
+
+async def create_accounts(client, count: int, seed: int) -> List[dict]:
+    """Credentials of ``count`` load-test users, registering the ones that do not exist yet"""
+    accounts = []
+    for index in range(count):
+        credentials = {"email": f"load{seed}-{index}@example.com", "password": "load-test-password"}
+        response = await client.post("/auth/register", json={**credentials, "full_name": f"Load {index}"})
+        if response.status_code != 400:  # 400: already registered by an earlier run
+            response.raise_for_status()
+        accounts.append(credentials)
+    return accounts
+
+
+async def run_load(client, stages: List[Stage], mix: Dict[str, float], accounts: List[dict], think_time: float,
+                   seed: int, drain: float) -> Recorder:
+    """Drive the profile: start users as it ramps up, stop them (after their current scenario) as it ramps down"""
+    recorder = Recorder()
+    users: List[Tuple[asyncio.Task, asyncio.Event]] = []
+    total = sum(duration for duration, _ in stages)
+    next_index = 0
+    last_report = 0.0
+
+    while True:
+        elapsed = time.perf_counter() - recorder.started
+        if elapsed >= total:
+            break
+        target = target_users(stages, elapsed)
+        while len(users) < target:
+            stop = asyncio.Event()
+            user = VirtualUser(next_index, client, recorder, mix, accounts, think_time, seed)
+            users.append((asyncio.create_task(user.run(stop)), stop))
+            next_index += 1
+        while len(users) > target:
+            users.pop()[1].set()
+        recorder.active_users = len(users)
+        if elapsed - last_report >= 10:
+            last_report = elapsed
+            print(f"  {elapsed:6.0f}s  {len(users):4d} users  {len(recorder.requests):6d} requests")
+        await asyncio.sleep(0.2)
+
+    for _, stop in users:
+        stop.set()
+    tasks = [task for task, _ in users]
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=drain)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return recorder
+
+
+def summarize(samples: List[tuple], seconds: float) -> dict:
+    latencies = sorted(sample[2] * 1000 for sample in samples)
+    count = len(latencies)
+    errors = sum(1 for sample in samples if not sample[3])
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(count / seconds, 2) if seconds else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / count, 2) if count else 0.0,
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+    }
+
+
+def build_report(recorder: Recorder, slos: List[SLO], window: float) -> dict:
+    samples = recorder.requests
+    seconds = max((sample[0] for sample in samples), default=0.0)
+
+    by_name = defaultdict(list)
+    for sample in samples:
+        by_name[sample[1]].append(sample)
+    requests = {name: {**summarize(group, seconds), "statuses": dict(Counter(sample[4] for sample in group))}
+                for name, group in sorted(by_name.items())}
+
+    by_scenario = defaultdict(list)
+    for sample in recorder.scenarios:
+        by_scenario[sample[1]].append(sample)
+    scenarios = {}
+    for name, group in sorted(by_scenario.items()):
+        durations = sorted(sample[2] * 1000 for sample in group)
+        scenarios[name] = {
+            "iterations": len(group),
+            "failures": sum(1 for sample in group if not sample[3]),
+            "duration_ms": {"p50": round(percentile(durations, 50), 2), "p95": round(percentile(durations, 95), 2)},
+        }
+
+    # Per-window latency SLO checks locate the knee: the first window where p99 and friends broke
+    latency_slos = [slo for slo in slos if slo.is_latency]
+    windows = []
+    buckets = defaultdict(list)
+    for sample in samples:
+        buckets[int(sample[0] // window)].append(sample)
+    knee = None
+    capacity = 0
+    for index in sorted(buckets):
+        bucket = buckets[index]
+        chat = [sample for sample in bucket if sample[1] == "POST /chat"]
+        summary = summarize(bucket, window)
+        violations = []
+        for slo in latency_slos:
+            value = slo.evaluate(bucket)
+            if value is not None and value >= slo.limit:
+                violations.append(slo.spec)
+        users = max(sample[5] for sample in bucket)
+        windows.append({
+            "start_s": round(index * window, 1),
+            "users": users,
+            "throughput_rps": summary["throughput_rps"],
+            "error_rate": summary["error_rate"],
+            "p50_ms": summary["latency_ms"]["p50"],
+            "p99_ms": summary["latency_ms"]["p99"],
+            "chat_p99_ms": summarize(chat, window)["latency_ms"]["p99"] if chat else None,
+            "slo_violations": violations,
+        })
+        if violations and knee is None:
+            knee = {"start_s": round(index * window, 1), "users": users, "violations": violations}
+        if knee is None:
+            capacity = max(capacity, users)
+
+    assertions = []
+    for slo in slos:
+        value = slo.evaluate(samples)
+        assertions.append({
+            "slo": slo.spec,
+            "observed": None if value is None else round(value, 4 if slo.metric == "error_rate" else 2),
+            "passed": value is None or value < slo.limit,
+        })
+
+    return {
+        "seconds": round(seconds, 2),
+        "total": summarize(samples, seconds),
+        "requests": requests,
+        "scenarios": scenarios,
+        "windows": windows,
+        "capacity": {"max_users_within_latency_slos": capacity, "knee": knee},
+        "slos": assertions,
+        "passed": all(assertion["passed"] for assertion in assertions),
+    }
+
+
+def print_report(report: dict):
+    total = report["total"]
+    print(f"\n{total['requests']} requests in {report['seconds']}s ({total['throughput_rps']} req/s), "
+          f"error rate {total['error_rate']:.2%}")
+    print(f"\n  {'request':<22} {'count':>7} {'err%':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for name, result in report["requests"].items():
+        latency = result["latency_ms"]
+        print(f"  {name:<22} {result['requests']:>7} {result['error_rate'] * 100:>6.2f} {latency['p50']:>9.1f} "
+              f"{latency['p95']:>9.1f} {latency['p99']:>9.1f} {latency['max']:>9.1f}")
+    print(f"\n  {'scenario':<22} {'runs':>7} {'failed':>7} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, result in report["scenarios"].items():
+        print(f"  {name:<22} {result['iterations']:>7} {result['failures']:>7} "
+              f"{result['duration_ms']['p50']:>9.1f} {result['duration_ms']['p95']:>9.1f}")
+
+    print(f"\n  {'window':>7} {'users':>6} {'req/s':>8} {'err%':>6} {'p50':>9} {'p99':>9} {'chat p99':>9}")
+    for window in report["windows"]:
+        chat = "-" if window["chat_p99_ms"] is None else f"{window['chat_p99_ms']:.1f}"
+        flag = "  ✗ " + ", ".join(window["slo_violations"]) if window["slo_violations"] else ""
+        print(f"  {window['start_s']:>6.0f}s {window['users']:>6} {window['throughput_rps']:>8.1f} "
+              f"{window['error_rate'] * 100:>6.2f} {window['p50_ms']:>9.1f} {window['p99_ms']:>9.1f} {chat:>9}{flag}")
+
+    capacity = report["capacity"]
+    if capacity["knee"]:
+        print(f"\n📈 Latency SLOs held up to {capacity['max_users_within_latency_slos']} users; first broke at "
+              f"{capacity['knee']['users']} users ({capacity['knee']['start_s']}s)")
+    else:
+        print(f"\n📈 Latency SLOs held for the whole run (peak {capacity['max_users_within_latency_slos']} users)")
+
+    print("\nSLOs:")
+    for assertion in report["slos"]:
+        mark = "✅" if assertion["passed"] else "❌"
+        observed = "no samples" if assertion["observed"] is None else assertion["observed"]
+        print(f"  {mark} {assertion['slo']}  (observed {observed})")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_healthy(client, server: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"fake server exited with status {server.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"fake server not healthy after {timeout:.0f}s")
+
+
+def start_fake_server(args, port: int) -> subprocess.Popen:
+    command = [sys.executable, "-m", "benchmarks.fake_server", "--port", str(port),
+               "--catalog-size", str(args.catalog_size), "--llm-scale", str(args.llm_scale),
+               "--seed", str(args.seed)]
+    if args.rate_limit:
+        command.append("--rate-limit")
+    if args.fast_auth:
+        command.append("--fast-auth")
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen(command, cwd=backend_dir)
+
+
+async def main_async(args) -> dict:
+    import httpx
+
+    stages = parse_profile(args.profile)
+    mix = parse_mix(args.mix)
+    slos = [SLO(spec) for spec in (args.slo or DEFAULT_SLOS)]
+
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        print(f"🚀 Starting fake server on {url} ({args.catalog_size} phones)")
+        server = start_fake_server(args, port)
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+            if server is not None:
+                await wait_until_healthy(client, server, args.startup_timeout)
+            accounts = await create_accounts(client, args.accounts, args.seed) if args.accounts else []
+            total = sum(duration for duration, _ in stages)
+            print(f"⏱️  Profile {args.profile!r}: {total:.0f}s, up to {max(users for _, users in stages)} users")
+            recorder = await run_load(client, stages, mix, accounts, args.think_time, args.seed, args.drain)
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    report = build_report(recorder, slos, args.window)
+    report["config"] = {"url": url, "profile": args.profile, "stages": stages, "mix": mix,
+                        "think_time": args.think_time, "accounts": args.accounts, "seed": args.seed,
+                        "fake_server": server is not None}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scenario-based load test with ramp profiles and SLO checks")
+    parser.add_argument("--url", help="server to test (default: start benchmarks.fake_server locally)")
+    parser.add_argument("--profile", default="ramp",
+                        help=f"preset ({', '.join(PROFILES)}) or stages like '30s:10,2m:50,30s:0'")
+    parser.add_argument("--mix", help="scenario weights like 'anonymous_chat=40,browse=30' "
+                                      f"(default: {','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items())})")
+    parser.add_argument("--slo", action="append", metavar="[REQUEST:]METRIC<LIMIT",
+                        help="replaces the defaults; METRIC is p50..p99, mean, max (ms) or error_rate")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds between scenarios")
+    parser.add_argument("--accounts", type=int, default=20, help="registered users for member chat and logins")
+    parser.add_argument("--window", type=float, default=10.0, help="seconds per timeline window")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--drain", type=float, default=30.0, help="seconds to let running scenarios finish")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report to this JSON file")
+    server_options = parser.add_argument_group("fake server (without --url)")
+    server_options.add_argument("--catalog-size", type=int, default=10000)
+    server_options.add_argument("--llm-scale", type=float, default=1.0)
+    server_options.add_argument("--rate-limit", action="store_true")
+    server_options.add_argument("--fast-auth", action="store_true")
+    server_options.add_argument("--startup-timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    try:
+        parse_profile(args.profile)
+        parse_mix(args.mix)
+        for spec in args.slo or []:
+            SLO(spec)
+    except ValueError as e:
+        parser.error(str(e))
+
+    report = asyncio.run(main_async(args))
+    print_report(report)
+    if args.output:
+        report.update({"created_at": datetime.now(timezone.utc).isoformat(), "git_commit": git_commit()})
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.output}")
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
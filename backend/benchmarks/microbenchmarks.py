@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for text-processing helpers as the catalog grows
+
+Usage: python -m benchmarks.microbenchmarks [--sizes 100 1000 10000 100000] [--only format_phone_data]
+                                           [--output after.json] [--baseline before.json] [--threshold 10]
+
+Each helper runs at every size on generated data, timeit-style: loops are
+batched until a repeat lasts --min-time, and the median of --repeat repeats
+is the result. ns/item (time per call divided by size) stays flat for
+helpers that scale linearly; growth between sizes shows what is worse.
+With --baseline the best time of every result is compared with the earlier
+run and the exit status is 1 when any slowed down by more than --threshold
+percent.
+
+Sizes are phones for the formatter and the response scan, phone models
+(and one brand per hundred) for the fuzzy matchers, and characters of
+query text for the price and feature extractors, which never see the catalog.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.chat_benchmark import configure_environment, git_commit
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+# Sentences a long chat message or pasted review is made of; no prices or feature words
+FILLER = (
+    "I have been using my current handset for three years and it still works. "
+    "My brother recommended I look around before the festive sale ends. "
+    "I mostly read news, watch videos on the train and call family abroad. "
+)
+RESPONSE_FILLER = (
+    "Here is how these options compare for everyday use. Each one is a solid pick in its segment, "
+    "and the right choice depends on how long you keep a handset and which trade-offs you accept.\n\n"
+)
+
+
+def time_call(function: Callable[[], object], min_time: float, repeat: int) -> dict:
+    """Median and best seconds per call over ``repeat`` batches of at least ``min_time`` each"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / elapsed) if elapsed else loops * 10)
+    timings = [elapsed / loops]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            function()
+        timings.append((time.perf_counter() - started) / loops)
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "loops": loops, "repeats": repeat}
+
+
+def generated_phones(size: int, seed: int) -> List[SimpleNamespace]:
+    """Catalog rows as the query builder returns them (attribute access)"""
+    from benchmarks.fakes import generate_phones
+    return [SimpleNamespace(id=index + 1, **phone) for index, phone in enumerate(generate_phones(size, seed))]
+
+
+def mentioning_response(phones: List[SimpleNamespace]) -> str:
+    """An AI answer of typical length recommending three of the phones"""
+    picks = [phones[0], phones[len(phones) // 2], phones[-1]]
+    sections = [
+        f"**{phone.name}** (₹{phone.price:,.0f}) - {phone.ram}GB RAM, {phone.camera_main} camera, "
+        f"{phone.battery_capacity}mAh battery.\n\n" for phone in picks
+    ]
+    return RESPONSE_FILLER + "".join(sections) + RESPONSE_FILLER
+
+
+def query_text(size: int) -> str:
+    """``size`` characters of chat text with the price and feature phrases at the very end"""
+    tail = " Looking for a good camera and battery, under 30k please."
+    body = (FILLER * (size // len(FILLER) + 1))[:max(size - len(tail), 0)]
+    return body + tail
+
+
+def catalog_session(size: int):
+    """A throwaway in-memory database holding ``size`` phone models and their brands"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from benchmarks.fakes import BRAND_SERIES
+    from database import Base, Brand, PhoneModel
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    known = sorted(BRAND_SERIES)
+    brands = []
+    for index in range(max(len(known), size // 100)):
+        name = known[index] if index < len(known) else f"Brand{index}"
+        brands.append(Brand(name=name, display_name=name, aliases=json.dumps([f"{name} Mobile", f"{name}Phone"]),
+                            is_active=True))
+    session.add_all(brands)
+    session.flush()
+
+    models = []
+    for index in range(size):
+        brand = brands[index % len(brands)]
+        series_names = BRAND_SERIES.get(brand.name, [brand.name])
+        series = series_names[index % len(series_names)]
+        name = f"{series} {10 + index // 100} {index % 100:02d}"
+        models.append(PhoneModel(name=name, brand_id=brand.id, is_active=True,
+                                 search_terms=json.dumps([name.lower(), name.replace(" ", "").lower()])))
+    session.add_all(models)
+    session.commit()
+    return session, engine
+
+
+def bench_format_phone_data(size: int, seed: int):
+    from utils.query_processor import ResponseFormatter
+    phones = generated_phones(size, seed)
+    return lambda: ResponseFormatter.format_phone_data(phones), None
+
+
+def bench_extract_mentioned_phones(size: int, seed: int):
+    from ai.agent import MobilePhoneAgent
+    phones = generated_phones(size, seed)
+    agent = MobilePhoneAgent()
+    response = mentioning_response(phones)
+    return lambda: agent._extract_mentioned_phones_from_response(response, phones), None
+
+
+def bench_extract_mentioned_phones_fallback(size: int, seed: int):
+    """No phone is named, so every phone also goes through the spelling-variation pass"""
+    from ai.agent import MobilePhoneAgent
+    phones = generated_phones(size, seed)
+    agent = MobilePhoneAgent()
+    response = RESPONSE_FILLER * 4
+    return lambda: agent._extract_mentioned_phones_from_response(response, phones), None
+
+
+def bench_fuzzy_brand_match(size: int, seed: int):
+    from utils.query_processor import QueryProcessor
+    session, engine = catalog_session(size)
+    processor = QueryProcessor(session)
+    query = "Best Samsung Galaxy S 12 05 or a Pixel under 40k"
+    return lambda: processor.fuzzy_brand_match(query), lambda: (session.close(), engine.dispose())
+
+
+def bench_fuzzy_model_match(size: int, seed: int):
+    from utils.query_processor import QueryProcessor
+    session, engine = catalog_session(size)
+    processor = QueryProcessor(session)
+    query = "Best Samsung Galaxy S 12 05 or a Pixel under 40k"
+    return lambda: processor.fuzzy_model_match(query), lambda: (session.close(), engine.dispose())
+
+
+def bench_price_extractor(size: int, seed: int):
+    from utils.query_processor import PriceExtractor
+    text = query_text(size)
+    return lambda: PriceExtractor.extract_price_range(text), None
+
+
+def bench_feature_extractor(size: int, seed: int):
+    from utils.query_processor import FeatureExtractor
+    text = query_text(size)
+    return lambda: FeatureExtractor.extract_features(text), None
+
+
+# name -> setup(size, seed) returning (function to time, cleanup or None)
+BENCHMARKS = {
+    "format_phone_data": bench_format_phone_data,
+    "extract_mentioned_phones": bench_extract_mentioned_phones,
+    "extract_mentioned_phones_fallback": bench_extract_mentioned_phones_fallback,
+    "fuzzy_brand_match": bench_fuzzy_brand_match,
+    "fuzzy_model_match": bench_fuzzy_model_match,
+    "price_extractor": bench_price_extractor,
+    "feature_extractor": bench_feature_extractor,
+}
+
+
+def run_benchmarks(names: List[str], sizes: List[int], seed: int, min_time: float, repeat: int) -> Dict[str, dict]:
+    results = {}
+    for name in names:
+        results[name] = {}
+        for size in sizes:
+            function, cleanup = BENCHMARKS[name](size, seed)
+            try:
+                function()  # warm caches and lazy imports
+                timing = time_call(function, min_time, repeat)
+            finally:
+                if cleanup:
+                    cleanup()
+            timing["per_item_ns"] = timing["median_s"] / size * 1e9
+            results[name][str(size)] = timing
+            print(f"  {name:<36} {size:>7}  {format_seconds(timing['median_s']):>10}")
+    return results
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def compare(results: Dict[str, dict], baseline: Optional[dict], threshold: float) -> List[dict]:
+    """Results that are more than ``threshold`` percent slower than in the baseline"""
+    regressions = []
+    previous = (baseline or {}).get("results", {})
+    for name, by_size in results.items():
+        for size, timing in by_size.items():
+            old = previous.get(name, {}).get(size)
+            if not old:
+                continue
+            # Best-of-repeats is the least noisy estimate of what the code costs
+            change = (timing["min_s"] - old["min_s"]) / old["min_s"] * 100
+            timing["baseline_change_pct"] = round(change, 1)
+            if change > threshold:
+                regressions.append({"benchmark": name, "size": int(size), "change_pct": round(change, 1),
+                                    "baseline_s": old["min_s"], "min_s": timing["min_s"]})
+    return regressions
+
+
+def print_report(results: Dict[str, dict], regressions: List[dict], threshold: float, has_baseline: bool):
+    flagged = {(regression["benchmark"], str(regression["size"])) for regression in regressions}
+    for name, by_size in results.items():
+        print(f"\n{name}")
+        print(f"  {'size':>7} {'median':>10} {'best':>10} {'ns/item':>10} {'growth':>8}"
+              + (f" {'vs baseline':>12}" if has_baseline else ""))
+        previous = None
+        for size, timing in by_size.items():
+            growth = "" if previous is None else f"{timing['median_s'] / previous['median_s']:.1f}x"
+            line = (f"  {size:>7} {format_seconds(timing['median_s']):>10} {format_seconds(timing['min_s']):>10} "
+                    f"{timing['per_item_ns']:>10.1f} {growth:>8}")
+            if has_baseline:
+                change = timing.get("baseline_change_pct")
+                line += f" {'-' if change is None else f'{change:+.1f}%':>12}"
+                if (name, size) in flagged:
+                    line += "  ❌ regression"
+            print(line)
+            previous = timing
+
+    if has_baseline:
+        if regressions:
+            print(f"\n❌ {len(regressions)} result(s) more than {threshold:g}% slower than the baseline")
+        else:
+            print(f"\n✅ No result more than {threshold:g}% slower than the baseline")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark text-processing helpers at growing catalog sizes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per timed repeat")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results to this JSON file (use it as a later --baseline)")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent slowdown reported as a regression")
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory(prefix="microbenchmarks-")
+    configure_environment(os.path.join(workdir.name, "unused.db"))
+
+    names = args.only or list(BENCHMARKS)
+    sizes = sorted(set(args.sizes))
+    print(f"⏱️  {len(names)} benchmarks at sizes {', '.join(map(str, sizes))}")
+    results = run_benchmarks(names, sizes, args.seed, args.min_time, args.repeat)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    print_report(results, regressions, args.threshold, baseline is not None)
+
+    if args.output:
+        output = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+            "results": results,
+            "regressions": regressions,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+    workdir.cleanup()
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
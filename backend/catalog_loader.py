@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Bulk streaming loader for the phone catalog
+
+Usage: python catalog_loader.py phones.csv [--format csv|jsonl] [--chunk-size 5000] [--replace] [--rejects rejects.jsonl]
+
+Records are read, validated and written one chunk at a time, so memory use
+does not grow with the file size. On PostgreSQL (psycopg2) chunks are
+streamed with COPY; other databases use executemany batches.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Boolean, Float, Integer, delete, func, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from database import engine as default_engine, MobilePhone, CatalogChange, CatalogVersion
+
+CATALOG_TABLE = MobilePhone.__table__
+# Row versioning columns are maintained by catalog_sync.py
+LOAD_COLUMNS = [column for column in CATALOG_TABLE.columns if column.name not in ("id", "catalog_version", "updated_at")]
+# Loaded rows are stamped with the load's catalog version
+WRITE_COLUMNS = LOAD_COLUMNS + [CATALOG_TABLE.c.catalog_version]
+REQUIRED_FIELDS = ("name", "brand", "price")
+TRUE_VALUES = {"true", "1", "yes", "y", "t"}
+FALSE_VALUES = {"false", "0", "no", "n", "f"}
+MAX_REPORTED_ERRORS = 10
+
+
+def iter_records(path: str, file_format: Optional[str] = None) -> Iterator[Any]:
+    """Stream records from a CSV or JSONL file
+
+    Unparseable JSONL lines are yielded as raw strings so they are rejected
+    with the rest of their chunk's errors instead of aborting the load.
+    """
+    file_format = file_format or ("jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv")
+    with open(path, newline="", encoding="utf-8") as source:
+        if file_format == "csv":
+            yield from csv.DictReader(source)
+            return
+        for line in source:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line.strip()
+
+
+def catalog_key(brand: str, name: str) -> str:
+    """Stable SKU for records that do not carry one (matches migration 0003's backfill)"""
+    return f"{brand.strip().lower()}:{name.strip().lower()}"
+
+
+def _coerce(column, value: Any) -> Any:
+    if isinstance(value, str):
+        value = value.strip()
+        if value == "":
+            return None
+    if value is None:
+        return None
+
+    if isinstance(column.type, Boolean):
+        if isinstance(value, bool):
+            return value
+        text = str(value).lower()
+        if text in TRUE_VALUES:
+            return True
+        if text in FALSE_VALUES:
+            return False
+        raise ValueError(f"{column.name}: not a boolean: {value!r}")
+    if isinstance(column.type, Integer):
+        number = float(value)
+        if not number.is_integer():
+            raise ValueError(f"{column.name}: not an integer: {value!r}")
+        return int(number)
+    if isinstance(column.type, Float):
+        return float(value)
+    if isinstance(value, (list, tuple)):
+        # JSONL may carry colors/features as lists; stored comma-separated like the seed data
+        return ", ".join(str(item) for item in value)
+    return str(value)
+
+
+def validate_record(record: Any) -> Dict[str, Any]:
+    """Coerce one record to catalog column types, raising ValueError if invalid"""
+    if not isinstance(record, dict):
+        raise ValueError("not a JSON object")
+
+    row = {}
+    for column in LOAD_COLUMNS:
+        try:
+            value = _coerce(column, record.get(column.name))
+        except (TypeError, ValueError) as e:
+            raise ValueError(str(e) if column.name in str(e) else f"{column.name}: {e}") from e
+        if value is None and column.default is not None and column.default.is_scalar:
+            value = column.default.arg
+        row[column.name] = value
+
+    missing = [field for field in REQUIRED_FIELDS if row[field] is None]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    if row["price"] <= 0:
+        raise ValueError("price: must be positive")
+    if row["sku"] is None:
+        row["sku"] = catalog_key(row["brand"], row["name"])
+    return row
+
+
+def validate_chunk(records: List[Any], first_record: int,
+                   seen_skus: Optional[set] = None) -> Tuple[List[Dict[str, Any]], List[dict]]:
+    """Split a chunk into valid rows and rejection entries
+
+    ``seen_skus`` carries the keys of earlier chunks so duplicates across the
+    whole input are rejected, not only within one chunk.
+    """
+    seen_skus = set() if seen_skus is None else seen_skus
+    rows, rejects = [], []
+    for offset, record in enumerate(records):
+        try:
+            row = validate_record(record)
+            if row["sku"] in seen_skus:
+                raise ValueError(f"sku: duplicate {row['sku']!r}")
+        except ValueError as e:
+            rejects.append({"record": first_record + offset, "error": str(e), "data": record})
+            continue
+        seen_skus.add(row["sku"])
+        rows.append(row)
+    return rows, rejects
+
+
+def _copy_rows(connection: Connection, rows: List[Dict[str, Any]]):
+    """Stream one chunk into PostgreSQL with COPY ... FROM STDIN"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column.name] for column in WRITE_COLUMNS])
+    buffer.seek(0)
+
+    columns = ", ".join(column.name for column in WRITE_COLUMNS)
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        # Unquoted empty fields are NULL in CSV COPY
+        cursor.copy_expert(f"COPY {CATALOG_TABLE.name} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def next_catalog_version(connection: Connection) -> int:
+    """A catalog version newer than every recorded version and every stamped row"""
+    recorded = connection.execute(select(func.coalesce(func.max(CatalogVersion.version), 0))).scalar()
+    stamped = connection.execute(select(func.coalesce(func.max(CATALOG_TABLE.c.catalog_version), 0))).scalar()
+    return max(recorded, stamped) + 1
+
+
+def write_rows(connection: Connection, rows: List[Dict[str, Any]], version: int = 0):
+    """Write one validated chunk with COPY or an executemany insert"""
+    if not rows:
+        return
+    rows = [{**row, "catalog_version": version} for row in rows]
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+        _copy_rows(connection, rows)
+    else:
+        connection.execute(insert(CATALOG_TABLE), rows)
+
+
+def load_catalog(records: Iterable[Any], chunk_size: int = 5000, replace: bool = False,
+                 rejects_path: Optional[str] = None, engine: Engine = default_engine) -> dict:
+    """Validate and write catalog records chunk by chunk
+
+    With ``replace`` the old catalog is deleted and the new one loaded in a
+    single transaction, so readers keep seeing the old catalog until the
+    commit. Otherwise every chunk commits on its own and locks are held
+    only briefly. Every load records a new catalog version and stamps its
+    rows with it, so caches keyed by (id, catalog_version) never serve an
+    old phone's data for a reused ID.
+    """
+    stats = {"loaded": 0, "rejected": 0, "chunks": 0, "seconds": 0.0, "rows_per_second": 0.0}
+    records = iter(records)
+    rejects_file = open(rejects_path, "w", encoding="utf-8") if rejects_path else None
+    start = time.perf_counter()
+
+    try:
+        with engine.connect() as connection:
+            transaction = connection.begin()
+            try:
+                version = next_catalog_version(connection)
+                if replace:
+                    # A full reload starts the change feed over; use catalog_sync.py to keep IDs
+                    connection.execute(delete(CatalogChange.__table__))
+                    connection.execute(delete(CATALOG_TABLE))
+                connection.execute(insert(CatalogVersion), {"version": version})
+                seen_skus = set()
+
+                while True:
+                    chunk = list(islice(records, chunk_size))
+                    if not chunk:
+                        break
+                    rows, rejects = validate_chunk(chunk, stats["loaded"] + stats["rejected"] + 1, seen_skus)
+                    write_rows(connection, rows, version)
+                    if not replace:
+                        transaction.commit()
+                        transaction = connection.begin()
+
+                    stats["chunks"] += 1
+                    stats["loaded"] += len(rows)
+                    for reject in rejects:
+                        if rejects_file:
+                            rejects_file.write(json.dumps(reject, default=str) + "\n")
+                        elif stats["rejected"] < MAX_REPORTED_ERRORS:
+                            print(f"⚠️  Record {reject['record']} rejected: {reject['error']}")
+                        stats["rejected"] += 1
+
+                    elapsed = time.perf_counter() - start
+                    print(f"Chunk {stats['chunks']}: {stats['loaded']} rows loaded, "
+                          f"{stats['rejected']} rejected, {stats['loaded'] / elapsed:,.0f} rows/s")
+
+                connection.execute(
+                    update(CatalogVersion).where(CatalogVersion.version == version).values(inserted=stats["loaded"])
+                )
+                transaction.commit()
+            except Exception:
+                transaction.rollback()
+                raise
+    finally:
+        if rejects_file:
+            rejects_file.close()
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    stats["rows_per_second"] = round(stats["loaded"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load the phone catalog from CSV or JSONL")
+    parser.add_argument("path", help="CSV or JSONL file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=int(os.getenv("CATALOG_LOAD_CHUNK_SIZE", "5000")))
+    parser.add_argument("--replace", action="store_true", help="replace the whole catalog in one transaction")
+    parser.add_argument("--rejects", help="write rejected records to this JSONL file")
+    args = parser.parse_args()
+
+    result = load_catalog(iter_records(args.path, args.format), args.chunk_size, args.replace, args.rejects)
+    print(f"✅ Loaded {result['loaded']} phones ({result['rejected']} rejected) "
+          f"in {result['seconds']}s, {result['rows_per_second']:,.0f} rows/s")
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Incremental catalog sync with a change feed
+
+Usage: python catalog_sync.py phones.csv [--format csv|jsonl] [--chunk-size 5000] [--dry-run]
+
+Incoming records are matched to stored phones by SKU. Only new, changed
+and removed phones are written: inserts, updates and soft deletes
+(``is_active = False``) are applied in one transaction together with a new
+``catalog_versions`` row and one ``catalog_changes`` row per touched phone.
+Phone IDs stay stable, and the catalog is never empty mid-sync.
+"""
+import argparse
+import logging
+import os
+import time
+from itertools import islice
+from typing import Any, Callable, Iterable, List
+
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.engine import Engine
+
+from database import engine as default_engine, CatalogChange, CatalogVersion
+from catalog_loader import CATALOG_TABLE, LOAD_COLUMNS, iter_records, validate_chunk
+
+logger = logging.getLogger(__name__)
+
+COMPARED_COLUMNS = [column.name for column in LOAD_COLUMNS if column.name not in ("sku", "is_active")]
+
+# Called with the change summary after each committed sync
+catalog_listeners: List[Callable[[dict], None]] = []
+
+
+def add_catalog_listener(callback: Callable[[dict], None]):
+    """Register a callback run after every catalog version in this process"""
+    catalog_listeners.append(callback)
+
+
+def current_catalog_version(connection) -> int:
+    return connection.execute(select(func.coalesce(func.max(CatalogVersion.version), 0))).scalar()
+
+
+def sync_catalog(records: Iterable[Any], chunk_size: int = 5000, dry_run: bool = False,
+                 engine: Engine = default_engine) -> dict:
+    """Apply the difference between ``records`` and the stored catalog
+
+    Returns the new version and the affected phone IDs per change type; the
+    version is unchanged (and nothing is written) when the catalog already
+    matches. A dry run lists SKUs instead of IDs for phones it would insert.
+    """
+    start = time.perf_counter()
+    changes = {"version": None, "inserted": [], "updated": [], "deleted": [], "rejected": 0}
+    records = iter(records)
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            version = current_catalog_version(connection) + 1
+
+            # sku -> (id, is_active, compared values)
+            stored = {}
+            for row in connection.execute(select(
+                CATALOG_TABLE.c.sku, CATALOG_TABLE.c.id, CATALOG_TABLE.c.is_active,
+                *[CATALOG_TABLE.c[name] for name in COMPARED_COLUMNS]
+            ).where(CATALOG_TABLE.c.sku.is_not(None))):
+                stored[row[0]] = (row[1], row[2], tuple(row[3:]))
+
+            seen_skus = set()
+            processed = 0
+            while True:
+                chunk = list(islice(records, chunk_size))
+                if not chunk:
+                    break
+                rows, rejects = validate_chunk(chunk, processed + 1, seen_skus)
+                processed += len(chunk)
+                changes["rejected"] += len(rejects)
+                for reject in rejects[:10]:
+                    print(f"⚠️  Record {reject['record']} rejected: {reject['error']}")
+
+                new_rows, changed_rows = [], []
+                for row in rows:
+                    existing = stored.get(row["sku"])
+                    if existing is None:
+                        new_rows.append(row)
+                    elif not existing[1] or existing[2] != tuple(row[name] for name in COMPARED_COLUMNS):
+                        changed_rows.append(dict(row, _id=existing[0]))
+
+                if new_rows and not dry_run:
+                    inserted = connection.execute(
+                        insert(CATALOG_TABLE).returning(CATALOG_TABLE.c.id, sort_by_parameter_order=True),
+                        [dict(row, is_active=True, catalog_version=version) for row in new_rows]
+                    ).scalars().all()
+                    changes["inserted"].extend(inserted)
+                elif new_rows:
+                    changes["inserted"].extend(row["sku"] for row in new_rows)
+
+                if changed_rows:
+                    if not dry_run:
+                        connection.execute(
+                            update(CATALOG_TABLE).where(CATALOG_TABLE.c.id == bindparam("_id")).values(
+                                is_active=True, catalog_version=version
+                            ),
+                            changed_rows
+                        )
+                    changes["updated"].extend(row["_id"] for row in changed_rows)
+
+            # Phones missing from the input leave the catalog but keep their ID
+            removed = [
+                phone_id for sku, (phone_id, is_active, _) in stored.items()
+                if is_active and sku not in seen_skus
+            ]
+            if removed and not dry_run:
+                for batch_start in range(0, len(removed), chunk_size):
+                    connection.execute(
+                        update(CATALOG_TABLE).where(
+                            CATALOG_TABLE.c.id.in_(removed[batch_start:batch_start + chunk_size])
+                        ).values(is_active=False, catalog_version=version)
+                    )
+            changes["deleted"] = removed
+
+            touched = len(changes["inserted"]) + len(changes["updated"]) + len(changes["deleted"])
+            if dry_run or not touched:
+                transaction.rollback()
+            else:
+                connection.execute(insert(CatalogVersion), {
+                    "version": version,
+                    "inserted": len(changes["inserted"]),
+                    "updated": len(changes["updated"]),
+                    "deleted": len(changes["deleted"])
+                })
+                connection.execute(insert(CatalogChange), [
+                    {"version": version, "phone_id": phone_id, "change_type": change_type}
+                    for change_type, key in (("insert", "inserted"), ("update", "updated"), ("delete", "deleted"))
+                    for phone_id in changes[key]
+                ])
+                transaction.commit()
+                changes["version"] = version
+        except Exception:
+            transaction.rollback()
+            raise
+
+    changes["seconds"] = round(time.perf_counter() - start, 3)
+    if changes["version"] is not None:
+        for callback in catalog_listeners:
+            try:
+                callback(changes)
+            except Exception:
+                logger.exception("Catalog listener failed")
+    return changes
+
+
+def get_catalog_changes(connection, since_version: int = 0, limit: int = 1000, after: int = 0) -> dict:
+    """Change feed entries newer than ``since_version``, oldest first
+
+    Pages by change ID: pass the returned ``next_cursor`` as ``after`` until
+    ``complete``, so a sync touching more than ``limit`` phones is read in full.
+    """
+    rows = connection.execute(
+        select(CatalogChange.id, CatalogChange.version, CatalogChange.phone_id, CatalogChange.change_type)
+        .where(CatalogChange.version > since_version, CatalogChange.id > after)
+        .order_by(CatalogChange.id)
+        .limit(limit)
+    ).all()
+    return {
+        "version": current_catalog_version(connection),
+        "changes": [
+            {"version": version, "phone_id": phone_id, "change_type": change_type}
+            for _, version, phone_id, change_type in rows
+        ],
+        "next_cursor": rows[-1].id if rows else after,
+        "complete": len(rows) < limit
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally sync the phone catalog from CSV or JSONL")
+    parser.add_argument("path", help="CSV or JSONL file holding the full catalog")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=int(os.getenv("CATALOG_LOAD_CHUNK_SIZE", "5000")))
+    parser.add_argument("--dry-run", action="store_true", help="report the changes without writing them")
+    args = parser.parse_args()
+
+    result = sync_catalog(iter_records(args.path, args.format), args.chunk_size, args.dry_run)
+    print(f"{'🔍 Would apply' if args.dry_run else '✅ Applied'}: {len(result['inserted'])} inserted, "
+          f"{len(result['updated'])} updated, {len(result['deleted'])} deleted, {result['rejected']} rejected "
+          f"in {result['seconds']}s (catalog version {result['version'] or 'unchanged'})")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Report query plans for the hot queries and flag any that stop using their index
+
+Usage: python check_query_plans.py [--json]
+
+Exits with status 1 when a hot query no longer uses its expected index or
+needs a full scan or sort. On PostgreSQL sequential scans are disabled for
+the check so small development tables still show which index would be used.
+"""
+import json
+import sys
+from datetime import datetime
+
+from sqlalchemy import text
+
+from database import engine
+from auth import user_conversations_statement, conversation_messages_statement, encode_cursor
+from utils.query_processor import DatabaseQueryBuilder
+
+HOT_QUERIES = [
+    (
+        "latest page of conversation messages",
+        conversation_messages_statement(1, 1, 51),
+        "ix_conversation_messages_conversation_id_timestamp_id"
+    ),
+    (
+        "user's conversations by recent activity",
+        user_conversations_statement(1, 21),
+        "ix_conversations_user_id_updated_at_id"
+    ),
+    (
+        "next page of a user's conversations",
+        user_conversations_statement(1, 21, encode_cursor(datetime(2026, 1, 1), 1000)),
+        "ix_conversations_user_id_updated_at_id"
+    ),
+    (
+        "phones by brand and price",
+        DatabaseQueryBuilder.build_phone_statement({"brands": ["Samsung"], "price_range": {"max": 30000}}),
+        "ix_mobile_phones_brand_lower_price"
+    ),
+]
+
+
+def explain_sqlite(connection, sql: str):
+    details = [row[3] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    problems = [
+        detail for detail in details
+        if (detail.startswith("SCAN ") and " INDEX " not in detail) or "TEMP B-TREE" in detail
+    ]
+    return details, problems
+
+
+def explain_postgres(connection, sql: str):
+    connection.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    details, problems = [], []
+
+    def walk(node, depth=0):
+        line = node["Node Type"]
+        if node.get("Index Name"):
+            line += f" using {node['Index Name']}"
+        if node.get("Relation Name"):
+            line += f" on {node['Relation Name']}"
+        details.append("  " * depth + line)
+        if node["Node Type"] in ("Seq Scan", "Sort"):
+            problems.append(line)
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    walk(plan[0]["Plan"])
+    return details, problems
+
+
+def check_query_plans():
+    """Explain every hot query and return one report per query"""
+    explain = explain_postgres if engine.dialect.name == "postgresql" else explain_sqlite
+    reports = []
+    with engine.connect() as connection:
+        for name, statement, expected_index in HOT_QUERIES:
+            sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            with connection.begin():
+                details, problems = explain(connection, sql)
+            if not any(expected_index in detail for detail in details):
+                problems.append(f"expected index {expected_index} not used")
+            reports.append({
+                "query": name,
+                "expected_index": expected_index,
+                "ok": not problems,
+                "plan": details,
+                "problems": problems
+            })
+    return reports
+
+
+if __name__ == "__main__":
+    reports = check_query_plans()
+    if "--json" in sys.argv:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print(f"{'✅' if report['ok'] else '❌'} {report['query']}")
+            for line in report["plan"]:
+                print(f"    {line}")
+            for problem in report["problems"]:
+                print(f"    ⚠️  {problem}")
+    sys.exit(0 if all(report["ok"] for report in reports) else 1)
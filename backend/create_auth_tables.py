@@ -1,13 +1,13 @@
 """
 Create authentication and conversation tables
 """
-from database import engine, Base, User, Conversation, ConversationMessage
+from database import create_tables
 
 def create_auth_tables():
     """Create authentication and conversation tables"""
     try:
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
+        # Run the migrations, which create all tables
+        create_tables()
         print("Successfully created authentication and conversation tables")
     except Exception as e:
         print(f"Error creating tables: {e}")
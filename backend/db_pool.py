@@ -0,0 +1,142 @@
+"""
+Connection pool configuration, instrumentation and warm-up
+"""
+import os
+import time
+from typing import Any, Dict
+
+from sqlalchemy import exc, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from metrics import metrics
+from tracing import trace_engine
+
+POOL_CHECKOUT_WAIT = metrics.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+POOL_CHECKOUT_TIMEOUTS = metrics.counter("db_pool_checkout_timeouts_total", "Checkouts that hit pool_timeout")
+POOL_IN_USE = metrics.gauge("db_pool_connections_in_use", "Connections currently checked out")
+POOL_SATURATION = metrics.gauge("db_pool_saturation_ratio", "Checked-out connections / (pool_size + max_overflow)")
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+class TimedCheckoutMixin:
+    """Record how long each checkout waited for a free connection"""
+    metrics_name = "default"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc(pool=self.metrics_name)
+            raise
+        POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start, pool=self.metrics_name)
+        return connection
+
+    def recreate(self):
+        # dispose() swaps in a fresh pool; keep its metrics label
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+
+class InstrumentedQueuePool(TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """Engine keyword arguments for the pool, configured per worker process
+
+    Every uvicorn worker has its own pool, so the database sees up to
+    workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+    """
+    options = {"pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True)}
+
+    # In-memory SQLite uses a single static connection; pool sizing does not apply
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith("sqlite:")):
+        return options
+
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        # Recycle before Render's Postgres drops idle connections
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pool_use_lifo=True
+    )
+    return options
+
+
+def instrument_engine(engine, name: str):
+    """Label an engine's pool, export its in-use and saturation gauges and trace its statements"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    sync_engine.pool.metrics_name = name
+
+    def in_use() -> float:
+        pool = sync_engine.pool
+        return pool.checkedout() if hasattr(pool, "checkedout") else 0
+
+    def saturation() -> float:
+        pool = sync_engine.pool
+        if not hasattr(pool, "checkedout"):
+            return 0.0
+        max_overflow = max(getattr(pool, "_max_overflow", 0), 0)
+        capacity = pool.size() + max_overflow
+        return pool.checkedout() / capacity if capacity else 0.0
+
+    POOL_IN_USE.set_function(in_use, pool=name)
+    POOL_SATURATION.set_function(saturation, pool=name)
+    trace_engine(sync_engine, name)
+
+
+def pool_status(engine) -> Dict[str, Any]:
+    """Current pool counters for diagnostics endpoints"""
+    pool = getattr(engine, "sync_engine", engine).pool
+    if not hasattr(pool, "checkedout"):
+        return {"pool": pool.__class__.__name__}
+    return {
+        "pool": pool.__class__.__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": getattr(pool, "_max_overflow", None)
+    }
+
+
+def warm_up_pool(engine, connections: int) -> int:
+    """Open connections ahead of traffic and return them to the pool"""
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            connection.execute(text("SELECT 1"))
+            opened.append(connection)
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+async def warm_up_async_pool(engine, connections: int) -> int:
+    """Async counterpart of warm_up_pool"""
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = await engine.connect()
+            await connection.execute(text("SELECT 1"))
+            opened.append(connection)
+    finally:
+        for connection in opened:
+            await connection.close()
+    return len(opened)
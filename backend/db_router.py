@@ -0,0 +1,263 @@
+"""
+Read-replica routing for catalog and history queries
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import SessionLocal, AsyncSessionLocal, normalize_url, to_async_url
+from db_pool import pool_options, instrument_engine
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+READ_ROUTING = metrics.counter("db_read_routing_total", "Read sessions by target and routing reason")
+REPLICA_LAG = metrics.gauge("db_replica_lag_seconds", "Replication lag measured by the health check")
+
+# Postgres standby lag; 0 when caught up (an idle primary makes replay timestamps look old)
+POSTGRES_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class Replica:
+    """One read replica with its sync and async engines and health state"""
+
+    def __init__(self, name: str, url: str):
+        url = normalize_url(url)
+        self.name = name
+        self.url = url
+        self.engine = create_engine(url, **pool_options(url))
+        self.async_engine = create_async_engine(to_async_url(url), **pool_options(to_async_url(url), is_async=True))
+        instrument_engine(self.engine, name)
+        instrument_engine(self.async_engine, f"{name}_async")
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_session_factory = async_sessionmaker(
+            self.async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+        self.lag_seconds = 0.0
+        # Monotonic time the last lag measurement started; 0 until the first health check
+        self.measured_at = 0.0
+        self.down_until = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def replicated_until(self) -> float:
+        """Monotonic time up to which this replica has applied the primary's writes"""
+        return self.measured_at - self.lag_seconds
+
+    @property
+    def is_postgres(self) -> bool:
+        return self.url.startswith("postgresql")
+
+    def measure_lag(self) -> float:
+        with self.engine.connect() as connection:
+            if self.is_postgres:
+                return float(connection.execute(POSTGRES_LAG_SQL).scalar() or 0)
+            connection.execute(text("SELECT 1"))
+            return 0.0
+
+
+class ReadReplicaRouter:
+    """Send read-only sessions to replicas, falling back to the primary
+
+    Reads go to the primary when no replica is configured, when every
+    replica is down or lagging more than ``max_lag_seconds``, and, after a
+    user writes, until a replica's last lag measurement shows it has
+    replayed that write (read-your-writes). Queued writes are taken to
+    land ``pin_seconds`` after the pin, so it should cover the transcript
+    flush interval. Pins are per process.
+    """
+
+    def __init__(self, urls: List[str] = None, pin_seconds: float = None,
+                 max_lag_seconds: float = None, retry_seconds: float = None):
+        if urls is None:
+            urls = [url.strip() for url in os.getenv("DATABASE_REPLICA_URL", "").split(",") if url.strip()]
+        self.pin_seconds = pin_seconds if pin_seconds is not None else float(os.getenv("REPLICA_PIN_SECONDS", "5"))
+        self.max_lag_seconds = max_lag_seconds if max_lag_seconds is not None else float(
+            os.getenv("REPLICA_MAX_LAG_SECONDS", "10")
+        )
+        self.retry_seconds = retry_seconds if retry_seconds is not None else float(
+            os.getenv("REPLICA_RETRY_SECONDS", "30")
+        )
+        self.replicas = [Replica(f"replica_{index}", url) for index, url in enumerate(urls)]
+        # user_id -> monotonic time by which the user's writes are committed
+        self._pins: Dict[int, float] = {}
+        self._round_robin = itertools.count()
+        self._lock = threading.Lock()
+        self._checker: Optional[threading.Thread] = None
+        self._stop_checker = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def pin(self, user_id: Optional[int]):
+        """Route this user's reads to the primary until their writes have replicated"""
+        if user_id is None or not self.enabled:
+            return
+        with self._lock:
+            self._pins[user_id] = time.monotonic() + self.pin_seconds
+
+    def written_at(self, user_id: Optional[int]) -> Optional[float]:
+        """When the user's latest writes are committed, if a replica may not have them yet"""
+        if user_id is None:
+            return None
+        with self._lock:
+            return self._pins.get(user_id)
+
+    def is_usable(self, replica: Replica) -> bool:
+        return replica.down_until <= time.monotonic() and replica.lag_seconds <= self.max_lag_seconds
+
+    def mark_down(self, replica: Replica, error: Exception):
+        replica.down_until = time.monotonic() + self.retry_seconds
+        replica.last_error = str(error)
+        logger.error("Read replica %s unavailable, using primary for %.0fs: %s", replica.name, self.retry_seconds, error)
+
+    def choose(self, user_id: Optional[int] = None) -> Optional[Replica]:
+        """Pick a replica for a read, or None for the primary"""
+        if not self.enabled:
+            return None
+        usable = [replica for replica in self.replicas if self.is_usable(replica)]
+        if not usable:
+            READ_ROUTING.inc(target="primary", reason="unavailable")
+            return None
+        written_at = self.written_at(user_id)
+        if written_at is not None:
+            usable = [replica for replica in usable if replica.replicated_until >= written_at]
+            if not usable:
+                READ_ROUTING.inc(target="primary", reason="pinned")
+                return None
+        return usable[next(self._round_robin) % len(usable)]
+
+    @contextmanager
+    def session(self, user_id: Optional[int] = None):
+        """Sync read session on a replica, or on the primary as a fallback"""
+        db = None
+        replica = self.choose(user_id)
+        if replica is not None:
+            db = replica.session_factory()
+            try:
+                # Connect now so an outage falls back before any query runs
+                db.connection()
+                READ_ROUTING.inc(target="replica", reason="ok")
+            except exc.DBAPIError as e:
+                db.close()
+                db = None
+                self.mark_down(replica, e)
+                READ_ROUTING.inc(target="primary", reason="error")
+        if db is None:
+            db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @asynccontextmanager
+    async def async_session(self, user_id: Optional[int] = None):
+        """Async read session on a replica, or on the primary as a fallback"""
+        db = None
+        replica = self.choose(user_id)
+        if replica is not None:
+            db = replica.async_session_factory()
+            try:
+                await db.connection()
+                READ_ROUTING.inc(target="replica", reason="ok")
+            except (exc.DBAPIError, OSError) as e:
+                await db.close()
+                db = None
+                self.mark_down(replica, e)
+                READ_ROUTING.inc(target="primary", reason="error")
+        if db is None:
+            db = AsyncSessionLocal()
+        try:
+            yield db
+        finally:
+            await db.close()
+
+    def check_replicas(self):
+        """Measure replication lag and bring recovered replicas back"""
+        for replica in self.replicas:
+            try:
+                started = time.monotonic()
+                replica.lag_seconds = replica.measure_lag()
+                replica.measured_at = started
+                replica.down_until = 0.0
+                replica.last_error = None
+            except Exception as e:
+                self.mark_down(replica, e)
+            REPLICA_LAG.set(replica.lag_seconds, replica=replica.name)
+
+        # Forget writes every reachable replica has replayed
+        now = time.monotonic()
+        reachable = [replica for replica in self.replicas if replica.down_until <= now]
+        if reachable:
+            replicated_until = min(replica.replicated_until for replica in reachable)
+            with self._lock:
+                self._pins = {
+                    user_id: written_at for user_id, written_at in self._pins.items() if written_at > replicated_until
+                }
+
+    def start_health_checks(self, interval_seconds: float):
+        """Run check_replicas in a daemon thread every ``interval_seconds``"""
+        if not self.enabled or (self._checker and self._checker.is_alive()):
+            return
+        self._stop_checker.clear()
+
+        def _run():
+            while not self._stop_checker.wait(interval_seconds):
+                self.check_replicas()
+
+        self.check_replicas()
+        self._checker = threading.Thread(target=_run, name="replica-health", daemon=True)
+        self._checker.start()
+
+    def stop_health_checks(self):
+        self._stop_checker.set()
+        if self._checker:
+            self._checker.join(timeout=5)
+            self._checker = None
+
+    async def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose()
+            await replica.async_engine.dispose()
+
+    def status(self) -> List[dict]:
+        return [
+            {
+                "name": replica.name,
+                "usable": self.is_usable(replica),
+                "lag_seconds": replica.lag_seconds,
+                "last_error": replica.last_error
+            }
+            for replica in self.replicas
+        ]
+
+
+# Global replica router instance
+replica_router = ReadReplicaRouter()
+
+
+async def get_read_db():
+    """Async session for read-only catalog queries"""
+    async with replica_router.async_session() as db:
+        yield db
+
+
+def get_sync_read_db():
+    """Sync session for read-only catalog queries"""
+    with replica_router.session() as db:
+        yield db
@@ -0,0 +1,173 @@
+"""
+On-demand diagnostics for a live worker: sampling profiler and memory report
+
+The profiler samples every thread's stack with ``sys._current_frames()``
+from a background thread, so nothing is instrumented and the overhead is
+one stack walk per interval. Output is the collapsed-stack format read by
+flamegraph.pl, speedscope and inferno. Stacks in the event loop thread show
+what is running on the loop at each sample (awaiting coroutines are not on
+the stack), which is what makes a worker slow to pick up new requests.
+"""
+import gc
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# Frames kept per tracemalloc traceback once tracing is started at runtime
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "1"))
+
+
+class ProfilerBusy(Exception):
+    """A profile is already running in this process"""
+
+
+class SamplingProfiler:
+    """Collapsed stacks of all threads, sampled at a fixed interval"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._labels: Dict[object, str] = {}
+        # Longest prefixes first so paths are shown relative to the nearest import root
+        self._roots = sorted({os.path.abspath(path) for path in sys.path if path}, key=len, reverse=True)
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for root in self._roots:
+                if filename.startswith(root + os.sep):
+                    filename = filename[len(root) + 1:]
+                    break
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _stack(self, frame) -> List[str]:
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def profile(self, seconds: float, interval: float = 0.01) -> dict:
+        """Sample for ``seconds`` (blocking the calling thread); raises ProfilerBusy if one is running"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            own_thread = threading.get_ident()
+            stacks: Counter = Counter()
+            samples = 0
+            started = time.perf_counter()
+            deadline = started + seconds
+            next_sample = started
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    thread_name = names.get(thread_id, f"thread-{thread_id}").replace(";", ":")
+                    stacks[";".join([thread_name, *self._stack(frame)])] += 1
+                samples += 1
+                next_sample += interval
+                time.sleep(max(next_sample - time.perf_counter(), 0))
+            elapsed = time.perf_counter() - started
+        finally:
+            self._labels.clear()
+            self._lock.release()
+        return {"stacks": stacks, "samples": samples, "seconds": elapsed, "interval": interval}
+
+    @staticmethod
+    def collapsed(stacks: Counter) -> str:
+        """``frame;frame;frame count`` lines, hottest first"""
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def _process_memory() -> dict:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    usage = {"max_rss_bytes": max_rss if sys.platform == "darwin" else max_rss * 1024}
+    try:
+        with open("/proc/self/statm") as f:
+            usage["rss_bytes"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    return usage
+
+
+def _tracemalloc_report(top: int) -> dict:
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": True,
+        "frames": tracemalloc.get_traceback_limit(),
+        "traced_bytes": current,
+        "peak_traced_bytes": peak,
+        "top": [
+            {"location": str(stat.traceback[-1]), "traceback": [str(frame) for frame in stat.traceback],
+             "size_bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("traceback" if tracemalloc.get_traceback_limit() > 1 else "lineno")[:top]
+        ],
+    }
+
+
+def _object_counts(top: int) -> List[dict]:
+    """Most common live object types tracked by the garbage collector"""
+    counts = Counter(type(obj).__qualname__ for obj in gc.get_objects())
+    return [{"type": name, "count": count} for name, count in counts.most_common(top)]
+
+
+def memory_report(state: Dict[str, dict], top: int = 20) -> dict:
+    """Process memory, tracemalloc top allocators, live object types and in-process state sizes"""
+    return {
+        "pid": os.getpid(),
+        "process": _process_memory(),
+        "tracemalloc": _tracemalloc_report(top),
+        "gc": {"counts": gc.get_count(), "objects": _object_counts(top)},
+        "threads": threading.active_count(),
+        "state": state,
+    }
+
+
+def start_tracemalloc(frames: Optional[int] = None) -> bool:
+    """Start tracing allocations; False if already tracing"""
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames or TRACEMALLOC_FRAMES)
+    logger.info("tracemalloc started", extra={"frames": tracemalloc.get_traceback_limit()})
+    return True
+
+
+def stop_tracemalloc() -> bool:
+    """Stop tracing and free its bookkeeping; False if not tracing"""
+    if not tracemalloc.is_tracing():
+        return False
+    tracemalloc.stop()
+    logger.info("tracemalloc stopped")
+    return True
+
+
+# Global profiler instance
+profiler = SamplingProfiler()
@@ -1,26 +1,73 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import time
+STARTUP_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Depends, HTTPException, Query, status, BackgroundTasks
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 from dotenv import load_dotenv
+import asyncio
+import logging
 import os
 
-from database import get_db, create_tables, MobilePhone as DBMobilePhone, User, Conversation, ConversationMessage
+from database import get_db, get_async_db, create_tables, SessionLocal, engine, async_engine, MobilePhone as DBMobilePhone, User, Conversation, ConversationMessage
 from models import (
     ChatMessage, ChatResponse, MobilePhone, ComparisonRequest,
-    UserCreate, UserLogin, Token, User as UserModel, Conversation as ConversationModel
+    UserCreate, UserLogin, Token, User as UserModel, ConversationPage, ConversationMessagePage
 )
-from ai import MobilePhoneAgent
+from ai import MobilePhoneAgent, conversation_summarizer
+from transcript_writer import transcript_writer
+from catalog_sync import get_catalog_changes
+from db_pool import warm_up_pool, warm_up_async_pool, pool_status
+from db_router import replica_router, get_read_db
+from metrics import metrics
+from app_logging import configure_logging, RequestContextMiddleware
+from tracing import TracingMiddleware, tracer
+from user_cache import UserSnapshot, user_cache
+from rate_limit import create_rate_limiter, RateLimitMiddleware
+from password_hasher import password_hasher
+from phone_serializer import FastJSONResponse, phones_response, phone_response, phone_fragments
+from diagnostics import profiler, ProfilerBusy, PROFILE_MAX_SECONDS, memory_report, start_tracemalloc, stop_tracemalloc
+from utils import session_manager, AsyncDatabaseQueryBuilder
 from auth import (
-    register_user, authenticate_user, create_user_token, get_current_user, get_current_user_optional,
-    create_conversation, add_message_to_conversation, get_user_conversations, get_conversation_messages,
-    conversation_service
+    register_user_async, authenticate_user_async, record_login_async, create_user_token,
+    get_current_user_async, get_current_user_optional_async, set_user_active_async,
+    start_conversation_async, touch_conversation_async,
+    get_user_conversations_async, get_conversation_messages_async,
+    get_conversation_summary, get_conversation_summary_async, save_conversation_summary,
+    conversation_service, require_admin
 )
 
 load_dotenv()
 
-app = FastAPI(title="Mobile Phone Shopping Chat Agent", version="1.0.0")
+# Queue-backed JSON logs; see app_logging.py
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Fast start: serve immediately and run migrations, seeding and warm-ups in the background
+FAST_START = os.getenv("FAST_START", "false").lower() == "true"
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() == "true"
+
+# Seconds spent in each startup phase, reported once the app is ready
+startup_report: Dict[str, float] = {"imports": time.perf_counter() - STARTUP_STARTED}
+STARTUP_PHASE_SECONDS = metrics.gauge("startup_phase_seconds", "Time spent in each startup phase")
+
+app = FastAPI(title="Mobile Phone Shopping Chat Agent", version="1.0.0", default_response_class=FastJSONResponse)
+
+# Throttle chat and login before any database or LLM work; added first so
+# CORS (outermost) still decorates 429 responses
+rate_limiter = create_rate_limiter()
+if rate_limiter:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
+# One server span per request (TRACE_EXPORTER); inside the request context so spans carry its ID
+app.add_middleware(TracingMiddleware)
+
+# Request IDs and debug-log sampling, set before any handler logs
+app.add_middleware(RequestContextMiddleware)
 
 # CORS middleware
 # Allow all origins for now to fix CORS issues
@@ -32,28 +79,121 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize AI agent
-ai_agent = MobilePhoneAgent()
+# AI agent, built on first use so provider SDKs stay off the import path
+ai_agent: Optional[MobilePhoneAgent] = None
 
-# Database setup on startup
-@app.on_event("startup")
-async def startup_event():
-    """Setup database tables on startup"""
+def get_ai_agent() -> MobilePhoneAgent:
+    global ai_agent
+    if ai_agent is None:
+        ai_agent = MobilePhoneAgent()
+    return ai_agent
+
+def record_startup_phase(phase: str, started: float):
+    startup_report[phase] = time.perf_counter() - started
+    STARTUP_PHASE_SECONDS.set(startup_report[phase], phase=phase)
+
+def prepare_database():
+    """Run migrations and optional seeding"""
+    started = time.perf_counter()
     try:
-        # Create tables
-        create_tables()
-        print("✅ Database tables created successfully")
+        if MIGRATE_ON_STARTUP:
+            create_tables()
+            logger.info("Database tables created")
         
         # Check if we need to seed data
         if os.getenv("SETUP_DB") == "true":
-            print("🌱 Seeding database with initial data...")
+            logger.info("Seeding database with initial data")
             from seed_data import seed_database
             seed_database()
-            print("✅ Database seeded successfully")
+            logger.info("Database seeded")
             
-    except Exception as e:
-        print(f"❌ Database setup failed: {e}")
+    except Exception:
+        logger.exception("Database setup failed")
         # Don't fail startup, just log the error
+    record_startup_phase("database", started)
+
+async def warm_up():
+    """Open pooled connections and load provider SDKs before the first request needs them"""
+    started = time.perf_counter()
+    try:
+        warmup = int(os.getenv("DB_POOL_WARMUP", os.getenv("DB_POOL_SIZE", "5")))
+        if warmup > 0:
+            warmed = await asyncio.to_thread(warm_up_pool, engine, warmup) + await warm_up_async_pool(async_engine, warmup)
+            logger.info("Warmed up %d database connections", warmed)
+    except Exception:
+        logger.exception("Connection pool warm-up failed")
+    record_startup_phase("pool_warmup", started)
+    
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(preload_dependencies)
+    except Exception:
+        logger.exception("Preloading AI dependencies failed")
+    record_startup_phase("preload", started)
+    
+    started = time.perf_counter()
+    try:
+        await password_hasher.warm_up()
+    except Exception:
+        logger.exception("Password hash worker start failed")
+    record_startup_phase("password_workers", started)
+
+def preload_dependencies():
+    """Import LangChain and the LLM/search SDKs and build their clients"""
+    import langchain.memory  # noqa: F401
+    from ai.llm_service import llm_service
+    from utils.web_search import get_search_service
+    llm_service.load_providers()
+    if os.getenv("GOOGLE_API_KEY"):
+        get_search_service(os.getenv("GOOGLE_API_KEY"))
+    get_ai_agent()
+
+async def prepare_in_background():
+    await asyncio.to_thread(prepare_database)
+    await warm_up()
+    logger.info("Background startup finished (%s)", format_startup_report())
+
+def format_startup_report() -> str:
+    return ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in startup_report.items())
+
+# Database setup on startup
+@app.on_event("startup")
+async def startup_event():
+    """Setup database tables on startup"""
+    if FAST_START:
+        # Keep a reference so the task is not garbage collected
+        app.state.background_startup = asyncio.create_task(prepare_in_background())
+    else:
+        prepare_database()
+        await warm_up()
+    
+    started = time.perf_counter()
+    # Track replica lag so lagging replicas are skipped
+    replica_router.start_health_checks(float(os.getenv("REPLICA_HEALTH_INTERVAL_SECONDS", "5")))
+    
+    # Expire idle chat sessions in the background
+    session_manager.start_cleanup(float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "60")))
+    
+    # Batch chat transcript writes off the request path
+    await transcript_writer.start()
+    record_startup_phase("workers", started)
+    
+    ready = time.perf_counter() - STARTUP_STARTED
+    logger.info("Ready to serve in %.0fms (%s)", ready * 1000, format_startup_report())
+    startup_report["ready"] = ready
+    STARTUP_PHASE_SECONDS.set(ready, phase="ready")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers"""
+    # Drain queued transcript messages before the process exits
+    await transcript_writer.stop()
+    session_manager.stop_cleanup()
+    replica_router.stop_health_checks()
+    password_hasher.shutdown()
+    tracer.shutdown()
+    await replica_router.dispose()
+    await async_engine.dispose()
 
 @app.get("/")
 async def root():
@@ -73,7 +213,7 @@ async def seed_database_endpoint():
 async def debug_phones(max_price: float = 30000, db: Session = Depends(get_db)):
     """Debug endpoint to check phone data"""
     try:
-        phones = db.query(DBMobilePhone).filter(DBMobilePhone.price <= max_price).all()
+        phones = db.query(DBMobilePhone).filter(DBMobilePhone.is_active == True, DBMobilePhone.price <= max_price).all()
         return {
             "count": len(phones),
             "phones": [
@@ -98,7 +238,7 @@ async def db_status(db: Session = Depends(get_db)):
         tables = inspector.get_table_names()
         
         # Count phones in each table
-        phone_count = db.query(DBMobilePhone).count()
+        phone_count = db.query(DBMobilePhone).filter(DBMobilePhone.is_active == True).count()
         
         # Get database URL info (safely)
         db_url = os.getenv("DATABASE_URL", "not_set")
@@ -110,7 +250,9 @@ async def db_status(db: Session = Depends(get_db)):
             "tables": tables,
             "phone_count": phone_count,
             "database_host": db_host,
-            "database_name": db_url.split("/")[-1] if "/" in db_url else "unknown"
+            "database_name": db_url.split("/")[-1] if "/" in db_url else "unknown",
+            "pools": {"primary": pool_status(engine), "primary_async": pool_status(async_engine)},
+            "replicas": replica_router.status()
         }
     except Exception as e:
         return {"error": str(e), "status": "error"}
@@ -120,10 +262,10 @@ async def test_chat_direct(message: str = "Best camera phone under ₹30,000?",
     """Test chat with direct database query bypassing AI analysis"""
     try:
         # Get all phones first to debug
-        all_phones = db.query(DBMobilePhone).all()
+        all_phones = db.query(DBMobilePhone).filter(DBMobilePhone.is_active == True).all()
         
         # Direct database query without AI analysis
-        phones = db.query(DBMobilePhone).filter(DBMobilePhone.price <= 30000).all()
+        phones = db.query(DBMobilePhone).filter(DBMobilePhone.is_active == True, DBMobilePhone.price <= 30000).all()
         
         # Format response
         response = f"Found {len(phones)} phones under ₹30,000 (out of {len(all_phones)} total):\n\n"
@@ -143,16 +285,74 @@ async def test_chat_direct(message: str = "Best camera phone under ₹30,000?",
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(10, ge=1, le=1000)
+):
+    """Sample this worker's stacks for ``seconds``; returns collapsed stacks for flamegraph tools"""
+    logger.info("Profiling worker", extra={"seconds": seconds, "interval_ms": interval_ms})
+    try:
+        result = await asyncio.to_thread(profiler.profile, seconds, interval_ms / 1000)
+    except ProfilerBusy:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running on this worker")
+    
+    pid = os.getpid()
+    return PlainTextResponse(profiler.collapsed(result["stacks"]), headers={
+        "Content-Disposition": f'attachment; filename="profile-{pid}-{int(time.time())}.collapsed"',
+        "X-Profile-Pid": str(pid),
+        "X-Profile-Samples": str(result["samples"]),
+        "X-Profile-Seconds": f"{result['seconds']:.3f}"
+    })
+
+@app.get("/admin/memory", dependencies=[Depends(require_admin)])
+async def memory_status(top: int = Query(20, ge=1, le=200)):
+    """Process memory, tracemalloc top allocators and the size of in-process state"""
+    state = {
+        "sessions": session_manager.stats(),
+        "user_memories": conversation_service.stats(),
+        "user_cache": user_cache.stats(),
+        "phone_fragments": phone_fragments.stats(),
+        "rate_limit_keys": len(rate_limiter.store) if rate_limiter else None,
+        "password_hasher": password_hasher.stats()
+    }
+    # Walking the heap takes a while on a big process; keep it off the event loop
+    return await asyncio.to_thread(memory_report, state, top)
+
+@app.post("/admin/memory/tracing", dependencies=[Depends(require_admin)])
+async def start_memory_tracing(frames: Optional[int] = Query(None, ge=1, le=100)):
+    """Start tracemalloc so /admin/memory lists top allocators (slows allocations while on)"""
+    return {"started": start_tracemalloc(frames)}
+
+@app.delete("/admin/memory/tracing", dependencies=[Depends(require_admin)])
+async def stop_memory_tracing():
+    """Stop tracemalloc"""
+    return {"stopped": stop_tracemalloc()}
+
+@app.post("/admin/users/{user_id}/deactivate", dependencies=[Depends(require_admin)])
+async def deactivate_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Deactivate a user; their tokens stop working on this worker at once, elsewhere within the user cache TTL"""
+    if not await set_user_active_async(user_id, False, db):
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"user_id": user_id, "is_active": False}
+
+@app.post("/admin/users/{user_id}/activate", dependencies=[Depends(require_admin)])
+async def activate_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Reactivate a deactivated user"""
+    if not await set_user_active_async(user_id, True, db):
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"user_id": user_id, "is_active": True}
+
 # Authentication endpoints
 @app.post("/auth/register", response_model=UserModel)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
-    return register_user(user_data, db)
+    return await register_user_async(user_data, db)
 
 @app.post("/auth/login", response_model=Token)
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Login user and return access token"""
-    user = authenticate_user(user_credentials.email, user_credentials.password, db)
+    user = await authenticate_user_async(user_credentials.email, user_credentials.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -161,61 +361,126 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
         )
     
     # Update last login
-    user.last_login = datetime.utcnow()
-    db.commit()
+    await record_login_async(user, db)
     
     return create_user_token(user)
 
 @app.get("/auth/me", response_model=UserModel)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: UserSnapshot = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
     """Get current user information"""
-    return current_user
+    # The cached identity may come from token claims; load the full profile
+    user = await db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+# Read sessions for user history; pinned to the primary right after the user writes
+async def get_user_read_db(current_user: UserSnapshot = Depends(get_current_user_async)):
+    async with replica_router.async_session(current_user.id) as db:
+        yield db
+
+async def get_chat_read_db(current_user: Optional[UserSnapshot] = Depends(get_current_user_optional_async)):
+    async with replica_router.async_session(current_user.id if current_user else None) as db:
+        yield db
 
 # Conversation endpoints
-@app.get("/conversations", response_model=List[ConversationModel])
+@app.get("/conversations", response_model=ConversationPage)
 async def get_conversations(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    current_user: UserSnapshot = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_user_read_db)
 ):
-    """Get all conversations for the current user"""
-    return get_user_conversations(current_user.id, db)
+    """Page through the user's conversations, most recently active first
+    
+    ``since`` returns only conversations changed after the ``synced_at`` of an earlier call.
+    """
+    synced_at = datetime.now()
+    page = await get_user_conversations_async(current_user.id, db, limit, cursor, since)
+    return {**page, "synced_at": synced_at}
 
-@app.get("/conversations/{conversation_id}/messages")
+@app.get("/conversations/{conversation_id}/messages", response_model=ConversationMessagePage)
 async def get_conversation_messages_endpoint(
     conversation_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    current_user: UserSnapshot = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_user_read_db)
 ):
-    """Get all messages for a specific conversation"""
-    messages = get_conversation_messages(conversation_id, current_user.id, db)
-    return {"messages": messages}
+    """Latest messages of a conversation; ``next_cursor`` pages back to older ones"""
+    synced_at = datetime.now()
+    page = await get_conversation_messages_async(conversation_id, current_user.id, db, limit, cursor, since)
+    return {**page, "synced_at": synced_at}
+
+def update_conversation_summary(user_query: str, result: ChatResponse, user_id: Optional[int] = None,
+                                conversation_id: Optional[int] = None):
+    """Fold a finished exchange into the rolling conversation summary
+    
+    Runs as a background task after the response has been sent.
+    """
+    if (result.user_intent or {}).get("intent") in ("error", "unsafe_query"):
+        return
+    
+    recommended = [phone.name for phone in result.recommendations or []]
+    db = SessionLocal()
+    try:
+        if user_id:
+            if conversation_id:
+                previous = get_conversation_summary(conversation_id, db)
+                summary = conversation_summarizer.update(previous, user_query, result.user_intent, recommended)
+                save_conversation_summary(conversation_id, summary, db)
+        elif result.session_id:
+            session = session_manager.get_session(result.session_id)
+            if session:
+                session.context_summary = conversation_summarizer.update(
+                    session.context_summary, user_query, result.user_intent, recommended
+                )
+                session_manager.save_session(session)
+    except Exception:
+        logger.exception("Conversation summary update failed")
+    finally:
+        db.close()
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat(
     message: ChatMessage, 
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user_optional)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_chat_read_db),
+    async_db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[UserSnapshot] = Depends(get_current_user_optional_async)
 ):
     """Main chat endpoint for processing user queries with conversation history"""
     try:
-        # Get conversation history if user is authenticated
+        # Get conversation history and the conversation's rolling summary if user is authenticated
         conversation_history = []
+        conversation_summary = None
+        conversation_id = message.conversation_id
         if current_user:
-            conversation_history = conversation_service.get_conversation_history(current_user.id)
+            # Rehydration is sync ORM code; run_sync keeps its I/O on the async driver
+            conversation_history = await db.run_sync(
+                lambda session: conversation_service.get_conversation_history(current_user.id, session)
+            )
+            if conversation_id:
+                conversation_summary = await get_conversation_summary_async(conversation_id, current_user.id, db)
+                if conversation_summary is None:
+                    conversation_id = None
         
         # Process the query with conversation history
         if current_user:
-            result = await ai_agent.process_query_with_history(
+            result = await get_ai_agent().process_query_with_history(
                 message.message, 
                 db, 
                 conversation_history,
-                current_user.id
+                current_user.id,
+                conversation_summary
             )
         else:
-            result = await ai_agent.process_query(
+            result = await get_ai_agent().process_query(
                 message.message, 
                 db, 
-                None
+                message.session_id
             )
         
         # Save conversation if user is authenticated
@@ -228,40 +493,52 @@ async def chat(
             )
             
             # Save to database
-            # Create conversation if this is the first message
-            if not hasattr(result, 'conversation_id') or not result.conversation_id:
-                conversation = create_conversation(
+            # Continue the client's conversation if it is theirs, otherwise start one
+            if conversation_id and not await touch_conversation_async(conversation_id, current_user.id, async_db):
+                conversation_id = None
+            if not conversation_id:
+                conversation_id = await start_conversation_async(
                     current_user.id, 
                     message.message[:50] + "..." if len(message.message) > 50 else message.message,
-                    db
+                    async_db
                 )
-                conversation_id = conversation.id
-            else:
-                conversation_id = result.conversation_id
             
-            # Add message to conversation
+            # Queue the message; it is written in the next batched transaction
             recommended_phone_ids = [phone.id for phone in result.recommendations] if result.recommendations else []
-            add_message_to_conversation(
+            transcript_writer.enqueue(
+                current_user.id,
                 conversation_id,
                 message.message,
                 result.response,
                 result.used_web_search,
-                recommended_phone_ids,
-                db
+                recommended_phone_ids
             )
             
+            # Serve this user's next reads from the primary until the writes replicate
+            replica_router.pin(current_user.id)
+            
             # Update result with conversation_id
             result.conversation_id = conversation_id
         
-        return result
+        # Summarize the exchange off the request path
+        background_tasks.add_task(
+            update_conversation_summary,
+            message.message,
+            result,
+            current_user.id if current_user else None,
+            result.conversation_id
+        )
+        
+        # The agent built a valid ChatResponse; skip re-validating it
+        return FastJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 @app.post("/compare", response_model=ChatResponse)
-async def compare_phones(request: ComparisonRequest, db: Session = Depends(get_db)):
+async def compare_phones(request: ComparisonRequest, db: AsyncSession = Depends(get_read_db)):
     """Compare specific phones by IDs"""
     try:
-        result = await ai_agent.compare_phones(request.phone_ids, db)
+        result = await get_ai_agent().compare_phones(request.phone_ids, db)
         
         return ChatResponse(
             response=result["response"],
@@ -280,38 +557,51 @@ async def get_phones(
     min_ram: int = None,
     min_storage: int = None,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get phones with optional filters"""
-    query = db.query(DBMobilePhone)
-    
+    query_builder = AsyncDatabaseQueryBuilder(db)
+    filters = {
+        "price_range": {"min": min_price, "max": max_price},
+        "min_ram": min_ram,
+        "min_storage": min_storage
+    }
     if brand:
-        query = query.filter(DBMobilePhone.brand.ilike(f"%{brand}%"))
-    if min_price:
-        query = query.filter(DBMobilePhone.price >= min_price)
-    if max_price:
-        query = query.filter(DBMobilePhone.price <= max_price)
-    if min_ram:
-        query = query.filter(DBMobilePhone.ram >= min_ram)
-    if min_storage:
-        query = query.filter(DBMobilePhone.storage >= min_storage)
-    
-    phones = query.limit(limit).all()
-    return phones
+        # "sam", "galaxy" and "Redmi" resolve through brand names and aliases;
+        # brands missing from the brands table still match by prefix
+        filters["brands"] = await query_builder.resolve_brands(brand)
+        if not filters["brands"]:
+            filters["brand_prefix"] = brand.strip()
+    return phones_response(await query_builder.build_phone_query(filters, limit))
 
 @app.get("/phones/{phone_id}", response_model=MobilePhone)
-async def get_phone(phone_id: int, db: Session = Depends(get_db)):
+async def get_phone(phone_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get a specific phone by ID"""
-    phone = db.query(DBMobilePhone).filter(DBMobilePhone.id == phone_id).first()
+    phone = await AsyncDatabaseQueryBuilder(db).get_phone(phone_id)
     if not phone:
         raise HTTPException(status_code=404, detail="Phone not found")
-    return phone
+    return phone_response(phone)
 
 @app.get("/brands")
-async def get_brands(db: Session = Depends(get_db)):
+async def get_brands(db: AsyncSession = Depends(get_read_db)):
     """Get all available brands"""
-    brands = db.query(DBMobilePhone.brand).distinct().all()
-    return [brand[0] for brand in brands]
+    return await AsyncDatabaseQueryBuilder(db).get_brands()
+
+@app.get("/catalog/changes")
+async def get_catalog_changes_endpoint(since: int = 0, after: int = 0, limit: int = 1000,
+                                       db: AsyncSession = Depends(get_read_db)):
+    """Catalog change feed: phones inserted, updated or removed after catalog version ``since``
+    
+    Pass ``next_cursor`` back as ``after`` until ``complete`` to read the rest of a large sync.
+    """
+    return await db.run_sync(
+        lambda session: get_catalog_changes(session.connection(), since, min(limit, 10000), after)
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus metrics (pool wait histograms, saturation gauges, ...)"""
+    return metrics.render_prometheus()
 
 @app.get("/health")
 async def health_check():
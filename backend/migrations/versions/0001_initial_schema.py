@@ -0,0 +1,160 @@
+"""initial schema
+
+Tables as created by Base.metadata.create_all before migrations were introduced.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 09:43:05
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('brands',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('display_name', sa.String(length=100), nullable=False),
+    sa.Column('aliases', sa.Text(), nullable=True),
+    sa.Column('parent_brand', sa.String(length=100), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_brands_id', 'brands', ['id'], unique=False)
+    op.create_index('ix_brands_name', 'brands', ['name'], unique=True)
+
+    op.create_table('mobile_phones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('brand', sa.String(), nullable=True),
+    sa.Column('price', sa.Float(), nullable=True),
+    sa.Column('display_size', sa.Float(), nullable=True),
+    sa.Column('display_resolution', sa.String(), nullable=True),
+    sa.Column('processor', sa.String(), nullable=True),
+    sa.Column('ram', sa.Integer(), nullable=True),
+    sa.Column('storage', sa.Integer(), nullable=True),
+    sa.Column('camera_main', sa.String(), nullable=True),
+    sa.Column('camera_front', sa.String(), nullable=True),
+    sa.Column('battery_capacity', sa.Integer(), nullable=True),
+    sa.Column('charging_speed', sa.String(), nullable=True),
+    sa.Column('os', sa.String(), nullable=True),
+    sa.Column('weight', sa.Float(), nullable=True),
+    sa.Column('dimensions', sa.String(), nullable=True),
+    sa.Column('colors', sa.Text(), nullable=True),
+    sa.Column('features', sa.Text(), nullable=True),
+    sa.Column('image_url', sa.String(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('ois', sa.Boolean(), nullable=True),
+    sa.Column('eis', sa.Boolean(), nullable=True),
+    sa.Column('wireless_charging', sa.Boolean(), nullable=True),
+    sa.Column('water_resistance', sa.String(), nullable=True),
+    sa.Column('fingerprint_sensor', sa.Boolean(), nullable=True),
+    sa.Column('face_unlock', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_mobile_phones_brand', 'mobile_phones', ['brand'], unique=False)
+    op.create_index('ix_mobile_phones_id', 'mobile_phones', ['id'], unique=False)
+    op.create_index('ix_mobile_phones_name', 'mobile_phones', ['name'], unique=False)
+    op.create_index('ix_mobile_phones_price', 'mobile_phones', ['price'], unique=False)
+
+    op.create_table('search_patterns',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('pattern', sa.String(length=500), nullable=False),
+    sa.Column('pattern_type', sa.String(length=50), nullable=True),
+    sa.Column('confidence_score', sa.Float(), nullable=True),
+    sa.Column('usage_count', sa.Integer(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_search_patterns_id', 'search_patterns', ['id'], unique=False)
+
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('hashed_password', sa.String(length=255), nullable=False),
+    sa.Column('full_name', sa.String(length=255), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('last_login', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+
+    op.create_table('conversations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('title', sa.String(length=255), nullable=True),
+    sa.Column('context_summary', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_conversations_id', 'conversations', ['id'], unique=False)
+    op.create_index('ix_conversations_user_id', 'conversations', ['user_id'], unique=False)
+
+    op.create_table('phone_models',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False),
+    sa.Column('brand_id', sa.Integer(), nullable=True),
+    sa.Column('search_terms', sa.Text(), nullable=True),
+    sa.Column('model_variants', sa.Text(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['brand_id'], ['brands.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_phone_models_id', 'phone_models', ['id'], unique=False)
+    op.create_index('ix_phone_models_name', 'phone_models', ['name'], unique=False)
+
+    op.create_table('conversation_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('conversation_id', sa.Integer(), nullable=True),
+    sa.Column('user_message', sa.Text(), nullable=False),
+    sa.Column('ai_response', sa.Text(), nullable=False),
+    sa.Column('used_web_search', sa.Boolean(), nullable=True),
+    sa.Column('recommended_phones', sa.Text(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_conversation_messages_conversation_id', 'conversation_messages', ['conversation_id'], unique=False)
+    op.create_index('ix_conversation_messages_id', 'conversation_messages', ['id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_conversation_messages_id', table_name='conversation_messages')
+    op.drop_index('ix_conversation_messages_conversation_id', table_name='conversation_messages')
+
+    op.drop_table('conversation_messages')
+    op.drop_index('ix_phone_models_name', table_name='phone_models')
+    op.drop_index('ix_phone_models_id', table_name='phone_models')
+
+    op.drop_table('phone_models')
+    op.drop_index('ix_conversations_user_id', table_name='conversations')
+    op.drop_index('ix_conversations_id', table_name='conversations')
+
+    op.drop_table('conversations')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+
+    op.drop_table('users')
+    op.drop_index('ix_search_patterns_id', table_name='search_patterns')
+
+    op.drop_table('search_patterns')
+    op.drop_index('ix_mobile_phones_price', table_name='mobile_phones')
+    op.drop_index('ix_mobile_phones_name', table_name='mobile_phones')
+    op.drop_index('ix_mobile_phones_id', table_name='mobile_phones')
+    op.drop_index('ix_mobile_phones_brand', table_name='mobile_phones')
+
+    op.drop_table('mobile_phones')
+    op.drop_index('ix_brands_name', table_name='brands')
+    op.drop_index('ix_brands_id', table_name='brands')
+
+    op.drop_table('brands')
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""hot query indexes
+
+Composite indexes matching the hot query shapes, replacing the
+single-column indexes they make redundant:
+- conversation_messages(conversation_id, timestamp): messages of a conversation in order
+- conversations(user_id, updated_at): a user's conversation list, newest first via a backward scan
+- mobile_phones(lower(brand), price): brand + price catalog filters
+Partial indexes cover the active-only brand and model lookups.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:43:44
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_conversation_messages_conversation_id_timestamp', 'conversation_messages',
+                    ['conversation_id', 'timestamp'], unique=False, if_not_exists=True)
+    op.create_index('ix_conversations_user_id_updated_at', 'conversations',
+                    ['user_id', 'updated_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_mobile_phones_brand_lower_price', 'mobile_phones',
+                    [sa.text('lower(brand)'), 'price'], unique=False, if_not_exists=True)
+    op.create_index('ix_brands_active_name', 'brands', ['name'], unique=False, if_not_exists=True,
+                    postgresql_where=sa.text('is_active'), sqlite_where=sa.text('is_active = 1'))
+    op.create_index('ix_phone_models_active_brand_id', 'phone_models', ['brand_id'], unique=False, if_not_exists=True,
+                    postgresql_where=sa.text('is_active'), sqlite_where=sa.text('is_active = 1'))
+
+    # Leading columns of the composites; databases created before these existed may lack them
+    op.drop_index('ix_conversation_messages_conversation_id', table_name='conversation_messages', if_exists=True)
+    op.drop_index('ix_conversations_user_id', table_name='conversations', if_exists=True)
+    op.drop_index('ix_mobile_phones_brand', table_name='mobile_phones', if_exists=True)
+
+
+def downgrade():
+    op.create_index('ix_mobile_phones_brand', 'mobile_phones', ['brand'], unique=False)
+    op.create_index('ix_conversations_user_id', 'conversations', ['user_id'], unique=False)
+    op.create_index('ix_conversation_messages_conversation_id', 'conversation_messages', ['conversation_id'], unique=False)
+
+    op.drop_index('ix_phone_models_active_brand_id', table_name='phone_models')
+    op.drop_index('ix_brands_active_name', table_name='brands')
+    op.drop_index('ix_mobile_phones_brand_lower_price', table_name='mobile_phones')
+    op.drop_index('ix_conversations_user_id_updated_at', table_name='conversations')
+    op.drop_index('ix_conversation_messages_conversation_id_timestamp', table_name='conversation_messages')
@@ -0,0 +1,73 @@
+"""catalog sync
+
+Stable catalog keys, soft deletes and the catalog change feed used by
+incremental catalog syncs. Existing phones get an SKU derived from brand
+and name, the same key catalog_sync.py derives for records without one.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 09:46:55
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_versions',
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('inserted', sa.Integer(), nullable=True),
+    sa.Column('updated', sa.Integer(), nullable=True),
+    sa.Column('deleted', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('version')
+    )
+    op.create_table('catalog_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('phone_id', sa.Integer(), nullable=False),
+    sa.Column('change_type', sa.String(length=10), nullable=False),
+    sa.ForeignKeyConstraint(['phone_id'], ['mobile_phones.id'], ),
+    sa.ForeignKeyConstraint(['version'], ['catalog_versions.version'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_catalog_changes_version', 'catalog_changes', ['version'], unique=False)
+
+    op.add_column('mobile_phones', sa.Column('sku', sa.String(length=200), nullable=True))
+    op.add_column('mobile_phones', sa.Column('is_active', sa.Boolean(), nullable=False, server_default=sa.true()))
+    op.add_column('mobile_phones', sa.Column('catalog_version', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('mobile_phones', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    op.execute("UPDATE mobile_phones SET sku = lower(trim(brand)) || ':' || lower(trim(name)) WHERE sku IS NULL")
+    # Keep keys unique when the catalog already holds duplicate names
+    op.execute(
+        "UPDATE mobile_phones SET sku = sku || ':' || id "
+        "WHERE id NOT IN (SELECT min(id) FROM mobile_phones GROUP BY sku)"
+    )
+    op.create_index('ix_mobile_phones_sku', 'mobile_phones', ['sku'], unique=True)
+
+    # Catalog queries only read active phones
+    op.drop_index('ix_mobile_phones_brand_lower_price', table_name='mobile_phones')
+    op.create_index('ix_mobile_phones_brand_lower_price', 'mobile_phones', [sa.text('lower(brand)'), 'price'],
+                    unique=False, postgresql_where=sa.text('is_active'), sqlite_where=sa.text('is_active = 1'))
+
+
+def downgrade():
+    op.drop_index('ix_catalog_changes_version', table_name='catalog_changes')
+    op.drop_table('catalog_changes')
+    op.drop_table('catalog_versions')
+
+    op.drop_index('ix_mobile_phones_brand_lower_price', table_name='mobile_phones')
+    op.drop_index('ix_mobile_phones_sku', table_name='mobile_phones')
+    with op.batch_alter_table('mobile_phones', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('catalog_version')
+        batch_op.drop_column('is_active')
+        batch_op.drop_column('sku')
+    op.create_index('ix_mobile_phones_brand_lower_price', 'mobile_phones', [sa.text('lower(brand)'), 'price'],
+                    unique=False)
@@ -0,0 +1,52 @@
+"""conversation summaries
+
+Denormalized message count and latest-message preview on conversations,
+so the conversation list never reads conversation_messages, and the id
+tie-breaker added to the history indexes for cursor pagination.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 14:12:03
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('conversations', sa.Column('message_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('conversations', sa.Column('last_message_preview', sa.String(length=120), nullable=True))
+
+    op.execute(
+        "UPDATE conversations SET message_count = ("
+        "SELECT count(*) FROM conversation_messages m WHERE m.conversation_id = conversations.id)"
+    )
+    op.execute(
+        "UPDATE conversations SET last_message_preview = ("
+        "SELECT substr(m.user_message, 1, 120) FROM conversation_messages m "
+        "WHERE m.conversation_id = conversations.id ORDER BY m.timestamp DESC, m.id DESC LIMIT 1) "
+        "WHERE message_count > 0"
+    )
+
+    op.drop_index('ix_conversations_user_id_updated_at', table_name='conversations')
+    op.create_index('ix_conversations_user_id_updated_at_id', 'conversations', ['user_id', 'updated_at', 'id'], unique=False)
+    op.drop_index('ix_conversation_messages_conversation_id_timestamp', table_name='conversation_messages')
+    op.create_index('ix_conversation_messages_conversation_id_timestamp_id', 'conversation_messages',
+                    ['conversation_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_conversation_messages_conversation_id_timestamp_id', table_name='conversation_messages')
+    op.create_index('ix_conversation_messages_conversation_id_timestamp', 'conversation_messages',
+                    ['conversation_id', 'timestamp'], unique=False)
+    op.drop_index('ix_conversations_user_id_updated_at_id', table_name='conversations')
+    op.create_index('ix_conversations_user_id_updated_at', 'conversations', ['user_id', 'updated_at'], unique=False)
+
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.drop_column('last_message_preview')
+        batch_op.drop_column('message_count')
@@ -38,6 +38,7 @@ class MobilePhone(MobilePhoneBase):
 class ChatMessage(BaseModel):
     message: str
     session_id: Optional[str] = None
+    conversation_id: Optional[int] = None
     timestamp: Optional[datetime] = None
 
 class ChatResponse(BaseModel):
@@ -133,12 +134,19 @@ class ConversationCreate(ConversationBase):
 class Conversation(ConversationBase):
     id: int
     user_id: int
+    message_count: int = 0
+    last_message_preview: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
 
+class ConversationPage(BaseModel):
+    conversations: List[Conversation]
+    next_cursor: Optional[str] = None
+    synced_at: datetime  # Pass back as ``since`` for the next delta sync
+
 class ConversationMessageBase(BaseModel):
     user_message: str
     ai_response: str
@@ -156,6 +164,11 @@ class ConversationMessage(ConversationMessageBase):
     class Config:
         from_attributes = True
 
+class ConversationMessagePage(BaseModel):
+    messages: List[ConversationMessage]  # Oldest first
+    next_cursor: Optional[str] = None  # Older messages
+    synced_at: datetime
+
 # Token Models
 class Token(BaseModel):
     access_token: str
@@ -0,0 +1,159 @@
+"""
+Password hashing off the event loop
+
+bcrypt is deliberately slow (100-300 ms of CPU per call), so hashes and
+checks run in a small process pool. A semaphore caps how many calls are
+in flight; excess callers wait in line, and once the line is full they get
+a 503 instead of piling up behind a login burst.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+from fastapi import HTTPException, status
+
+from metrics import metrics
+
+HASH_QUEUE_WAIT = metrics.histogram(
+    "password_hash_queue_wait_seconds", "Time password hashes waited for a free worker",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+HASH_DURATION = metrics.histogram(
+    "password_hash_seconds", "Time spent hashing or checking passwords in a worker",
+    buckets=(0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5)
+)
+HASH_IN_FLIGHT = metrics.gauge("password_hash_in_flight", "Password hashes running in workers")
+HASH_WAITING = metrics.gauge("password_hash_waiting", "Password hashes waiting for a worker")
+HASH_REJECTED = metrics.counter("password_hash_rejected_total", "Password hashes refused because the queue was full")
+PASSWORD_REHASHES = metrics.counter("password_rehash_total", "Stored hashes upgraded to the current cost on login")
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    """Hash a password with bcrypt (runs in a worker process)"""
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Check a password against its bcrypt hash (runs in a worker process)"""
+    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+def hash_rounds(hashed_password: str) -> Optional[int]:
+    """Cost factor of a bcrypt hash such as ``$2b$12$...``"""
+    parts = hashed_password.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def _timed(operation, *args):
+    """Run ``operation`` in the worker and report its own duration"""
+    started = time.perf_counter()
+    return operation(*args), time.perf_counter() - started
+
+
+class PasswordHasher:
+    """Bounded process pool for bcrypt
+
+    ``workers=0`` uses threads instead (bcrypt releases the GIL), for hosts
+    where worker processes are unavailable.
+    """
+
+    def __init__(self, workers: int = None, max_concurrency: int = None, max_queue: int = None,
+                 rounds: int = BCRYPT_ROUNDS):
+        self.workers = workers if workers is not None else int(
+            os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))
+        )
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("PASSWORD_HASH_MAX_CONCURRENCY", str(max(self.workers, 1)))
+        )
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "100"))
+        self.rounds = rounds
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        HASH_WAITING.set_function(lambda: self._waiting)
+
+    def _get_executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                if self.workers > 0:
+                    # spawn: forking a process that already runs DB and sweeper threads is unsafe
+                    self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+                else:
+                    self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="password-hash")
+            return self._executor
+
+    async def _run(self, operation_name: str, operation, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            HASH_REJECTED.inc(operation=operation_name)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-ins right now, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+
+        queued = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            HASH_QUEUE_WAIT.observe(time.perf_counter() - queued, operation=operation_name)
+            HASH_IN_FLIGHT.inc()
+            loop = asyncio.get_running_loop()
+            result, seconds = await loop.run_in_executor(self._get_executor(), _timed, operation, *args)
+            HASH_DURATION.observe(seconds, operation=operation_name)
+            return result
+        finally:
+            HASH_IN_FLIGHT.dec()
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", hash_password, password, self.rounds)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", verify_password, plain_password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """True when a stored hash uses a different cost than BCRYPT_ROUNDS"""
+        rounds = hash_rounds(hashed_password)
+        return rounds is not None and rounds != self.rounds
+
+    async def warm_up(self):
+        """Start the worker processes before the first login needs them"""
+        executor = self._get_executor()
+        if isinstance(executor, ProcessPoolExecutor):
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(executor, hash_rounds, "") for _ in range(self.workers)])
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "rounds": self.rounds,
+            "waiting": self._waiting,
+            "in_flight": HASH_IN_FLIGHT.value()
+        }
+
+
+# Global password hasher instance
+password_hasher = PasswordHasher()
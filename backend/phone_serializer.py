@@ -0,0 +1,129 @@
+"""
+Fast serialization for phone results
+
+Catalog reads project only the columns the API returns and get plain rows
+back instead of ORM objects. Each phone is rendered to JSON once per
+catalog version and reused from a fragment cache; responses are written
+with orjson and skip FastAPI's response-model re-validation.
+"""
+import os
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Iterable, List
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.engine import Row
+
+from catalog_sync import add_catalog_listener
+from database import MobilePhone as DBMobilePhone
+from models import MobilePhone
+from tracing import current_span
+
+PHONE_FIELDS = list(MobilePhone.model_fields)
+PHONE_FIELDS_SET = set(PHONE_FIELDS)
+# Response columns plus the version that keys the fragment cache
+PHONE_COLUMNS = [DBMobilePhone.__table__.c[name] for name in PHONE_FIELDS] + [DBMobilePhone.__table__.c.catalog_version]
+
+
+def _default(value: Any) -> Any:
+    """Types orjson does not handle natively"""
+    if isinstance(value, BaseModel):
+        return dict(value)
+    if isinstance(value, Row):
+        return value._asdict()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; accepts Pydantic models, rows and fragments"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class PhoneFragmentCache:
+    """LRU of pre-rendered phone JSON keyed by ID and catalog version
+
+    Catalog syncs bump ``catalog_version`` on every row they change, so a
+    cached fragment is reused only while the row is unchanged.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._fragments: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def fragment(self, row: Row) -> orjson.Fragment:
+        """JSON fragment for one projected phone row"""
+        with self._lock:
+            entry = self._fragments.get(row.id)
+            if entry is not None and entry[0] == row.catalog_version:
+                self._fragments.move_to_end(row.id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        mapping = row._mapping
+        fragment = orjson.Fragment(dumps({name: mapping[name] for name in PHONE_FIELDS}))
+        with self._lock:
+            self._fragments[row.id] = (row.catalog_version, fragment)
+            self._fragments.move_to_end(row.id)
+            while len(self._fragments) > self.max_entries:
+                self._fragments.popitem(last=False)
+        return fragment
+
+    def invalidate(self, phone_ids: Iterable[int] = None):
+        """Drop fragments for these phones, or all of them"""
+        with self._lock:
+            if phone_ids is None:
+                self._fragments.clear()
+                return
+            for phone_id in phone_ids:
+                self._fragments.pop(phone_id, None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._fragments), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses}
+
+
+# Global fragment cache instance
+phone_fragments = PhoneFragmentCache(int(os.getenv("PHONE_FRAGMENT_CACHE_SIZE", "10000")))
+
+
+def phone_model(row: Row) -> MobilePhone:
+    """MobilePhone from a projected row without re-validating database values"""
+    mapping = row._mapping
+    return MobilePhone.model_construct(PHONE_FIELDS_SET, **{name: mapping[name] for name in PHONE_FIELDS})
+
+
+def phones_response(rows: List[Row]) -> FastJSONResponse:
+    """JSON array of phones assembled from cached fragments"""
+    hits = phone_fragments.hits
+    fragments = [phone_fragments.fragment(row) for row in rows]
+    current_span().set_attributes({"phone_fragments.hits": phone_fragments.hits - hits, "phones": len(rows)})
+    return FastJSONResponse(fragments)
+
+
+def phone_response(row: Row) -> FastJSONResponse:
+    return FastJSONResponse(phone_fragments.fragment(row))
+
+
+def _on_catalog_change(changes: dict):
+    phone_fragments.invalidate(changes["updated"] + changes["deleted"])
+
+
+# Free fragments of phones changed by syncs run in this process
+add_catalog_listener(_on_catalog_change)
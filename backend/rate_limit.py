@@ -0,0 +1,297 @@
+"""
+Per-user and per-IP rate limiting for expensive routes
+
+Limits use GCRA (generic cell rate algorithm): each key stores one
+"theoretical arrival time", which allows ``burst`` requests at once and then
+one every ``period / limit`` seconds. The middleware runs before routing,
+so rejected requests never reach the database, bcrypt or the LLM.
+"""
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import orjson
+
+from auth import AuthService
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_DECISIONS = metrics.counter("rate_limit_decisions_total", "Rate limit checks by rule and result")
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """``limit`` requests per ``period`` seconds per key, allowing ``burst`` at once"""
+    name: str
+    path: str
+    method: str
+    scope: str  # "ip" or "user" (falls back to the IP for anonymous requests)
+    limit: int
+    period: float
+    burst: int
+
+    @property
+    def emission_interval(self) -> float:
+        return self.period / self.limit
+
+
+def parse_rule(name: str, path: str, method: str, scope: str, spec: str) -> Optional[RateLimitRule]:
+    """Build a rule from "limit/period[/burst]", e.g. "30/60/10"; empty disables it"""
+    if not spec.strip():
+        return None
+    parts = [part.strip() for part in spec.split("/")]
+    limit, period = int(parts[0]), float(parts[1])
+    burst = int(parts[2]) if len(parts) > 2 else limit
+    return RateLimitRule(name, path, method, scope, limit, period, burst)
+
+
+# (key, emission interval, burst) of one rule applied to one request
+Limit = Tuple[str, float, int]
+
+
+class RateLimitStore(ABC):
+    """Interface for GCRA state backends"""
+
+    # True when hit() does blocking I/O and must run off the event loop
+    blocking = False
+
+    @abstractmethod
+    def hit(self, limits: List[Limit]) -> Tuple[Optional[int], float]:
+        """Count one request against every limit, but only if all of them allow it
+
+        Returns the index of the first exceeded limit (None if allowed) and
+        the seconds until it allows a request.
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of stored keys"""
+
+
+def _gcra(tat: Optional[float], now: float, emission_interval: float, burst: int) -> Tuple[bool, float, float]:
+    """Returns (allowed, retry_after, new theoretical arrival time)"""
+    new_tat = max(tat or now, now) + emission_interval
+    allow_at = new_tat - burst * emission_interval
+    if now < allow_at:
+        return False, allow_at - now, tat
+    return True, 0.0, new_tat
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """Per-process store; least recently used keys are dropped beyond ``max_keys``"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, limits: List[Limit]) -> Tuple[Optional[int], float]:
+        now = time.monotonic()
+        with self._lock:
+            tats = []
+            for index, (key, emission_interval, burst) in enumerate(limits):
+                allowed, retry_after, tat = _gcra(self._tats.get(key), now, emission_interval, burst)
+                if not allowed:
+                    return index, retry_after
+                tats.append((key, tat))
+            for key, tat in tats:
+                self._tats[key] = tat
+                self._tats.move_to_end(key)
+            while len(self._tats) > self.max_keys:
+                self._tats.popitem(last=False)
+        return None, 0.0
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+class SQLiteRateLimitStore(RateLimitStore):
+    """Store shared by all workers on a host through a WAL-mode SQLite file"""
+
+    SWEEP_EVERY = 1000
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limits_tat ON rate_limits (tat)")
+
+    def hit(self, limits: List[Limit]) -> Tuple[Optional[int], float]:
+        now = time.time()
+        exceeded, retry_after = None, 0.0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                tats = []
+                for index, (key, emission_interval, burst) in enumerate(limits):
+                    row = self._conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+                    allowed, retry_after, tat = _gcra(row[0] if row else None, now, emission_interval, burst)
+                    if not allowed:
+                        exceeded = index
+                        break
+                    tats.append((key, tat))
+                if exceeded is None:
+                    self._conn.executemany(
+                        "INSERT INTO rate_limits (key, tat) VALUES (?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET tat = excluded.tat",
+                        tats
+                    )
+                self._hits += 1
+                if self._hits % self.SWEEP_EVERY == 0:
+                    # Keys whose arrival time has passed are back to a full burst
+                    self._conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return exceeded, retry_after
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+
+def create_rate_limit_store() -> RateLimitStore:
+    """Build the store selected by RATE_LIMIT_STORE ("memory" or "sqlite")"""
+    if os.getenv("RATE_LIMIT_STORE", "memory").lower() == "sqlite":
+        return SQLiteRateLimitStore(os.getenv("RATE_LIMIT_STORE_PATH", "rate_limits.sqlite3"))
+    return InMemoryRateLimitStore(int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+
+
+def default_rules() -> List[RateLimitRule]:
+    rules = [
+        parse_rule("chat_user", "/chat", "POST", "user", os.getenv("RATE_LIMIT_CHAT_USER", "30/60/10")),
+        parse_rule("chat_ip", "/chat", "POST", "ip", os.getenv("RATE_LIMIT_CHAT_IP", "120/60/30")),
+        parse_rule("login_ip", "/auth/login", "POST", "ip", os.getenv("RATE_LIMIT_LOGIN_IP", "10/60/5")),
+        parse_rule("register_ip", "/auth/register", "POST", "ip", os.getenv("RATE_LIMIT_REGISTER_IP", "5/60/3")),
+    ]
+    return [rule for rule in rules if rule is not None]
+
+
+class RateLimiter:
+    """Apply every matching rule to a request"""
+
+    def __init__(self, store: RateLimitStore, rules: List[RateLimitRule], proxy_hops: int = 0):
+        self.store = store
+        self.rules = rules
+        self.proxy_hops = proxy_hops
+
+    def client_ip(self, scope: dict) -> str:
+        """Peer address, or the X-Forwarded-For entry added by the ``proxy_hops``-th proxy"""
+        if self.proxy_hops > 0:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-forwarded-for":
+                    hops = [hop.strip() for hop in value.decode("latin-1").split(",") if hop.strip()]
+                    if len(hops) >= self.proxy_hops:
+                        return hops[-self.proxy_hops]
+                    break
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    def user_key(scope: dict) -> Optional[str]:
+        """User id from a valid bearer token; the signature check is cheap, no database"""
+        for name, value in scope.get("headers", ()):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer" or not token:
+                    return None
+                payload = AuthService.decode_token(token.strip())
+                if payload is None:
+                    return None
+                return str(payload.get("uid") or payload["sub"])
+        return None
+
+    async def check(self, scope: dict) -> Optional[Tuple[RateLimitRule, float]]:
+        """The first exceeded rule and its retry delay, or None if the request may proceed
+
+        Every matching rule is checked before any is charged, so a request
+        rejected by one rule uses no quota on the others.
+        """
+        path, method = scope["path"], scope["method"]
+        rules = [rule for rule in self.rules if rule.path == path and rule.method == method]
+        if not rules:
+            return None
+
+        ip = self.client_ip(scope)
+        user = None
+        limits = []
+        for rule in rules:
+            if rule.scope == "user":
+                user = user or self.user_key(scope)
+                key = f"{rule.name}:user:{user}" if user else f"{rule.name}:ip:{ip}"
+            else:
+                key = f"{rule.name}:ip:{ip}"
+            limits.append((key, rule.emission_interval, rule.burst))
+
+        try:
+            if self.store.blocking:
+                exceeded, retry_after = await asyncio.to_thread(self.store.hit, limits)
+            else:
+                exceeded, retry_after = self.store.hit(limits)
+        except Exception as e:
+            # Fail open: a broken limiter must not take the API down
+            logger.error("Rate limit store error: %s", e)
+            for rule in rules:
+                RATE_LIMIT_DECISIONS.inc(rule=rule.name, result="error")
+            return None
+
+        if exceeded is not None:
+            RATE_LIMIT_DECISIONS.inc(rule=rules[exceeded].name, result="rejected")
+            return rules[exceeded], retry_after
+        for rule in rules:
+            RATE_LIMIT_DECISIONS.inc(rule=rule.name, result="allowed")
+        return None
+
+
+class RateLimitMiddleware:
+    """ASGI middleware answering 429 with Retry-After when a limit is exceeded"""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        exceeded = await self.limiter.check(scope)
+        if exceeded is None:
+            await self.app(scope, receive, send)
+            return
+
+        rule, retry_after = exceeded
+        body = orjson.dumps({"detail": "Too many requests, please slow down"})
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                (b"x-ratelimit-limit", f"{rule.limit};w={rule.period:g}".encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def create_rate_limiter() -> Optional[RateLimiter]:
+    """Limiter configured from the environment, or None when RATE_LIMIT_ENABLED=false"""
+    if os.getenv("RATE_LIMIT_ENABLED", "true").lower() != "true":
+        return None
+    return RateLimiter(create_rate_limit_store(), default_rules(), int(os.getenv("RATE_LIMIT_PROXY_HOPS", "0")))
@@ -2,11 +2,7 @@
 Seed script for brands and phone models
 """
 import json
-from database import SessionLocal, engine, Base, Brand, PhoneModel
-
-def create_tables():
-    """Create brand and model tables"""
-    Base.metadata.create_all(bind=engine)
+from database import SessionLocal, Brand, PhoneModel, create_tables
 
 def seed_brands_and_models():
     """Seed brands and models data"""
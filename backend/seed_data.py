@@ -1,9 +1,7 @@
-from database import SessionLocal, MobilePhone
+from catalog_sync import sync_catalog
 
 def seed_database():
     """Seed the database with sample mobile phone data"""
-    db = SessionLocal()
-    
     # Sample mobile phone data
     phones_data = [
         {
@@ -609,23 +607,14 @@ def seed_database():
     ]
     
     try:
-        # Clear existing data
-        db.query(MobilePhone).delete()
-        
-        # Insert new data
-        for phone_data in phones_data:
-            phone = MobilePhone(**phone_data)
-            db.add(phone)
-        
-        db.commit()
-        print(f"Successfully seeded {len(phones_data)} mobile phones")
+        # Apply only what differs from the stored catalog, keeping phone IDs stable
+        changes = sync_catalog(phones_data)
+        print(f"Successfully seeded mobile phones: {len(changes['inserted'])} inserted, "
+              f"{len(changes['updated'])} updated, {len(changes['deleted'])} removed")
         
     except Exception as e:
         print(f"Error seeding database: {e}")
-        db.rollback()
         raise
-    finally:
-        db.close()
 
 if __name__ == "__main__":
     seed_database()
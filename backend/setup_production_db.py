@@ -4,7 +4,7 @@ Production database setup script for Render deployment
 """
 import os
 import sys
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -21,18 +21,17 @@ def setup_database():
         
         print(f"🔗 Connecting to database...")
         
-        # Create engine
-        engine = create_engine(database_url)
+        # The app's engine: database.py rewrites Render's postgres:// URLs for SQLAlchemy
+        from database import engine, create_tables
         
         # Test connection
         with engine.connect() as conn:
-            result = conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 1"))
             print("✅ Database connection successful")
         
-        # Import and create tables
-        from database import Base
-        print("📋 Creating database tables...")
-        Base.metadata.create_all(bind=engine)
+        # Run the migrations
+        print("📋 Running database migrations...")
+        create_tables()
         print("✅ Database tables created successfully")
         
         return True
@@ -0,0 +1,482 @@
+"""
+Request tracing with OpenTelemetry-compatible spans
+
+Spans cover each agent stage, every LLM provider attempt, SQL statements
+and web searches. TRACE_EXPORTER selects where finished spans go:
+
+- "none" (default): tracing is off and instrumentation costs next to nothing
+- "file": OTLP/JSON lines in TRACE_FILE, written by a background thread
+  (readable by the OpenTelemetry Collector's otlpjsonfile receiver)
+- "otlp": the OpenTelemetry SDK with its OTLP/HTTP exporter, configured by
+  the standard OTEL_EXPORTER_OTLP_* variables; falls back to "file" when
+  opentelemetry-sdk and opentelemetry-exporter-otlp-proto-http are missing
+
+Sampling is decided once per trace at its root: TRACE_SAMPLE_RATE of new
+traces are kept, and requests carrying a W3C ``traceparent`` header follow
+the caller's decision.
+"""
+import atexit
+import functools
+import inspect
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from app_logging import get_request_id
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SPANS_DROPPED = metrics.counter("trace_spans_dropped_total", "Finished spans dropped because the export queue was full")
+
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "mobile-shop-api")
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+# OTLP enum values
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+STATUS_ERROR = 2
+MAX_STATEMENT_CHARS = 1000
+
+
+class NoopSpan:
+    """Stands in for spans that are not recorded (tracing off or trace not sampled)"""
+
+    def is_recording(self) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        pass
+
+    def add_event(self, name: str, attributes: Dict[str, Any] = None):
+        pass
+
+    def record_exception(self, exception: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+# Current span of a trace that was not sampled, so its children are not sampled either
+UNSAMPLED_SPAN = NoopSpan()
+
+
+class RemoteParent:
+    """Parent span from an incoming ``traceparent`` header"""
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @classmethod
+    def from_header(cls, value: str) -> Optional["RemoteParent"]:
+        match = TRACEPARENT.match(value.strip().lower())
+        if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+            return None
+        return cls(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class Span:
+    """A recorded span; ``to_otlp`` gives its OTLP/JSON form"""
+
+    __slots__ = ("exporter", "name", "kind", "trace_id", "span_id", "parent_span_id", "start_ns", "end_ns",
+                 "attributes", "events", "status_code", "status_message")
+
+    def __init__(self, exporter, name: str, kind: str, trace_id: str, parent_span_id: Optional[str],
+                 attributes: Dict[str, Any] = None):
+        self.exporter = exporter
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent_span_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes) if attributes else {}
+        self.events = []
+        self.status_code = 0
+        self.status_message = None
+
+    def is_recording(self) -> bool:
+        return self.end_ns is None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, attributes: Dict[str, Any] = None):
+        self.events.append((time.time_ns(), name, attributes or {}))
+
+    def record_exception(self, exception: BaseException):
+        self.status_code = STATUS_ERROR
+        self.status_message = f"{type(exception).__name__}: {exception}"
+        self.add_event("exception", {"exception.type": type(exception).__name__, "exception.message": str(exception)})
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.exporter.export(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS[self.kind],
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status_code},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        if self.events:
+            span["events"] = [
+                {"timeUnixNano": str(at), "name": name, "attributes": _otlp_attributes(attributes)}
+                for at, name, attributes in self.events
+            ]
+        return span
+
+
+class FileSpanExporter:
+    """Write finished spans as OTLP/JSON lines from a background thread
+
+    Each line is one ExportTraceServiceRequest holding up to ``batch_size``
+    spans. The queue is bounded; spans that do not fit are dropped and
+    counted rather than slowing down requests.
+    """
+
+    def __init__(self, path: str, max_queue: int = 10000, batch_size: int = 256, flush_interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.resource = {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})}
+
+    def export(self, span: Span):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            SPANS_DROPPED.inc()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        with open(self.path, "ab") as f:
+            stopping = False
+            while not stopping:
+                batch = []
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                    while True:
+                        if item is None:
+                            stopping = True
+                            break
+                        batch.append(item)
+                        if len(batch) >= self.batch_size:
+                            break
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                if batch:
+                    self._write(f, batch)
+
+    def _write(self, f, batch: List[Span]):
+        try:
+            f.write(orjson.dumps({"resourceSpans": [{
+                "resource": self.resource,
+                "scopeSpans": [{"scope": {"name": "mobile-shop"}, "spans": [span.to_otlp() for span in batch]}]
+            }]}, default=str) + b"\n")
+            f.flush()
+        except Exception:
+            logger.exception("Writing %d spans to %s failed", len(batch), self.path)
+
+    def shutdown(self):
+        """Write out queued spans and stop the thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+
+_current_span: ContextVar[Any] = ContextVar("current_span", default=None)
+
+
+class _SpanScope:
+    """Context manager making a span current for its block and ending it afterwards"""
+
+    __slots__ = ("span", "token")
+
+    def __init__(self, span):
+        self.span = span
+        self.token = None
+
+    def __enter__(self):
+        if self.span is not NOOP_SPAN:
+            self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.span.record_exception(exc)
+        self.span.end()
+        if self.token is not None:
+            _current_span.reset(self.token)
+        return False
+
+
+class Tracer:
+    """Creates spans, samples traces at their root and hands finished spans to an exporter"""
+
+    def __init__(self, exporter=None, sample_rate: float = 0.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start_span(self, name: str, attributes: Dict[str, Any] = None, kind: str = "internal",
+                   parent: Any = None, require_parent: bool = False):
+        """A started span that is not made current; end it with ``end()``
+
+        ``require_parent`` spans (SQL statements) are only recorded inside a
+        sampled trace and never start one.
+        """
+        if self.exporter is None:
+            return NOOP_SPAN
+        parent = parent if parent is not None else _current_span.get()
+        if parent is None:
+            if require_parent or random.random() >= self.sample_rate:
+                return UNSAMPLED_SPAN
+            return Span(self.exporter, name, kind, os.urandom(16).hex(), None, attributes)
+        if isinstance(parent, RemoteParent):
+            if not parent.sampled:
+                return UNSAMPLED_SPAN
+        elif not parent.is_recording():
+            return UNSAMPLED_SPAN
+        return Span(self.exporter, name, kind, parent.trace_id, parent.span_id, attributes)
+
+    def span(self, name: str, attributes: Dict[str, Any] = None, kind: str = "internal") -> _SpanScope:
+        """``with tracer.span("stage") as span:`` times the block as a child of the current span"""
+        return _SpanScope(self.start_span(name, attributes, kind))
+
+    def server_span(self, name: str, traceparent: Optional[str], attributes: Dict[str, Any] = None) -> _SpanScope:
+        """Root span of an incoming request, continuing the caller's trace if there is one"""
+        parent = RemoteParent.from_header(traceparent) if traceparent else None
+        return _SpanScope(self.start_span(name, attributes, "server", parent=parent))
+
+    def current_span(self):
+        return _current_span.get() or NOOP_SPAN
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+    def traced(self, name: str):
+        """Decorator wrapping a function or coroutine function in a span"""
+        def decorator(function):
+            if inspect.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return await function(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+class OpenTelemetryTracer(Tracer):
+    """Tracer backed by the OpenTelemetry SDK, exporting over OTLP/HTTP"""
+
+    def __init__(self, sample_rate: float):
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+        from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+        super().__init__(exporter=None, sample_rate=sample_rate)
+        self._trace = trace
+        self._propagator = TraceContextTextMapPropagator()
+        self._kinds = {"internal": trace.SpanKind.INTERNAL, "server": trace.SpanKind.SERVER,
+                       "client": trace.SpanKind.CLIENT}
+        self.provider = TracerProvider(
+            resource=Resource.create({"service.name": SERVICE_NAME}),
+            sampler=ParentBased(TraceIdRatioBased(sample_rate))
+        )
+        self.provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        self._tracer = self.provider.get_tracer("mobile-shop")
+
+    @property
+    def enabled(self) -> bool:
+        return True
+
+    def start_span(self, name: str, attributes: Dict[str, Any] = None, kind: str = "internal",
+                   parent: Any = None, require_parent: bool = False):
+        if require_parent and not self._trace.get_current_span().is_recording():
+            return NOOP_SPAN
+        return self._tracer.start_span(name, kind=self._kinds[kind],
+                                       attributes={k: v for k, v in (attributes or {}).items() if v is not None})
+
+    def span(self, name: str, attributes: Dict[str, Any] = None, kind: str = "internal"):
+        return self._tracer.start_as_current_span(
+            name, kind=self._kinds[kind], attributes={k: v for k, v in (attributes or {}).items() if v is not None}
+        )
+
+    def server_span(self, name: str, traceparent: Optional[str], attributes: Dict[str, Any] = None):
+        context = self._propagator.extract({"traceparent": traceparent}) if traceparent else None
+        return self._tracer.start_as_current_span(
+            name, context=context, kind=self._kinds["server"],
+            attributes={k: v for k, v in (attributes or {}).items() if v is not None}
+        )
+
+    def current_span(self):
+        return self._trace.get_current_span()
+
+    def shutdown(self):
+        self.provider.shutdown()
+
+
+def create_tracer() -> Tracer:
+    """Tracer configured by TRACE_EXPORTER, TRACE_FILE and TRACE_SAMPLE_RATE"""
+    exporter = os.getenv("TRACE_EXPORTER", "none").lower()
+    sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+    if exporter == "otlp":
+        try:
+            return OpenTelemetryTracer(sample_rate)
+        except ImportError:
+            logger.warning("OpenTelemetry SDK not installed, writing spans to TRACE_FILE instead")
+            exporter = "file"
+    if exporter == "file":
+        return Tracer(FileSpanExporter(os.getenv("TRACE_FILE", "traces.jsonl"),
+                                       int(os.getenv("TRACE_QUEUE_SIZE", "10000"))), sample_rate)
+    return Tracer()
+
+
+# Global tracer instance
+tracer = create_tracer()
+atexit.register(tracer.shutdown)
+
+
+def current_span():
+    """The active span, for adding attributes such as cache hits; a no-op when not tracing"""
+    return tracer.current_span()
+
+
+def trace_engine(engine, name: str):
+    """Record a client span per SQL statement run inside a sampled trace"""
+    if not tracer.enabled:
+        return
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    system = sync_engine.dialect.name
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        span = tracer.start_span("db.query", {
+            "db.system": system,
+            "db.pool": name,
+            "db.statement": statement[:MAX_STATEMENT_CHARS],
+            "db.executemany": executemany
+        }, kind="client", require_parent=True)
+        if span.is_recording():
+            context._trace_span = span
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            if cursor.rowcount >= 0:
+                span.set_attribute("db.rowcount", cursor.rowcount)
+            span.end()
+            context._trace_span = None
+
+    def on_error(exception_context):
+        span = getattr(exception_context.execution_context, "_trace_span", None)
+        if span is not None:
+            span.record_exception(exception_context.original_exception)
+            span.end()
+            exception_context.execution_context._trace_span = None
+
+    event.listen(sync_engine, "before_cursor_execute", before)
+    event.listen(sync_engine, "after_cursor_execute", after)
+    event.listen(sync_engine, "handle_error", on_error)
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for header, value in scope.get("headers", ()):
+            if header == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        attributes = {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+            "http.request_id": get_request_id()
+        }
+        with tracer.server_span(f"{scope['method']} {scope['path']}", traceparent, attributes) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_attribute("error", True)
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
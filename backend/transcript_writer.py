@@ -0,0 +1,240 @@
+"""
+Write-behind persistence of chat transcripts
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import and_, case, insert, tuple_, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, Conversation, ConversationMessage, message_preview
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptWriter:
+    """Queue conversation messages and persist them in periodic multi-row transactions
+
+    Each flush bumps ``conversations.updated_at`` with one UPDATE ... RETURNING
+    and inserts all pending ``conversation_messages`` rows with one
+    executemany, in a single commit. ``stop()`` drains the queue, retrying
+    failed writes with backoff and spilling what still fails to ``spill_path``,
+    which the next ``start()`` replays; messages queued while the writer is
+    not running wait for ``start()`` or an explicit ``flush()``, never writing
+    on the caller's thread.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal,
+                 batch_size: int = None, flush_interval: float = None, max_retries: int = 3,
+                 retry_backoff: float = 0.5, spill_path: str = None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or int(os.getenv("TRANSCRIPT_BATCH_SIZE", "200"))
+        self.flush_interval = flush_interval or float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL_SECONDS", "0.5"))
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        # Empty disables spilling; unsaved messages are then only logged
+        self.spill_path = spill_path if spill_path is not None else os.getenv(
+            "TRANSCRIPT_SPILL_PATH", "transcript_spill.jsonl"
+        )
+        self._pending: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._retries = 0
+        self.written = 0
+        self.failed_batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def start(self):
+        """Start the background flush loop on the running event loop"""
+        if self.running:
+            return
+        self._load_spill()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        if self._pending:
+            self._wakeup.set()
+
+    async def stop(self):
+        """Stop the flush loop and write everything still queued"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for attempt in range(self.max_retries + 1):
+            await self.flush(drop_failed=False)
+            if not self._pending:
+                return
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+        self._spill()
+
+    def enqueue(self, user_id: int, conversation_id: int, user_message: str, ai_response: str,
+                used_web_search: bool, recommended_phones: List[int]):
+        """Queue one message for the next batch"""
+        row = {
+            "user_id": user_id,
+            "conversation_id": conversation_id,
+            "user_message": user_message,
+            "ai_response": ai_response,
+            "used_web_search": used_web_search,
+            "recommended_phones": json.dumps(recommended_phones) if recommended_phones else None,
+            "timestamp": datetime.now()
+        }
+
+        with self._lock:
+            self._pending.append(row)
+            full = len(self._pending) >= self.batch_size
+        if full and self.running:
+            self._wakeup.set()
+
+    async def flush(self, drop_failed: bool = True) -> int:
+        """Write all pending messages now and return how many were written
+
+        A batch that keeps failing is dropped after ``max_retries`` flushes
+        unless ``drop_failed`` is False.
+        """
+        written = 0
+        lock = self._flush_lock or asyncio.Lock()
+        async with lock:
+            while True:
+                with self._lock:
+                    batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                if not batch:
+                    return written
+
+                try:
+                    await asyncio.to_thread(self._write_batch, batch)
+                    self._retries = 0
+                    written += len(batch)
+                except Exception as e:
+                    self.failed_batches += 1
+                    self._retries += 1
+                    if drop_failed and self._retries > self.max_retries:
+                        logger.error("Dropping %d transcript messages after %d retries: %s", len(batch), self.max_retries, e)
+                        self._retries = 0
+                    else:
+                        logger.warning("Transcript flush failed, will retry: %s", e)
+                        with self._lock:
+                            self._pending[:0] = batch
+                        return written
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _spill(self):
+        """Append unsaved messages to the spill file, or log them as lost"""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if self.spill_path:
+            try:
+                with open(self.spill_path, "a", encoding="utf-8") as f:
+                    for row in rows:
+                        f.write(json.dumps({**row, "timestamp": row["timestamp"].isoformat()}) + "\n")
+                logger.error("Spilled %d unsaved transcript messages to %s", len(rows), self.spill_path)
+                return
+            except OSError as e:
+                logger.error("Could not spill transcript messages to %s: %s", self.spill_path, e)
+        logger.error("Lost %d transcript messages at shutdown", len(rows))
+
+    def _load_spill(self):
+        """Queue messages spilled by an earlier shutdown"""
+        if not self.spill_path:
+            return
+        # Claim the file first so only one worker replays it
+        claimed = f"{self.spill_path}.{os.getpid()}"
+        try:
+            os.rename(self.spill_path, claimed)
+        except FileNotFoundError:
+            return
+        with open(claimed, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        for row in rows:
+            row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+        with self._lock:
+            self._pending[:0] = rows
+        os.remove(claimed)
+        logger.info("Replaying %d spilled transcript messages", len(rows))
+
+    def _write_batch(self, rows: List[dict]):
+        """Bump the conversations and insert their messages in one transaction
+
+        The UPDATE only matches conversations owned by the sending user and
+        returns their IDs, so ownership is checked without a SELECT; messages
+        addressed to any other conversation are dropped. It also advances
+        ``message_count`` and ``last_message_preview`` for the owned ones.
+        """
+        db = self.session_factory()
+        try:
+            # Per (conversation, sender): new message count and latest message
+            counts, latest = {}, {}
+            for row in rows:
+                owner = (row["conversation_id"], row["user_id"])
+                counts[owner] = counts.get(owner, 0) + 1
+                if owner not in latest or row["timestamp"] >= latest[owner]["timestamp"]:
+                    latest[owner] = row
+
+            owned_by = [
+                (and_(Conversation.id == owner[0], Conversation.user_id == owner[1]), owner) for owner in counts
+            ]
+            owned = set(db.execute(
+                update(Conversation).where(tuple_(Conversation.id, Conversation.user_id).in_(list(counts))).values(
+                    updated_at=case(
+                        *[(condition, latest[owner]["timestamp"]) for condition, owner in owned_by],
+                        else_=Conversation.updated_at
+                    ),
+                    message_count=Conversation.message_count + case(
+                        *[(condition, counts[owner]) for condition, owner in owned_by], else_=0
+                    ),
+                    last_message_preview=case(
+                        *[(condition, message_preview(latest[owner]["user_message"])) for condition, owner in owned_by],
+                        else_=Conversation.last_message_preview
+                    )
+                ).returning(Conversation.id, Conversation.user_id),
+                execution_options={"synchronize_session": False}
+            ).tuples())
+
+            messages = [
+                {key: value for key, value in row.items() if key != "user_id"}
+                for row in rows if (row["conversation_id"], row["user_id"]) in owned
+            ]
+            if len(messages) < len(rows):
+                logger.warning("Skipped %d transcript messages for conversations the user does not own", len(rows) - len(messages))
+            if messages:
+                db.execute(insert(ConversationMessage), messages)
+
+            db.commit()
+            self.written += len(messages)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+# Global transcript writer instance
+transcript_writer = TranscriptWriter()
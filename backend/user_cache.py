@@ -0,0 +1,138 @@
+"""
+Short-lived cache of authenticated users by bearer token
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+from metrics import metrics
+
+USER_CACHE_LOOKUPS = metrics.counter("auth_user_cache_total", "Bearer token resolutions by source")
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """The authenticated user's identity, detached from any database session"""
+    id: int
+    email: str
+    is_active: bool
+    full_name: Optional[str] = None
+    created_at: Optional[datetime] = None
+    last_login: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=bool(user.is_active),
+            full_name=user.full_name,
+            created_at=user.created_at,
+            last_login=user.last_login
+        )
+
+
+class AuthenticatedUserCache:
+    """Bounded LRU of token -> UserSnapshot
+
+    Entries live for ``ttl_seconds`` or until the token expires, whichever
+    comes first. ``invalidate_user`` drops a user's entries and remembers
+    when, so signed claims issued before that moment are no longer trusted;
+    the revocation is forgotten after ``ttl_seconds`` (or ``retain_seconds``)
+    once no such token can still be in use. Both are per process; in other
+    workers a deactivation takes effect when their entries expire.
+    """
+
+    def __init__(self, ttl_seconds: float = None, max_entries: int = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60")
+        )
+        self.max_entries = max_entries or int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", "10000"))
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self._revoked_at: Dict[int, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[UserSnapshot]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            snapshot, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(token)
+                return None
+            self._entries.move_to_end(token)
+            return snapshot
+
+    def put(self, token: str, snapshot: UserSnapshot, token_expires_at: Optional[float] = None):
+        if self.ttl_seconds <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            self._remove(token)
+            self._entries[token] = (snapshot, expires_at)
+            self._tokens_by_user.setdefault(snapshot.id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int, retain_seconds: float = 0):
+        """Forget a user's cached tokens, e.g. after deactivation
+
+        The revocation is kept for ``ttl_seconds``, or ``retain_seconds`` if
+        longer (the token lifetime, when signed claims are trusted).
+        """
+        now = time.time()
+        with self._lock:
+            self._prune_revoked(now)
+            self._revoked_at[user_id] = (now, now + max(self.ttl_seconds, retain_seconds))
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def revoked_since(self, user_id: int, issued_at: Optional[float]) -> bool:
+        """True if the user was invalidated after a token issued at ``issued_at``"""
+        with self._lock:
+            revoked = self._revoked_at.get(user_id)
+        if revoked is None or revoked[1] <= time.time():
+            return False
+        return issued_at is None or issued_at <= revoked[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "revoked_users": len(self._revoked_at)
+        }
+
+    def _prune_revoked(self, now: float):
+        for user_id in [user_id for user_id, (_, forget_at) in self._revoked_at.items() if forget_at <= now]:
+            del self._revoked_at[user_id]
+
+    def _remove(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[0].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[0].id]
+
+
+# Global authenticated user cache instance
+user_cache = AuthenticatedUserCache()
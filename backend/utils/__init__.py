@@ -1,18 +1,25 @@
 """
 Utils module for mobile phone shopping assistant
 """
-from .query_processor import QueryProcessor, PriceExtractor, FeatureExtractor, DatabaseQueryBuilder, ResponseFormatter
+from .query_processor import (
+    QueryProcessor, PriceExtractor, FeatureExtractor, DatabaseQueryBuilder, AsyncDatabaseQueryBuilder, ResponseFormatter
+)
 from .web_search import WebSearchService
-from .user_sessions import session_manager, UserSession, ConversationMessage
+from .snippet_compactor import SnippetCompactor, snippet_compactor
+from .user_sessions import session_manager, UserSession, ConversationMessage, ConversationHistory
 
 __all__ = [
     'QueryProcessor',
     'PriceExtractor', 
     'FeatureExtractor',
     'DatabaseQueryBuilder',
+    'AsyncDatabaseQueryBuilder',
     'ResponseFormatter',
     'WebSearchService',
+    'SnippetCompactor',
+    'snippet_compactor',
     'session_manager',
     'UserSession',
-    'ConversationMessage'
+    'ConversationMessage',
+    'ConversationHistory'
 ]
@@ -4,8 +4,13 @@ Utility functions for the mobile phone shopping assistant
 import re
 import json
 from typing import Dict, List, Any, Optional
+from sqlalchemy import Select, func, or_, select
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from database import MobilePhone as DBMobilePhone, Brand, PhoneModel
+from phone_serializer import PHONE_COLUMNS
+from .snippet_compactor import snippet_compactor
 
 class QueryProcessor:
     """Process and understand user queries dynamically"""
@@ -147,20 +152,23 @@ class DatabaseQueryBuilder:
     def __init__(self, db: Session):
         self.db = db
     
-    def build_phone_query(self, filters: Dict[str, Any]) -> List[DBMobilePhone]:
-        """Build and execute phone query based on filters"""
-        query = self.db.query(DBMobilePhone)
+    @staticmethod
+    def build_phone_statement(filters: Dict[str, Any], limit: int = 20) -> Select:
+        """Build the phone SELECT for the given filters
+        
+        Projects the response columns only; rows bypass the ORM identity map.
+        """
+        query = select(*PHONE_COLUMNS).where(DBMobilePhone.is_active == True)
         
         if filters.get('brands'):
-            from sqlalchemy import or_
-            brand_conditions = []
-            for brand in filters['brands']:
-                brand_conditions.append(DBMobilePhone.brand.ilike(f"%{brand}%"))
-            if brand_conditions:
-                query = query.filter(or_(*brand_conditions))
+            # Brands are canonical names; compare case-insensitively so the
+            # (lower(brand), price) index applies
+            query = query.filter(func.lower(DBMobilePhone.brand).in_([brand.lower() for brand in filters['brands']]))
+        
+        if filters.get('brand_prefix'):
+            query = query.filter(func.lower(DBMobilePhone.brand).startswith(filters['brand_prefix'].lower(), autoescape=True))
         
         if filters.get('models'):
-            from sqlalchemy import or_
             model_conditions = []
             for model in filters['models']:
                 model_conditions.append(DBMobilePhone.name.ilike(f"%{model}%"))
@@ -179,13 +187,86 @@ class DatabaseQueryBuilder:
         if filters.get('min_storage'):
             query = query.filter(DBMobilePhone.storage >= filters['min_storage'])
         
-        return query.limit(20).all()
+        return query.limit(limit)
+    
+    def build_phone_query(self, filters: Dict[str, Any], limit: int = 20) -> List[Row]:
+        """Build and execute phone query based on filters"""
+        return self.db.execute(self.build_phone_statement(filters, limit)).all()
+    
+    def get_phones_by_ids(self, phone_ids: List[int]) -> List[Row]:
+        """Get phones by ID, preserving the requested order"""
+        rows = self.db.execute(select(*PHONE_COLUMNS).where(DBMobilePhone.id.in_(phone_ids))).all()
+        by_id = {row.id: row for row in rows}
+        return [by_id[phone_id] for phone_id in phone_ids if phone_id in by_id]
+    
+    def get_active_phones(self, limit: int = 20) -> List[Row]:
+        """Any active phones, for queries whose filters matched nothing"""
+        return self.db.execute(select(*PHONE_COLUMNS).where(DBMobilePhone.is_active == True).limit(limit)).all()
+
+class AsyncDatabaseQueryBuilder:
+    """DatabaseQueryBuilder counterpart for AsyncSession"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def build_phone_query(self, filters: Dict[str, Any], limit: int = 20) -> List[Row]:
+        """Build and execute phone query based on filters without blocking the event loop"""
+        result = await self.db.execute(DatabaseQueryBuilder.build_phone_statement(filters, limit))
+        return result.all()
+    
+    async def get_phone(self, phone_id: int) -> Optional[Row]:
+        """Get a single active phone by ID"""
+        result = await self.db.execute(
+            select(*PHONE_COLUMNS).where(DBMobilePhone.id == phone_id, DBMobilePhone.is_active == True)
+        )
+        return result.first()
+    
+    async def get_phones_by_ids(self, phone_ids: List[int]) -> List[DBMobilePhone]:
+        """Get phones by ID, preserving the requested order
+        
+        Includes phones removed from the catalog, which older conversations may still reference.
+        """
+        result = await self.db.scalars(select(DBMobilePhone).where(DBMobilePhone.id.in_(phone_ids)))
+        by_id = {phone.id: phone for phone in result.all()}
+        return [by_id[phone_id] for phone_id in phone_ids if phone_id in by_id]
+    
+    async def get_phone_rows_by_ids(self, phone_ids: List[int]) -> List[Row]:
+        """Catalog rows by ID, preserving the requested order"""
+        result = await self.db.execute(select(*PHONE_COLUMNS).where(DBMobilePhone.id.in_(phone_ids)))
+        by_id = {row.id: row for row in result.all()}
+        return [by_id[phone_id] for phone_id in phone_ids if phone_id in by_id]
+    
+    async def get_active_phones(self, limit: int = 20) -> List[Row]:
+        """Any active phones, for queries whose filters matched nothing"""
+        result = await self.db.execute(select(*PHONE_COLUMNS).where(DBMobilePhone.is_active == True).limit(limit))
+        return result.all()
+    
+    async def resolve_brands(self, term: str) -> List[str]:
+        """Canonical brand names whose name or an alias starts with ``term``, case-insensitively"""
+        term = term.strip().lower()
+        result = await self.db.execute(select(Brand.name, Brand.aliases).where(Brand.is_active == True))
+        matched = []
+        for name, aliases in result.all():
+            candidates = [name]
+            if aliases:
+                try:
+                    candidates += json.loads(aliases)
+                except json.JSONDecodeError:
+                    pass
+            if any(candidate.lower().startswith(term) for candidate in candidates):
+                matched.append(name)
+        return matched
+    
+    async def get_brands(self) -> List[str]:
+        """Get all distinct brands in the catalog"""
+        result = await self.db.scalars(select(DBMobilePhone.brand).where(DBMobilePhone.is_active == True).distinct())
+        return result.all()
 
 class ResponseFormatter:
     """Format responses for different contexts"""
     
     @staticmethod
-    def format_phone_data(phones: List[DBMobilePhone]) -> str:
+    def format_phone_data(phones: List[Row]) -> str:
         """Format phone data for AI model"""
         if not phones:
             return "No phones found matching the criteria."
@@ -213,14 +294,18 @@ Description: {phone.description}
         return formatted_data
     
     @staticmethod
-    def format_web_search_results(results: List[Dict], title: str = "Additional Information from Latest Sources") -> str:
-        """Format web search results for AI prompt"""
+    def format_web_search_results(results: List[Dict], title: str = "Additional Information from Latest Sources",
+                                  query: str = "", phone_names: Optional[List[str]] = None) -> str:
+        """Format web search results for AI prompt as a compact, ranked fact list"""
         if not results:
             return ""
         
+        facts = snippet_compactor.compact(results, query, phone_names)
+        if not facts:
+            return ""
+        
         formatted = f"\n{title}:\n\n"
-        for i, result in enumerate(results[:3], 1):
-            formatted += f"{i}. {result.get('title', '')}\n"
-            formatted += f"   {result.get('snippet', '')}\n\n"
+        for fact in facts:
+            formatted += f"- {fact}\n"
         
         return formatted
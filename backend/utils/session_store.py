@@ -0,0 +1,227 @@
+"""
+Bounded session stores with TTL expiry, LRU eviction and an optional shared SQLite backend
+"""
+import heapq
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore(ABC):
+    """Interface for session storage backends"""
+
+    # True when get/put do blocking I/O and must run off the event loop
+    blocking = False
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Any]:
+        """Return a live session and refresh its expiry, or None"""
+
+    @abstractmethod
+    def put(self, session_id: str, session: Any):
+        """Insert or replace a session and refresh its expiry"""
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Remove a session if present"""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Remove expired sessions, returning how many were removed"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of stored sessions"""
+
+    def start_sweeper(self, interval_seconds: float = 60.0):
+        """Start a daemon thread that periodically removes expired sessions"""
+        if self._sweeper and self._sweeper.is_alive():
+            return
+
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.wait(interval_seconds):
+                try:
+                    self.sweep()
+                except Exception:
+                    logger.exception("Session sweep failed")
+
+        self._sweeper = threading.Thread(target=run, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        """Stop the background sweeper thread"""
+        self._stop_event.set()
+        if self._sweeper:
+            self._sweeper.join(timeout=5)
+            self._sweeper = None
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process store: LRU-ordered dict plus a min-heap of expiry times"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        super().__init__(ttl_seconds, max_entries)
+        self._sessions: "OrderedDict[str, Any]" = OrderedDict()
+        self._expires_at = {}
+        self._expiry_heap = []
+        self._lock = threading.RLock()
+
+    def get(self, session_id: str) -> Optional[Any]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+
+            now = time.monotonic()
+            if self._expires_at[session_id] <= now:
+                self._remove(session_id)
+                return None
+
+            self._touch(session_id, now)
+            return session
+
+    def put(self, session_id: str, session: Any):
+        with self._lock:
+            now = time.monotonic()
+            self._sessions[session_id] = session
+            self._touch(session_id, now)
+            self._expire(now)
+
+            while len(self._sessions) > self.max_entries:
+                oldest_id, _ = self._sessions.popitem(last=False)
+                self._expires_at.pop(oldest_id, None)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._remove(session_id)
+
+    def sweep(self) -> int:
+        with self._lock:
+            return self._expire(time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _touch(self, session_id: str, now: float):
+        """Mark a session as most recently used and push its new expiry"""
+        expires_at = now + self.ttl_seconds
+        self._expires_at[session_id] = expires_at
+        self._sessions.move_to_end(session_id)
+        heapq.heappush(self._expiry_heap, (expires_at, session_id))
+
+        # Every touch leaves a stale heap entry behind; rebuild once they dominate
+        if len(self._expiry_heap) > 2 * len(self._sessions) + 64:
+            self._expiry_heap = [(expiry, sid) for sid, expiry in self._expires_at.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def _expire(self, now: float) -> int:
+        """Pop heap entries whose deadline has passed"""
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, session_id = heapq.heappop(self._expiry_heap)
+            # Skip entries superseded by a later touch or already evicted
+            if self._expires_at.get(session_id) == expires_at:
+                self._remove(session_id)
+                removed += 1
+        return removed
+
+    def _remove(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        self._expires_at.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Store shared by all workers on a host through a WAL-mode SQLite file"""
+
+    blocking = True
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int,
+                 encode: Callable[[Any], str], decode: Callable[[str], Any]):
+        super().__init__(ttl_seconds, max_entries)
+        self.path = path
+        self.encode = encode
+        self.decode = decode
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions (expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_last_access ON sessions (last_access)")
+
+    def get(self, session_id: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "UPDATE sessions SET expires_at = ?, last_access = ? "
+                "WHERE session_id = ? AND expires_at > ? RETURNING data",
+                (now + self.ttl_seconds, now, session_id, now)
+            ).fetchone()
+        return self.decode(row[0]) if row else None
+
+    def put(self, session_id: str, session: Any):
+        now = time.time()
+        data = self.encode(session)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO sessions (session_id, data, expires_at, last_access) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, "
+                    "expires_at = excluded.expires_at, last_access = excluded.last_access",
+                    (session_id, data, now + self.ttl_seconds, now)
+                )
+                self._conn.execute(
+                    "DELETE FROM sessions WHERE session_id IN ("
+                    "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def sweep(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_session_store(encode: Callable[[Any], str], decode: Callable[[str], Any]) -> SessionStore:
+    """Build the session store selected by SESSION_STORE ("memory" or "sqlite")"""
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    ttl_seconds = float(os.getenv("SESSION_TTL_SECONDS", str(24 * 60 * 60)))
+    max_entries = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+
+    if backend == "sqlite":
+        path = os.getenv("SESSION_STORE_PATH", "sessions.sqlite3")
+        return SQLiteSessionStore(path, ttl_seconds, max_entries, encode, decode)
+
+    return InMemorySessionStore(ttl_seconds, max_entries)
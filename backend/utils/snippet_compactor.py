@@ -0,0 +1,158 @@
+"""
+Compaction of web search snippets before they are injected into LLM prompts
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Sentence boundaries plus the separators search engines use inside snippets
+SENTENCE_SPLIT_PATTERN = re.compile(r'(?<=[.!?])\s+|\s+(?:\.\.\.|…|\||·|•)\s*')
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:\.[0-9]+)?')
+# " - Gadgets 360", " | Smartprix" and similar site suffixes in result titles
+TITLE_SUFFIX_PATTERN = re.compile(r'\s+[-|–]\s+[^-|–]{2,40}$')
+DATE_PREFIX_PATTERN = re.compile(r'^[A-Z][a-z]{2} \d{1,2}, \d{4}\s*')
+
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'best', 'by', 'for', 'from', 'has', 'have',
+    'in', 'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'with',
+    'you', 'your', 'me', 'show', 'phone', 'phones', 'mobile', 'what', 'which', 'should', 'i',
+])
+
+FILLER_PATTERN = re.compile(
+    r'click here|read more|buy now|shop now|subscribe|sign up|cookie|all rights reserved|'
+    r'check out (?:our|the) |find (?:the )?latest|compare prices? (?:online|at)|lowest price online|'
+    r'free shipping|exclusive offers?|download (?:the )?app',
+    re.IGNORECASE
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token for English text)"""
+    return max(1, (len(text) + 3) // 4)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class SnippetCompactor:
+    """Rank snippet sentences with BM25 and emit a deduplicated fact list within a token budget"""
+
+    def __init__(self, token_budget: int = 250, max_facts: int = 8, min_tokens: int = 4,
+                 duplicate_threshold: float = 0.6, k1: float = 1.5, b: float = 0.75):
+        self.token_budget = token_budget
+        self.max_facts = max_facts
+        self.min_tokens = min_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.k1 = k1
+        self.b = b
+
+    def compact(self, results: List[Dict], query: str = "", phone_names: Optional[List[str]] = None) -> List[str]:
+        """Return the most relevant unique facts from search results"""
+        candidates = self._extract_candidates(results)
+        if not candidates:
+            return []
+
+        query_terms = set(tokenize(query))
+        for name in phone_names or []:
+            query_terms.update(tokenize(name))
+
+        scores = self._bm25_scores([tokens for _, tokens in candidates], query_terms)
+        # Stable ordering: higher score first, then original position
+        ranked = sorted(range(len(candidates)), key=lambda i: (-scores[i], i))
+        if query_terms and scores[ranked[0]] > 0:
+            ranked = [i for i in ranked if scores[i] > 0]
+
+        facts = []
+        selected_token_sets = []
+        used_tokens = 0
+        for index in ranked:
+            sentence, tokens = candidates[index]
+            token_set = set(tokens)
+            if any(self._jaccard(token_set, other) >= self.duplicate_threshold for other in selected_token_sets):
+                continue
+
+            cost = estimate_tokens(sentence)
+            if used_tokens + cost > self.token_budget:
+                continue
+
+            facts.append(sentence)
+            selected_token_sets.append(token_set)
+            used_tokens += cost
+            if len(facts) >= self.max_facts:
+                break
+
+        return facts
+
+    def _extract_candidates(self, results: List[Dict]) -> List[tuple]:
+        """Split titles and snippets into cleaned, tokenized sentences"""
+        candidates = []
+        seen = set()
+        seen_links = set()
+
+        for result in results:
+            link = result.get('link')
+            if link:
+                if link in seen_links:
+                    continue
+                seen_links.add(link)
+
+            title = TITLE_SUFFIX_PATTERN.sub('', (result.get('title') or '').strip())
+            snippet = DATE_PREFIX_PATTERN.sub('', (result.get('snippet') or '').replace('\n', ' ').strip())
+
+            for text in [title] + SENTENCE_SPLIT_PATTERN.split(snippet):
+                sentence = text.strip(' .-–|·•…')
+                if not sentence or FILLER_PATTERN.search(sentence):
+                    continue
+
+                tokens = tokenize(sentence)
+                if len(tokens) < self.min_tokens:
+                    continue
+
+                key = ' '.join(tokens)
+                if key in seen:
+                    continue
+                seen.add(key)
+                candidates.append((sentence, tokens))
+
+        return candidates
+
+    def _bm25_scores(self, documents: List[List[str]], query_terms: set) -> List[float]:
+        """Okapi BM25 score of every sentence against the query terms"""
+        if not query_terms:
+            return [0.0] * len(documents)
+
+        doc_count = len(documents)
+        avg_length = sum(len(doc) for doc in documents) / doc_count
+        document_frequency = Counter()
+        for doc in documents:
+            document_frequency.update(set(doc) & query_terms)
+
+        idf = {
+            term: math.log(1 + (doc_count - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_frequency.items()
+        }
+
+        scores = []
+        for doc in documents:
+            term_counts = Counter(token for token in doc if token in idf)
+            length_norm = self.k1 * (1 - self.b + self.b * len(doc) / avg_length)
+            score = 0.0
+            for term, count in term_counts.items():
+                score += idf[term] * count * (self.k1 + 1) / (count + length_norm)
+            scores.append(score)
+
+        return scores
+
+    @staticmethod
+    def _jaccard(first: set, second: set) -> float:
+        """Jaccard similarity of two token sets"""
+        if not first or not second:
+            return 0.0
+        return len(first & second) / len(first | second)
+
+
+# Default compactor used by ResponseFormatter
+snippet_compactor = SnippetCompactor()
@@ -1,21 +1,95 @@
 """
 User session management and conversation history
 """
+import asyncio
 import uuid
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+from dataclasses import dataclass, field
 import json
 
-@dataclass
+from .session_store import SessionStore, create_session_store
+
+# Session history keeps only what prompts use (they truncate to 100-150 chars)
+MAX_HISTORY_MESSAGES = 10
+MAX_USER_MESSAGE_CHARS = 300
+MAX_AI_RESPONSE_CHARS = 400
+
 class ConversationMessage:
-    """Single conversation message"""
-    timestamp: datetime
-    user_message: str
-    ai_response: str
-    used_web_search: bool
-    phone_recommendations: List[Dict]
-    session_id: str
+    """Single conversation message
+    
+    Stores truncated text and the IDs of recommended phones, not the phones
+    themselves.
+    """
+    __slots__ = ("timestamp", "user_message", "ai_response", "used_web_search", "phone_ids")
+    
+    def __init__(self, timestamp: datetime, user_message: str, ai_response: str,
+                 used_web_search: bool, phone_ids: Sequence[int] = ()):
+        self.timestamp = timestamp
+        self.user_message = user_message[:MAX_USER_MESSAGE_CHARS]
+        self.ai_response = ai_response[:MAX_AI_RESPONSE_CHARS]
+        self.used_web_search = used_web_search
+        self.phone_ids = tuple(phone_ids)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "timestamp": self.timestamp.isoformat(),
+            "user_message": self.user_message,
+            "ai_response": self.ai_response,
+            "used_web_search": self.used_web_search,
+            "phone_ids": list(self.phone_ids)
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ConversationMessage":
+        return cls(
+            timestamp=datetime.fromisoformat(data["timestamp"]),
+            user_message=data["user_message"],
+            ai_response=data["ai_response"],
+            used_web_search=data["used_web_search"],
+            phone_ids=data.get("phone_ids", ())
+        )
+    
+    def __repr__(self) -> str:
+        return f"ConversationMessage(timestamp={self.timestamp!r}, user_message={self.user_message[:30]!r}, phone_ids={self.phone_ids!r})"
+
+class ConversationHistory:
+    """Fixed-size ring buffer of conversation messages, oldest first"""
+    __slots__ = ("_items", "_start", "_size")
+    
+    def __init__(self, capacity: int = MAX_HISTORY_MESSAGES, messages: Iterable[ConversationMessage] = ()):
+        self._items: List[Optional[ConversationMessage]] = [None] * capacity
+        self._start = 0
+        self._size = 0
+        for message in messages:
+            self.append(message)
+    
+    @property
+    def capacity(self) -> int:
+        return len(self._items)
+    
+    def append(self, message: ConversationMessage):
+        """Add a message, overwriting the oldest one when full"""
+        capacity = len(self._items)
+        if self._size < capacity:
+            self._items[(self._start + self._size) % capacity] = message
+            self._size += 1
+        else:
+            self._items[self._start] = message
+            self._start = (self._start + 1) % capacity
+    
+    def recent(self, limit: int) -> List[ConversationMessage]:
+        """Return up to ``limit`` most recent messages, oldest first"""
+        count = min(max(limit, 0), self._size)
+        capacity = len(self._items)
+        first = self._start + self._size - count
+        return [self._items[(first + offset) % capacity] for offset in range(count)]
+    
+    def __iter__(self) -> Iterator[ConversationMessage]:
+        return iter(self.recent(self._size))
+    
+    def __len__(self) -> int:
+        return self._size
 
 @dataclass
 class UserSession:
@@ -23,69 +97,120 @@ class UserSession:
     session_id: str
     created_at: datetime
     last_activity: datetime
-    conversation_history: List[ConversationMessage]
+    conversation_history: ConversationHistory
     user_preferences: Dict[str, any]
+    context_summary: Dict[str, Any] = field(default_factory=dict)
+
+    def to_json(self) -> str:
+        """Serialize the session for shared session stores"""
+        return json.dumps({
+            "session_id": self.session_id,
+            "created_at": self.created_at.isoformat(),
+            "last_activity": self.last_activity.isoformat(),
+            "conversation_history": [message.to_dict() for message in self.conversation_history],
+            "user_preferences": self.user_preferences,
+            "context_summary": self.context_summary
+        }, default=str)
+
+    @classmethod
+    def from_json(cls, data: str) -> "UserSession":
+        """Rebuild a session serialized with to_json"""
+        raw = json.loads(data)
+        return cls(
+            session_id=raw["session_id"],
+            created_at=datetime.fromisoformat(raw["created_at"]),
+            last_activity=datetime.fromisoformat(raw["last_activity"]),
+            conversation_history=ConversationHistory(
+                messages=(ConversationMessage.from_dict(message) for message in raw["conversation_history"])
+            ),
+            user_preferences=raw["user_preferences"],
+            context_summary=raw.get("context_summary", {})
+        )
 
 class SessionManager:
     """Manages user sessions and conversation history"""
     
-    def __init__(self):
-        self.sessions: Dict[str, UserSession] = {}
-        self.session_timeout = timedelta(hours=24)  # 24 hour session timeout
+    def __init__(self, store: Optional[SessionStore] = None):
+        # Expiry (sliding TTL) and max-entries eviction are enforced by the store
+        if store is None:
+            store = create_session_store(lambda session: session.to_json(), UserSession.from_json)
+        self.store = store
+        self.session_timeout = timedelta(seconds=self.store.ttl_seconds)
     
     def create_session(self, user_email: str = None) -> str:
         """Create a new user session"""
-        session_id = str(uuid.uuid4())
+        session = self.new_session()
+        self.store.put(session.session_id, session)
+        return session.session_id
+    
+    def new_session(self) -> UserSession:
+        """A fresh session; it is stored by the first save_session"""
         now = datetime.now()
-        
-        session = UserSession(
-            session_id=session_id,
+        return UserSession(
+            session_id=str(uuid.uuid4()),
             created_at=now,
             last_activity=now,
-            conversation_history=[],
+            conversation_history=ConversationHistory(),
             user_preferences={}
         )
-        
-        self.sessions[session_id] = session
-        return session_id
+    
+    def load_session(self, session_id: Optional[str]) -> UserSession:
+        """The live session for ``session_id``, or a new unsaved one"""
+        return self.get_session(session_id) or self.new_session()
+    
+    async def load_session_async(self, session_id: Optional[str]) -> UserSession:
+        """load_session, off the event loop when the store blocks"""
+        if self.store.blocking:
+            return await asyncio.to_thread(self.load_session, session_id)
+        return self.load_session(session_id)
+    
+    async def save_session_async(self, session: UserSession):
+        """save_session, off the event loop when the store blocks"""
+        if self.store.blocking:
+            await asyncio.to_thread(self.save_session, session)
+        else:
+            self.save_session(session)
     
     def get_session(self, session_id: str) -> Optional[UserSession]:
         """Get user session by ID"""
-        if session_id not in self.sessions:
+        if not session_id:
             return None
         
-        session = self.sessions[session_id]
-        
-        # Check if session has expired
-        if datetime.now() - session.last_activity > self.session_timeout:
-            del self.sessions[session_id]
+        session = self.store.get(session_id)
+        if not session:
             return None
         
         # Update last activity
         session.last_activity = datetime.now()
         return session
     
+    def save_session(self, session: UserSession):
+        """Write a modified session back to the store"""
+        self.store.put(session.session_id, session)
+    
     def add_conversation(self, session_id: str, user_message: str, ai_response: str, 
-                        used_web_search: bool, phone_recommendations: List[Dict]):
+                        used_web_search: bool, phone_ids: Sequence[int]):
         """Add a conversation to session history"""
         session = self.get_session(session_id)
         if not session:
             return
         
+        self.record_conversation(session, user_message, ai_response, used_web_search, phone_ids)
+        self.save_session(session)
+    
+    @staticmethod
+    def record_conversation(session: UserSession, user_message: str, ai_response: str,
+                            used_web_search: bool, phone_ids: Sequence[int]):
+        """Append an exchange to a loaded session; the caller saves it"""
         message = ConversationMessage(
             timestamp=datetime.now(),
             user_message=user_message,
             ai_response=ai_response,
             used_web_search=used_web_search,
-            phone_recommendations=phone_recommendations,
-            session_id=session_id
+            phone_ids=phone_ids
         )
-        
+        # The ring buffer keeps only the last MAX_HISTORY_MESSAGES conversations
         session.conversation_history.append(message)
-        
-        # Keep only last 10 conversations to manage memory
-        if len(session.conversation_history) > 10:
-            session.conversation_history = session.conversation_history[-10:]
     
     def get_recent_conversations(self, session_id: str, limit: int = 5) -> List[ConversationMessage]:
         """Get recent conversation history"""
@@ -93,7 +218,7 @@ class SessionManager:
         if not session:
             return []
         
-        return session.conversation_history[-limit:]
+        return session.conversation_history.recent(limit)
     
     def update_user_preferences(self, session_id: str, preferences: Dict[str, any]):
         """Update user preferences based on conversation"""
@@ -102,6 +227,7 @@ class SessionManager:
             return
         
         session.user_preferences.update(preferences)
+        self.save_session(session)
     
     def get_user_preferences(self, session_id: str) -> Dict[str, any]:
         """Get user preferences"""
@@ -111,16 +237,26 @@ class SessionManager:
         
         return session.user_preferences
     
-    def cleanup_expired_sessions(self):
+    def stats(self) -> Dict[str, Any]:
+        """Store backend and size"""
+        return {
+            "backend": type(self.store).__name__,
+            "sessions": len(self.store),
+            "max_entries": self.store.max_entries,
+            "ttl_seconds": self.store.ttl_seconds
+        }
+    
+    def cleanup_expired_sessions(self) -> int:
         """Clean up expired sessions"""
-        now = datetime.now()
-        expired_sessions = [
-            session_id for session_id, session in self.sessions.items()
-            if now - session.last_activity > self.session_timeout
-        ]
-        
-        for session_id in expired_sessions:
-            del self.sessions[session_id]
+        return self.store.sweep()
+    
+    def start_cleanup(self, interval_seconds: float = 60.0):
+        """Sweep expired sessions in the background"""
+        self.store.start_sweeper(interval_seconds)
+    
+    def stop_cleanup(self):
+        """Stop the background session sweeper"""
+        self.store.stop_sweeper()
 
 # Global session manager instance
 session_manager = SessionManager()
@@ -1,17 +1,36 @@
 """
 Web search service for finding mobile phone information
 """
+import logging
 import os
-from googleapiclient.discovery import build
+import threading
 from dotenv import load_dotenv
 
+from tracing import tracer
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+_services = {}
+_services_lock = threading.Lock()
+
+def get_search_service(api_key: str):
+    """Build the Custom Search discovery client once per API key, on first use"""
+    with _services_lock:
+        if api_key not in _services:
+            from googleapiclient.discovery import build
+            _services[api_key] = build("customsearch", "v1", developerKey=api_key)
+        return _services[api_key]
+
 class WebSearchService:
     def __init__(self):
         self.api_key = os.getenv("GOOGLE_API_KEY")
         self.cse_id = os.getenv("GOOGLE_CSE_ID")
-        self.service = build("customsearch", "v1", developerKey=self.api_key)
+    
+    @property
+    def service(self):
+        return get_search_service(self.api_key)
     
     def search_phone_info(self, query: str, num_results: int = 3) -> list:
         """Search for mobile phone information"""
@@ -19,11 +38,14 @@ class WebSearchService:
             # Add mobile phone specific terms to improve search results
             enhanced_query = f"{query} mobile phone specifications price features"
             
-            result = self.service.cse().list(
-                q=enhanced_query,
-                cx=self.cse_id,
-                num=num_results
-            ).execute()
+            with tracer.span("web_search.request", {"web_search.query_chars": len(enhanced_query),
+                                                    "web_search.num_results": num_results}, kind="client") as span:
+                result = self.service.cse().list(
+                    q=enhanced_query,
+                    cx=self.cse_id,
+                    num=num_results
+                ).execute()
+                span.set_attribute("web_search.results", len(result.get('items', [])))
             
             search_results = []
             for item in result.get('items', []):
@@ -36,7 +58,7 @@ class WebSearchService:
             return search_results
             
         except Exception as e:
-            print(f"Web search error: {e}")
+            logger.warning("Web search error: %s", e)
             return []
     
     def search_phone_comparison(self, phone1: str, phone2: str) -> list:
@@ -46,7 +68,7 @@ class WebSearchService:
             return self.search_phone_info(query, num_results=5)
             
         except Exception as e:
-            print(f"Comparison search error: {e}")
+            logger.warning("Comparison search error: %s", e)
             return []
     
     def search_latest_phones(self, category: str = "best") -> list:
@@ -56,5 +78,5 @@ class WebSearchService:
             return self.search_phone_info(query, num_results=5)
             
         except Exception as e:
-            print(f"Latest phones search error: {e}")
+            logger.warning("Latest phones search error: %s", e)
             return []
@@ -19,6 +19,8 @@ function App() {
   const [showLogin, setShowLogin] = useState(false);
   const [showProfile, setShowProfile] = useState(false);
   const [isConnected, setIsConnected] = useState(true);
+  const [conversationId, setConversationId] = useState(null);
+  const [sessionId, setSessionId] = useState(null);
   const messagesEndRef = useRef(null);
 
   const scrollToBottom = () => {
@@ -29,6 +31,12 @@ function App() {
     scrollToBottom();
   }, [messages]);
 
+  // Conversations belong to the signed-in user; start fresh on logout or a user switch
+  useEffect(() => {
+    setConversationId(null);
+    setSessionId(null);
+  }, [user?.id]);
+
   useEffect(() => {
     // Check API health on startup
     const checkHealth = async () => {
@@ -76,7 +84,15 @@ function App() {
     setRecommendations([]);
 
     try {
-      const response = await chatAPI.sendMessage(messageText);
+      const response = await chatAPI.sendMessage(messageText, { conversationId, sessionId });
+      
+      // Keep following messages in the same thread
+      if (response.conversation_id) {
+        setConversationId(response.conversation_id);
+      }
+      if (response.session_id) {
+        setSessionId(response.session_id);
+      }
       
       const botMessage = {
         id: Date.now() + 1,
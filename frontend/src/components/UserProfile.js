@@ -11,8 +11,8 @@ const UserProfile = ({ onClose }) => {
   useEffect(() => {
     const fetchConversations = async () => {
       try {
-        const data = await conversationAPI.getConversations();
-        setConversations(data);
+        const data = await conversationAPI.getConversations({ limit: 5 });
+        setConversations(data.conversations);
       } catch (error) {
         console.error('Error fetching conversations:', error);
       } finally {
@@ -95,7 +95,7 @@ const UserProfile = ({ onClose }) => {
             </div>
           ) : conversations.length > 0 ? (
             <div className="space-y-3 max-h-60 overflow-y-auto">
-              {conversations.slice(0, 5).map((conversation) => (
+              {conversations.map((conversation) => (
                 <div
                   key={conversation.id}
                   className="p-3 bg-gray-50 rounded-lg hover:bg-gray-100 transition-colors cursor-pointer"
@@ -103,8 +103,13 @@ const UserProfile = ({ onClose }) => {
                   <h5 className="font-medium text-gray-900 truncate">
                     {conversation.title || 'Untitled Conversation'}
                   </h5>
+                  {conversation.last_message_preview && (
+                    <p className="text-sm text-gray-600 truncate">
+                      {conversation.last_message_preview}
+                    </p>
+                  )}
                   <p className="text-sm text-gray-500">
-                    {formatDate(conversation.updated_at)}
+                    {formatDate(conversation.updated_at)} · {conversation.message_count} messages
                   </p>
                 </div>
               ))}
@@ -43,8 +43,12 @@ api.interceptors.response.use(
 );
 
 export const chatAPI = {
-  sendMessage: async (message) => {
-    const response = await api.post('/chat', { message });
+  sendMessage: async (message, { conversationId = null, sessionId = null } = {}) => {
+    const response = await api.post('/chat', {
+      message,
+      conversation_id: conversationId,
+      session_id: sessionId,
+    });
     return response.data;
   },
   
@@ -101,13 +105,16 @@ export const authAPI = {
 };
 
 export const conversationAPI = {
-  getConversations: async () => {
-    const response = await api.get('/conversations');
+  // Returns { conversations, next_cursor, synced_at }; pass next_cursor for the
+  // next page, or an earlier synced_at as `since` to fetch only what changed
+  getConversations: async ({ limit, cursor, since } = {}) => {
+    const response = await api.get('/conversations', { params: { limit, cursor, since } });
     return response.data;
   },
   
-  getConversationMessages: async (conversationId) => {
-    const response = await api.get(`/conversations/${conversationId}/messages`);
+  // Returns the latest { messages, next_cursor, synced_at }; next_cursor pages back to older messages
+  getConversationMessages: async (conversationId, { limit, cursor, since } = {}) => {
+    const response = await api.get(`/conversations/${conversationId}/messages`, { params: { limit, cursor, since } });
     return response.data;
   },
 };